@@ -0,0 +1,155 @@
+# activity_log.py
+"""
+Materialized "latest completed movement per slot" for /api/activity-logs.
+
+The old endpoint ran ROW_NUMBER() over every product_logs row and joined
+batch_task_links/work_tasks on each poll. Instead the worker upserts one row
+per (rack, slot, movement_type, product_code) into latest_slot_movements when
+a task reaches 'done', and the endpoint reads it through the timestamp index.
+"""
+
+import sqlite3, logging
+from .db import DB_NAME
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = """
+    log_id AS id, product_code, product_name, rack, slot,
+    movement_type, quantity, cargo_owner, timestamp, batch_id,
+    start_time, end_time, task_status
+"""
+
+_UPSERT = """
+    INSERT INTO latest_slot_movements
+        (rack, slot, movement_type, product_code, log_id, product_name, quantity,
+         cargo_owner, timestamp, batch_id, task_id, start_time, end_time, task_status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (rack, slot, movement_type, product_code) DO UPDATE SET
+        log_id       = excluded.log_id,
+        product_name = excluded.product_name,
+        quantity     = excluded.quantity,
+        cargo_owner  = excluded.cargo_owner,
+        timestamp    = excluded.timestamp,
+        batch_id     = excluded.batch_id,
+        task_id      = excluded.task_id,
+        start_time   = excluded.start_time,
+        end_time     = excluded.end_time,
+        task_status  = excluded.task_status
+    WHERE (excluded.timestamp, excluded.log_id) >= (latest_slot_movements.timestamp, latest_slot_movements.log_id)
+"""
+
+
+def record_completed_movement(task: dict, conn=None):
+    """
+    Upsert the product_logs entry behind a finished task.
+
+    Args:
+        task (dict): get_task_with_meta() row of a task that has just been marked 'done'
+    """
+    batch_id = task.get('batch_id')
+    if not batch_id:
+        return  # Only batch uploads are linked back to product_logs
+    own_connection = conn is None
+    try:
+        if own_connection:
+            conn = sqlite3.connect(DB_NAME, timeout=10)
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, product_name, quantity, cargo_owner, timestamp
+            FROM product_logs
+            WHERE batch_id = ? AND rack = ? AND slot = ? AND movement_type = ? AND product_code = ?
+            ORDER BY id DESC
+            LIMIT 1
+        """, (batch_id, task['rack'], task['slot'], task['movement'], task['product_code']))
+        log = cur.fetchone()
+        if not log:
+            return  # Request log already purged
+        cur.execute(_UPSERT, (
+            task['rack'], task['slot'], task['movement'], task['product_code'],
+            log[0], log[1], log[2], log[3], log[4], batch_id,
+            task['id'], task.get('start_time'), task.get('end_time'), task.get('status') or 'done'
+        ))
+        if own_connection:
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"DATABASE ERROR in record_completed_movement: {e}")
+        if own_connection and conn:
+            conn.rollback()
+    finally:
+        if own_connection and conn:
+            conn.close()
+
+
+def get_activity_logs(limit=100, order="desc"):
+    """Latest completed movement per slot, ordered by request timestamp."""
+    direction = "ASC" if str(order).lower() == "asc" else "DESC"
+    conn = sqlite3.connect(DB_NAME)
+    conn.row_factory = sqlite3.Row
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT {_COLUMNS}
+            FROM latest_slot_movements
+            ORDER BY timestamp {direction}, log_id {direction}
+            LIMIT ?
+        """, (limit,))
+        return [dict(row) for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def rebuild_latest_movements():
+    """Repopulate latest_slot_movements from product_logs + done work_tasks. Returns the row count."""
+    conn = sqlite3.connect(DB_NAME, timeout=10)
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM latest_slot_movements")
+        cur.execute("""
+            INSERT INTO latest_slot_movements
+                (rack, slot, movement_type, product_code, log_id, product_name, quantity,
+                 cargo_owner, timestamp, batch_id, task_id, start_time, end_time, task_status)
+            SELECT rack, slot, movement_type, product_code, id, product_name, quantity,
+                   cargo_owner, timestamp, batch_id, task_id, start_time, end_time, task_status
+            FROM (
+                SELECT pl.rack, pl.slot, pl.movement_type, pl.product_code, pl.id, pl.product_name,
+                       pl.quantity, pl.cargo_owner, pl.timestamp, pl.batch_id,
+                       wt.id AS task_id, wt.start_time, wt.end_time, wt.status AS task_status,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY pl.rack, pl.slot, pl.movement_type, pl.product_code
+                           ORDER BY pl.timestamp DESC, pl.id DESC
+                       ) AS rn
+                FROM product_logs pl
+                INNER JOIN batch_task_links btl ON pl.batch_id = btl.batch_id
+                INNER JOIN work_tasks wt ON btl.task_id = wt.id
+                    AND wt.rack = pl.rack
+                    AND wt.slot = pl.slot
+                    AND wt.movement = pl.movement_type
+                    AND wt.product_code = pl.product_code
+                    AND wt.status = 'done'
+            )
+            WHERE rn = 1
+        """)
+        count = cur.rowcount
+        conn.commit()
+        logger.info(f"Rebuilt latest_slot_movements with {count} rows")
+        return count
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def ensure_latest_movements():
+    """One-time backfill on the first start after an upgrade."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM latest_slot_movements LIMIT 1")
+        populated = cur.fetchone() is not None
+        cur.execute("SELECT 1 FROM product_logs LIMIT 1")
+        has_logs = cur.fetchone() is not None
+    finally:
+        conn.close()
+    if has_logs and not populated:
+        rebuild_latest_movements()
@@ -1,6 +1,7 @@
 import sqlite3
-from passlib.hash import bcrypt as bcrypt_hasher # Use the same as in auth.py
 from . import db # Fix the import statement to use relative import correctly
+from .auth import invalidate_user
+from .passwords import password_hasher # Same hasher/work factor as auth.py
 
 # Define valid roles
 VALID_ROLES = ['admin', 'user', 'notouch']
@@ -12,7 +13,7 @@ def add_user_to_db(username, password, display_name=None, role=None):
     conn = sqlite3.connect(db.DB_NAME)
     cur = conn.cursor()
 
-    hashed_pw = bcrypt_hasher.hash(password)
+    hashed_pw = password_hasher.hash(password)
     # If display_name is not provided, use username
     display_name = display_name or username
 
@@ -22,6 +23,9 @@ def add_user_to_db(username, password, display_name=None, role=None):
             (username, display_name, hashed_pw, role)
         )
         conn.commit()
+        # Same process as the server (e.g. an admin route): drop cached records now.
+        # From the command line the server's cache expires after auth.USER_CACHE_TTL.
+        invalidate_user(username)
         print(f"User '{username}' added successfully with role '{role}'.")
     except sqlite3.IntegrityError:
         print(f"Error: User '{username}' already exists.")
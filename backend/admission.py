@@ -0,0 +1,313 @@
+# admission.py
+"""
+Admission queue for task batches.
+
+/api/upload-tasks and /api/record used to answer 429 "아직 작동중입니다" while
+tasks were pending or running, so operators had to re-submit by hand and
+the racks sat idle between a batch draining and the next click. Batches are
+now admitted instead:
+
+  - system idle and nothing queued → add_records() right away (as before)
+  - otherwise the batch is validated against the *projected* slot state
+    (current_inventory + pending/in_progress tasks + batches queued ahead
+    of it, in order) with the same rules as add_records, and stored in
+    queued_batches with status 'queued' and a position
+  - the release thread hands the next queued batch (highest priority, then
+    oldest) to add_records() as soon as system_busy(ADMISSION_RELEASE_IDLE_S)
+    turns false, so the next batch starts within about a poll interval of
+    the previous one draining
+  - urgent batches skip the queue and go to work_tasks right away; the
+    worker claims them ahead of lower-priority pending tasks
+
+A batch that will run ahead of work admitted earlier (urgent, or a queued
+batch with a higher priority than batches already waiting) must not touch
+any slot that earlier work touches, so overtaking never changes what the
+overtaken work finds in a slot.
+
+A queued batch can still be rejected on release when the projection turned
+out wrong (a task failed, the queue was reset, an earlier batch was
+cancelled); it is then marked 'rejected' with the error. Every change is
+broadcast as the 'admission_queue_changed' Socket.IO event.
+"""
+
+import datetime, json, logging, sqlite3, threading, uuid
+from . import db
+from .error_messages import get_error_message
+from .inventory import add_records, validate_records
+from .task_queue import system_busy, DEFAULT_PRIORITY, URGENT_PRIORITY, PRIORITY_NAMES
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ADMISSION_MAX_QUEUED': 20,          # queued batches; beyond that submit() answers 'full'
+    'ADMISSION_POLL_S': 0.5,             # release check interval while batches are queued
+    'ADMISSION_RELEASE_IDLE_S': 1,       # same cooldown the 429 gate used
+}
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+class AdmissionQueue:
+    def __init__(self):
+        self.config = dict(DEFAULTS)
+        self.lock = threading.RLock()     # serialises submit / release / cancel
+        self.wakeup = threading.Event()
+        self.socketio = None
+        self._thread = None
+        self._queued = 0                  # in-memory count of status='queued' rows
+
+    # ───── lifecycle ─────
+    def configure(self, config):
+        for key in DEFAULTS:
+            if config.get(key) is not None:
+                self.config[key] = config.get(key)
+
+    def start(self, config=None, socketio=None):
+        """Load the queued count and start the release thread (idempotent)."""
+        if config is not None:
+            self.configure(config)
+        if socketio is not None:
+            self.socketio = socketio
+        self.resync()
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="admission")
+        self._thread.start()
+
+    def resync(self):
+        conn = sqlite3.connect(db.DB_NAME)
+        try:
+            count = conn.execute("SELECT COUNT(*) FROM queued_batches WHERE status = 'queued'").fetchone()[0]
+        finally:
+            conn.close()
+        with self.lock:
+            self._queued = count
+        if count:
+            self.wakeup.set()
+
+    def queued_count(self) -> int:
+        return self._queued
+
+    def _emit(self, entry: dict):
+        if self.socketio:
+            self.socketio.emit("admission_queue_changed", entry)
+
+    # ───── submit ─────
+    def submit(self, kind: str, records: list, user_info: dict, batch_id: str = None,
+               priority: int = DEFAULT_PRIORITY) -> dict:
+        """
+        Admit a batch.
+
+        Returns one of
+            {"status": "accepted", "batch_id"}                 added to work_tasks now
+            {"status": "queued", "batch_id", "position"}       held until the current work drains
+            {"status": "rejected", "message"}                  failed validation
+            {"status": "full", "message"}                      ADMISSION_MAX_QUEUED reached
+        """
+        batch_id = batch_id or str(uuid.uuid4())
+        urgent = priority >= URGENT_PRIORITY
+        with self.lock:
+            idle = not self._queued and not system_busy(min_idle_seconds=self.config['ADMISSION_RELEASE_IDLE_S'])
+            if not idle and not urgent and self._queued >= int(self.config['ADMISSION_MAX_QUEUED']):
+                return {"status": "full", "message": None}
+
+            if not idle:
+                conn = sqlite3.connect(db.DB_NAME, timeout=10)
+                try:
+                    cur = conn.cursor()
+                    occupied, reserved = self._projected_slots(cur, priority, bypass=urgent)
+                    error = self._reserved_error(records, reserved) or validate_records(records, occupied)
+                    if error:
+                        return {"status": "rejected", "message": error}
+                    if not urgent:
+                        cur.execute("""
+                            INSERT INTO queued_batches
+                            (batch_id, kind, priority, payload, record_count, user_id, username, status, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', ?)
+                        """, (batch_id, kind, priority, json.dumps(records, ensure_ascii=False), len(records),
+                              user_info['id'], user_info['username'], _now()))
+                        position = cur.execute("""
+                            SELECT COUNT(*) FROM queued_batches
+                            WHERE status = 'queued' AND (priority > ? OR (priority = ? AND id <= ?))
+                        """, (priority, priority, cur.lastrowid)).fetchone()[0]
+                        conn.commit()
+                finally:
+                    conn.close()
+
+            if idle or urgent:
+                success, message = add_records(records, batch_id if kind == 'upload' else None, user_info, priority)
+                if not success:
+                    return {"status": "rejected", "message": message}
+                if urgent and not idle:
+                    logger.info(f"Admission: urgent batch {batch_id} ({len(records)} records) bypassed the queue")
+                return {"status": "accepted", "batch_id": batch_id}
+
+            self._queued += 1
+
+        logger.info(f"Admission: batch {batch_id} ({len(records)} records) queued at position {position}")
+        self._emit({"batch_id": batch_id, "status": "queued", "position": position,
+                    "priority": PRIORITY_NAMES.get(priority, priority), "created_by": user_info['username']})
+        self.wakeup.set()
+        return {"status": "queued", "batch_id": batch_id, "position": position}
+
+    def _projected_slots(self, cur, priority, bypass=False):
+        """
+        Slot state a batch of `priority` will find when it runs.
+
+        Returns:
+            (occupied, reserved): occupied (rack, slot) set once all work that runs
+            ahead of it is done — current_inventory, then outstanding tasks, then
+            queued batches, in order — and the slots touched by work it overtakes.
+            bypass: the batch goes straight to work_tasks (urgent), so it runs ahead
+            of every queued batch and of pending tasks with a lower priority.
+        """
+        cur.execute("SELECT rack, slot FROM current_inventory")
+        occupied = {(rack, slot) for rack, slot in cur.fetchall()}
+        reserved = set()
+
+        def apply(rack, slot, movement, ahead):
+            key = (str(rack).upper(), int(slot))
+            if not ahead:
+                reserved.add(key)
+            elif str(movement).upper() == 'IN':
+                occupied.add(key)
+            else:
+                occupied.discard(key)
+
+        cur.execute("""
+            SELECT rack, slot, movement, status, priority FROM work_tasks
+            WHERE status IN ('pending', 'in_progress')
+            ORDER BY created_at, id
+        """)
+        for rack, slot, movement, status, task_priority in cur.fetchall():
+            apply(rack, slot, movement, not bypass or status == 'in_progress' or task_priority >= priority)
+        cur.execute("SELECT payload, priority FROM queued_batches WHERE status = 'queued' ORDER BY id")
+        for payload, batch_priority in cur.fetchall():
+            for record in json.loads(payload):
+                apply(record['rack'], record['slot'], record['movement'], not bypass and batch_priority >= priority)
+        return occupied, reserved
+
+    @staticmethod
+    def _reserved_error(records, reserved):
+        for record in records:
+            try:
+                key = (str(record['rack']).upper(), int(record['slot']))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if key in reserved:
+                return get_error_message("slot_reserved", rack=key[0], slot=key[1])
+        return None
+
+    # ───── release ─────
+    def _loop(self):
+        while True:
+            self.wakeup.wait(timeout=float(self.config['ADMISSION_POLL_S']) if self._queued else None)
+            self.wakeup.clear()
+            try:
+                while self._queued and not system_busy(min_idle_seconds=self.config['ADMISSION_RELEASE_IDLE_S']):
+                    self.release_next()
+            except Exception as e:
+                logger.error(f"Admission release failed: {e}", exc_info=True)
+
+    def release_next(self):
+        """Hand the next queued batch to add_records(). Returns its final entry, or None."""
+        with self.lock:
+            conn = sqlite3.connect(db.DB_NAME, timeout=10)
+            conn.row_factory = sqlite3.Row
+            try:
+                row = conn.execute("""
+                    SELECT id, batch_id, kind, priority, payload, user_id, username
+                    FROM queued_batches WHERE status = 'queued'
+                    ORDER BY priority DESC, id LIMIT 1
+                """).fetchone()
+                if row is None:
+                    self._queued = 0
+                    return None
+                user_info = {"id": row['user_id'], "username": row['username']}
+                records = json.loads(row['payload'])
+                success, message = add_records(records, row['batch_id'] if row['kind'] == 'upload' else None,
+                                               user_info, row['priority'])
+                status = 'released' if success else 'rejected'
+                conn.execute("UPDATE queued_batches SET status = ?, error = ?, released_at = ? WHERE id = ?",
+                             (status, message, _now(), row['id']))
+                conn.commit()
+            finally:
+                conn.close()
+            self._queued = max(0, self._queued - 1)
+
+        entry = {"batch_id": row['batch_id'], "status": status, "error": message, "record_count": len(records),
+                 "priority": PRIORITY_NAMES.get(row['priority'], row['priority']), "created_by": row['username']}
+        if success:
+            logger.info(f"Admission: batch {row['batch_id']} released ({len(records)} records)")
+        else:
+            logger.warning(f"Admission: batch {row['batch_id']} rejected on release: {message}")
+        self._emit(entry)
+        return entry
+
+    # ───── listing / cancel ─────
+    def list(self, user_info: dict) -> list:
+        """Queued batches in release order with their position; non-admins only see their own."""
+        conn = sqlite3.connect(db.DB_NAME)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute("""
+                SELECT batch_id, kind, priority, record_count, user_id, username, created_at
+                FROM queued_batches WHERE status = 'queued'
+                ORDER BY priority DESC, id
+            """).fetchall()
+        finally:
+            conn.close()
+        entries = []
+        for position, row in enumerate(rows, start=1):
+            if user_info.get('role') != 'admin' and row['user_id'] != user_info['id']:
+                continue
+            entry = dict(row)
+            entry["position"] = position
+            entry["priority"] = PRIORITY_NAMES.get(entry["priority"], entry["priority"])
+            del entry["user_id"]
+            entries.append(entry)
+        return entries
+
+    def cancel(self, batch_id: str, user_info: dict) -> bool:
+        """Withdraw a queued batch (its owner or an admin). Returns False if there is none."""
+        with self.lock:
+            conn = sqlite3.connect(db.DB_NAME, timeout=10)
+            try:
+                query = "UPDATE queued_batches SET status = 'cancelled', released_at = ? WHERE batch_id = ? AND status = 'queued'"
+                params = [_now(), batch_id]
+                if user_info.get('role') != 'admin':
+                    query += " AND user_id = ?"
+                    params.append(user_info['id'])
+                cancelled = conn.execute(query, params).rowcount > 0
+                conn.commit()
+            finally:
+                conn.close()
+            if cancelled:
+                self._queued = max(0, self._queued - 1)
+        if cancelled:
+            logger.info(f"Admission: batch {batch_id} cancelled by {user_info['username']}")
+            self._emit({"batch_id": batch_id, "status": "cancelled", "created_by": user_info['username']})
+        return cancelled
+
+    def clear(self) -> int:
+        """Cancel every queued batch (system reset). Returns how many were cancelled."""
+        with self.lock:
+            conn = sqlite3.connect(db.DB_NAME, timeout=10)
+            try:
+                cleared = conn.execute(
+                    "UPDATE queued_batches SET status = 'cancelled', released_at = ? WHERE status = 'queued'", (_now(),)
+                ).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            self._queued = 0
+        if cleared:
+            logger.info(f"Admission: {cleared} queued batch(es) cancelled by reset")
+            self._emit({"batch_id": None, "status": "cleared", "count": cleared})
+        return cleared
+
+
+# ───── 전역 인스턴스 ─────
+admission_queue = AdmissionQueue()
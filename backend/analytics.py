@@ -0,0 +1,276 @@
+# analytics.py
+"""
+Pre-aggregated movement statistics.
+
+The worker calls record_completed_task() once per finished task, which bumps
+one row in movement_rollup_hourly and one bin in movement_duration_histogram.
+Dashboard queries read only those rollup rows, so their cost depends on the
+number of (hour, rack, slot, movement) buckets in the range, not on how many
+rows product_logs / camera_batch_history hold. Daily figures are summed from
+the 24 hourly buckets of each day.
+"""
+
+import sqlite3, logging, datetime as dt
+from bisect import bisect_right
+from .db import DB_NAME
+from . import archive
+
+logger = logging.getLogger(__name__)
+
+# Upper edges (seconds) of the duration histogram bins. The last bin is open-ended.
+DURATION_BIN_EDGES = [1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300, 600]
+
+GROUP_COLUMNS = ("rack", "slot", "movement_type")
+GRANULARITIES = ("hour", "day", "total")
+PERCENTILES = (50, 90, 95)
+
+
+def _parse_ts(value):
+    """Parse an ISO timestamp from the DB into a naive local datetime (None if unusable)."""
+    if not value:
+        return None
+    if isinstance(value, dt.datetime):
+        parsed = value
+    else:
+        try:
+            parsed = dt.datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _duration_bin(seconds: float) -> int:
+    return bisect_right(DURATION_BIN_EDGES, seconds)
+
+
+def _bucket_and_duration(start_time, end_time):
+    """Return (bucket_start, duration_seconds) for a completed task."""
+    end = _parse_ts(end_time)
+    if end is None:
+        end = dt.datetime.now()
+    start = _parse_ts(start_time)
+    duration = max((end - start).total_seconds(), 0.0) if start else None
+    bucket = end.replace(minute=0, second=0, microsecond=0).isoformat(timespec="seconds")
+    return bucket, duration
+
+
+def _apply(cur, rack, slot, movement, quantity, start_time, end_time):
+    bucket, duration = _bucket_and_duration(start_time, end_time)
+    key = (bucket, str(rack).upper(), int(slot), str(movement).upper())
+    cur.execute("""
+        INSERT INTO movement_rollup_hourly
+            (bucket_start, rack, slot, movement_type, task_count, total_quantity,
+             duration_sum, duration_min, duration_max)
+        VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+        ON CONFLICT (bucket_start, rack, slot, movement_type) DO UPDATE SET
+            task_count     = task_count + 1,
+            total_quantity = total_quantity + excluded.total_quantity,
+            duration_sum   = duration_sum + excluded.duration_sum,
+            duration_min   = MIN(COALESCE(duration_min, excluded.duration_min), COALESCE(excluded.duration_min, duration_min)),
+            duration_max   = MAX(COALESCE(duration_max, excluded.duration_max), COALESCE(excluded.duration_max, duration_max))
+    """, key + (int(quantity or 0), duration or 0.0, duration, duration))
+    if duration is not None:
+        cur.execute("""
+            INSERT INTO movement_duration_histogram
+                (bucket_start, rack, slot, movement_type, bin, count)
+            VALUES (?, ?, ?, ?, ?, 1)
+            ON CONFLICT (bucket_start, rack, slot, movement_type, bin) DO UPDATE SET
+                count = count + 1
+        """, key + (_duration_bin(duration),))
+
+
+def record_completed_task(history_data, conn=None):
+    """Add one completed task (same dict as store_camera_batch) to the rollups."""
+    own_connection = conn is None
+    try:
+        if own_connection:
+            conn = sqlite3.connect(DB_NAME, timeout=10)
+        _apply(conn.cursor(),
+               history_data.get('rack'), history_data.get('slot'), history_data.get('movement'),
+               history_data.get('quantity'), history_data.get('start_time'), history_data.get('end_time'))
+        if own_connection:
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"DATABASE ERROR in record_completed_task: {e}")
+        if own_connection and conn:
+            conn.rollback()
+    finally:
+        if own_connection and conn:
+            conn.close()
+
+
+def rebuild_rollups():
+    """Recompute all rollups from camera_batch_history (live + archived). Returns the number of rows folded in."""
+    conn = sqlite3.connect(DB_NAME, timeout=10)
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM movement_rollup_hourly")
+        cur.execute("DELETE FROM movement_duration_histogram")
+        read_cur = conn.cursor()
+        read_cur.execute("""
+            SELECT rack, slot, movement_type, quantity, start_time, end_time
+            FROM camera_batch_history
+            WHERE status = 'done'
+        """)
+        count = 0
+        for row in read_cur:
+            _apply(cur, *row)
+            count += 1
+        for row in archive.iter_rows("camera_batch_history", conn=conn):
+            if row.get('status') == 'done':
+                _apply(cur, row['rack'], row['slot'], row['movement_type'], row['quantity'],
+                       row['start_time'], row['end_time'])
+                count += 1
+        conn.commit()
+        logger.info(f"Rebuilt movement rollups from {count} camera history rows")
+        return count
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def ensure_rollups():
+    """Backfill the rollup tables on first start after an upgrade."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM movement_rollup_hourly LIMIT 1")
+        has_rollups = cur.fetchone() is not None
+        cur.execute("SELECT 1 FROM camera_batch_history LIMIT 1")
+        has_history = cur.fetchone() is not None
+    finally:
+        conn.close()
+    if has_history and not has_rollups:
+        rebuild_rollups()
+
+
+# ───── queries ─────
+def _percentile_from_bins(bins: dict, total: int, pct: float, lo, hi):
+    """Estimate a percentile by linear interpolation inside the histogram bin holding the rank."""
+    if not total:
+        return None
+    rank = pct / 100.0 * total
+    seen = 0
+    for b in sorted(bins):
+        n = bins[b]
+        if seen + n >= rank:
+            lower = DURATION_BIN_EDGES[b - 1] if b > 0 else 0.0
+            upper = DURATION_BIN_EDGES[b] if b < len(DURATION_BIN_EDGES) else (hi if hi is not None else lower)
+            value = lower + (upper - lower) * ((rank - seen) / n if n else 0)
+            if lo is not None:
+                value = max(value, lo)
+            if hi is not None:
+                value = min(value, hi)
+            return round(value, 3)
+        seen += n
+    return hi
+
+
+def _range_filter(date_from: dt.datetime, date_to: dt.datetime, rack=None, slot=None, movement=None):
+    where = ["bucket_start >= ?", "bucket_start < ?"]
+    params = [date_from.isoformat(timespec="seconds"), date_to.isoformat(timespec="seconds")]
+    if rack:
+        where.append("rack = ?"); params.append(rack.upper())
+    if slot is not None:
+        where.append("slot = ?"); params.append(int(slot))
+    if movement:
+        where.append("movement_type = ?"); params.append(movement.upper())
+    return " AND ".join(where), params
+
+
+def get_movement_summary(date_from: dt.datetime, date_to: dt.datetime, granularity="day",
+                         group_by=("rack", "movement_type"), rack=None, slot=None, movement=None):
+    """
+    Counts, quantities and duration stats per time bucket and group.
+
+    Args:
+        date_from / date_to: half-open range [date_from, date_to) of bucket start times
+        granularity: 'hour', 'day' or 'total'
+        group_by: any subset of ('rack', 'slot', 'movement_type')
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    group_by = [c for c in GROUP_COLUMNS if c in set(group_by or ())]
+    if granularity == "hour":
+        bucket_expr = "bucket_start"
+    elif granularity == "day":
+        bucket_expr = "substr(bucket_start, 1, 10)"
+    else:
+        bucket_expr = "''"
+    select_keys = ", ".join([f"{bucket_expr} AS bucket"] + group_by)
+    group_keys = ", ".join(["bucket"] + group_by)
+    where, params = _range_filter(date_from, date_to, rack, slot, movement)
+
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT {select_keys},
+                   SUM(task_count), SUM(total_quantity), SUM(duration_sum),
+                   MIN(duration_min), MAX(duration_max)
+            FROM movement_rollup_hourly
+            WHERE {where}
+            GROUP BY {group_keys}
+            ORDER BY {group_keys}
+        """, params)
+        rows = cur.fetchall()
+        cur.execute(f"""
+            SELECT {select_keys}, bin, SUM(count)
+            FROM movement_duration_histogram
+            WHERE {where}
+            GROUP BY {group_keys}, bin
+        """, params)
+        histograms = {}
+        for hrow in cur.fetchall():
+            histograms.setdefault(tuple(hrow[:-2]), {})[hrow[-2]] = hrow[-1]
+    finally:
+        conn.close()
+
+    n_keys = 1 + len(group_by)
+    result = []
+    for row in rows:
+        key = tuple(row[:n_keys])
+        task_count, total_quantity, duration_sum, duration_min, duration_max = row[n_keys:]
+        bins = histograms.get(key, {})
+        timed = sum(bins.values())
+        entry = {"bucket": key[0] if granularity != "total" else None}
+        entry.update(zip(group_by, key[1:]))
+        entry.update({
+            "task_count": task_count,
+            "total_quantity": total_quantity,
+            "avg_duration": round(duration_sum / timed, 3) if timed else None,
+            "min_duration": duration_min,
+            "max_duration": duration_max,
+        })
+        for pct in PERCENTILES:
+            entry[f"p{pct}_duration"] = _percentile_from_bins(bins, timed, pct, duration_min, duration_max)
+        result.append(entry)
+    return result
+
+
+def get_busiest_slots(date_from: dt.datetime, date_to: dt.datetime, limit=10, rack=None, movement=None):
+    """Slots with the most completed movements in the range."""
+    where, params = _range_filter(date_from, date_to, rack, None, movement)
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT rack, slot,
+                   SUM(task_count) AS task_count,
+                   SUM(CASE WHEN movement_type = 'IN' THEN task_count ELSE 0 END) AS in_count,
+                   SUM(CASE WHEN movement_type = 'OUT' THEN task_count ELSE 0 END) AS out_count,
+                   SUM(total_quantity) AS total_quantity
+            FROM movement_rollup_hourly
+            WHERE {where}
+            GROUP BY rack, slot
+            ORDER BY task_count DESC, rack, slot
+            LIMIT ?
+        """, params + [int(limit)])
+        columns = [d[0] for d in cur.description]
+        return [dict(zip(columns, r)) for r in cur.fetchall()]
+    finally:
+        conn.close()
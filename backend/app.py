@@ -1,8 +1,12 @@
 # app.py
+from .async_mode import ASYNC_MODE, patch as patch_async_mode
+patch_async_mode()   # eventlet: monkey patch before flask / socket / threading are imported
+
 from flask import Flask, request, jsonify, Response, current_app
+from flask.logging import default_handler
 from flask_cors import CORS
-from flask_socketio import SocketIO
-import sqlite3, json, logging
+from flask_socketio import SocketIO, emit, join_room, leave_room
+import sqlite3, json, logging, os
 import secrets
 import uuid
 import io # Standard io module for StringIO
@@ -11,15 +15,28 @@ import threading
 import time
 import datetime # Added for datetime operations
 
-from .auth import authenticate, token_required, logout_current_session, get_current_session_info
+from .auth import authenticate, token_required, admin_required, logout_current_session, get_current_session_info, user_from_token, configure_session_store
+from .passwords import password_hasher, HashPoolBusy
 from .db import DB_NAME, init_db
-from .inventory import add_records
 from .stats import fetch_logs, logs_to_csv
 from .serial_io import serial_mgr
 from . import task_queue
 from .error_messages import get_error_message
 from .camera_stream import mjpeg_feed, get_available_cameras, get_camera_diagnostics
-from .camera_history import get_camera_history
+from .camera_history import get_camera_history, get_camera_history_page
+from .pagination import page_size
+from . import analytics
+from . import task_phases
+from . import activity_log
+from . import archive
+from .dashboard_state import dashboard_state
+from .retention import retention_job
+from .maintenance import maintenance
+from .admission import admission_queue
+from .recovery import recover_stale_tasks, get_recovery_log
+from . import metrics
+from .profiling import profiler, ProfilerBusy
+from .logging_setup import log_system
 
 # Define SECRET_KEY for the application
 # This should be a long, random, and secret string in production
@@ -28,21 +45,118 @@ from .camera_history import get_camera_history
 FLASK_APP_SECRET_KEY = secrets.token_hex(16) 
 
 # Configuration for enabling/disabling serial communication
-SERIAL_COMMUNICATION_ENABLED = True # Set to False for development without hardware
+# Set to False for development without hardware (or INU_SERIAL_ENABLED=0)
+SERIAL_COMMUNICATION_ENABLED = os.environ.get("INU_SERIAL_ENABLED", "1").lower() not in ("0", "false", "no")
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = FLASK_APP_SECRET_KEY
 app.config['SERIAL_COMMUNICATION_ENABLED'] = SERIAL_COMMUNICATION_ENABLED
 
+# Logging (see logging_setup.py): log calls only enqueue, a listener thread
+# writes. LOG_LEVELS sets per-logger levels ('backend.serial_io', ...), which
+# admins can change at runtime via /api/admin/log-levels. LOG_FORMAT 'json'
+# writes one JSON object per line.
+app.config['LOG_LEVEL'] = os.environ.get("INU_LOG_LEVEL", "INFO").upper()
+app.config['LOG_LEVELS'] = {'engineio': 'WARNING', 'socketio': 'WARNING', 'werkzeug': 'WARNING'}
+app.config['LOG_FORMAT'] = os.environ.get("INU_LOG_FORMAT", "text").lower()
+app.config['LOG_FILE'] = None
+app.config['LOG_QUEUE_SIZE'] = 10000
+# Serving mode (see async_mode.py): 'threading' or 'eventlet', from INU_ASYNC_MODE.
+# eventlet only: listen backlog (a reconnect storm of tablets arrives at once)
+# and open connections (each polling Socket.IO client holds up to two)
+app.config['ASYNC_MODE'] = ASYNC_MODE
+app.config['SERVER_BACKLOG'] = 1024
+app.config['SERVER_MAX_CONNECTIONS'] = 2048
+# Per-packet Engine.IO / Socket.IO logging (very chatty; for debugging the client connection)
+app.config['SOCKETIO_LOGGER'] = False
+app.config['ENGINEIO_LOGGER'] = False
+log_system.configure(app.config)
+app.logger.removeHandler(default_handler)   # app.logger goes through the root queue handler
+
+# Password hashing pool (see passwords.py). Raising BCRYPT_ROUNDS re-hashes
+# each user's password on their next successful login.
+app.config['PASSWORD_HASH_WORKERS'] = 2
+app.config['PASSWORD_HASH_MAX_QUEUE'] = 16
+app.config['PASSWORD_HASH_TIMEOUT_S'] = 10.0
+app.config['BCRYPT_ROUNDS'] = 12
+password_hasher.configure(app.config)
+
+# Login sessions: 'sqlite' (sessions.db next to the database, shared by all
+# worker processes, survives restarts) or 'memory' (single process only)
+app.config['SESSION_STORE'] = 'sqlite'
+configure_session_store(app.config)
+
+# Retention (see retention.py / archive.py): product_logs and camera_batch_history
+# rows older than their window move to gzip JSONL archive segments in small chunks
+app.config['PRODUCT_LOG_RETENTION_DAYS'] = 30
+app.config['CAMERA_HISTORY_ARCHIVE_DAYS'] = 90
+app.config['ARCHIVE_DIR'] = None   # default: <database dir>/archive
+app.config['RETENTION_CHUNK_SIZE'] = 500
+app.config['RETENTION_MAX_RUN_SECONDS'] = 5.0
+app.config['RETENTION_INTERVAL_S'] = 3600
+archive.configure(app.config)
+
+# Database maintenance (see maintenance.py): paced online backups, incremental
+# VACUUM and ANALYZE in idle windows
+app.config['BACKUP_DIR'] = None    # default: <database dir>/backups
+app.config['BACKUP_INTERVAL_S'] = 24 * 3600
+app.config['BACKUP_KEEP'] = 7
+app.config['MAINTENANCE_IDLE_SECONDS'] = 60
+# A full VACUUM locks the database; existing DBs are converted only on request
+# (POST /api/admin/maintenance/convert or python -m backend.maintenance convert)
+app.config['MAINTENANCE_CONVERT_AUTO_VACUUM'] = False
+
+# Admission queue (see admission.py): batches submitted while tasks are running
+# are held as 'queued' and released automatically when the current work drains
+app.config['ADMISSION_MAX_QUEUED'] = 20
+app.config['ADMISSION_POLL_S'] = 0.5
+
+# Task priorities (see task_queue.py): pending tasks gain one level per
+# TASK_AGING_S seconds of waiting, up to 'high' (0 disables aging)
+app.config['TASK_AGING_S'] = 600
+app.config['TASK_AGING_INTERVAL_S'] = 30
+# Serial link failures (no echo, no done/fin) are retried with exponential
+# backoff: TASK_RETRY_BASE_S, doubled per run, capped at TASK_RETRY_MAX_S
+app.config['TASK_MAX_ATTEMPTS'] = 4
+app.config['TASK_RETRY_BASE_S'] = 2.0
+app.config['TASK_RETRY_MAX_S'] = 60.0
+task_queue.configure(app.config)
+
+# Startup recovery (see recovery.py): tasks left in_progress that the inventory
+# does not show as finished go back to pending ('retry') or fail ('fail'); a task
+# that crashed with a serial leg in flight always fails as failed_unconfirmed
+app.config['RECOVERY_POLICY'] = 'retry'
+app.config['RECOVERY_MAX_RETRIES'] = 1
+
+# Prometheus metrics at /metrics (see metrics.py). METRICS_DB_TIMING times every
+# sqlite execute/fetch/commit per calling function (a few microseconds each, plus
+# a stack walk for the call site); off like the profiler hooks, turn on to diagnose
+app.config['METRICS_ENABLED'] = True
+app.config['METRICS_DB_TIMING'] = False
+# Runtime profiling (see profiling.py), both off until an admin turns them on:
+# all-thread stack sampling for a window (/api/admin/profiler/start) and
+# cProfile of requests to PROFILE_REQUEST_ROUTE that send "X-Profile: 1"
+app.config['PROFILER_INTERVAL_MS'] = 10
+app.config['PROFILER_MAX_SECONDS'] = 300
+app.config['PROFILE_REQUEST_ROUTE'] = None
+profiler.configure(app.config)
+profiler.install(app)
+
+if app.config['METRICS_ENABLED']:
+    metrics.instrument_app(app)
+    metrics.watch_scheduler(task_queue.scheduler_state)
+    if app.config['METRICS_DB_TIMING']:
+        metrics.add_sqlite_observer(metrics.observe_db_query)
+
 # Initialize SocketIO
 # Make sure to replace 192.168.0.16 with your Mac's actual current IP if it changes,
 # or use a more dynamic solution for production on Pi later.
 allowed_origins_list = ["http://localhost:5173", "http://192.168.0.37:5173", "http://192.168.0.18:5173", "http://192.168.0.16:8080"]
-socketio = SocketIO(app, async_mode='threading', cors_allowed_origins=allowed_origins_list, logger=True, engineio_logger=True)
-
-# Configure basic logging
-logging.basicConfig(level=logging.INFO)
+socketio = SocketIO(app, async_mode=app.config['ASYNC_MODE'], cors_allowed_origins=allowed_origins_list,
+                    logger=app.config['SOCKETIO_LOGGER'], engineio_logger=app.config['ENGINEIO_LOGGER'])
+if app.config['METRICS_ENABLED']:
+    metrics.instrument_socketio(socketio)
 
 # ---- Pass the socketio instance and app instance to the task_queue module ----
 task_queue.set_socketio(socketio)
@@ -67,7 +181,7 @@ def optional_module_health_check_service():
                 })
                 
                 if not is_healthy:
-                    print(f"WARNING: Optional module health check failed at {time.ctime()}")
+                    app.logger.warning("Optional module health check failed")
             else:
                 # Module not connected
                 socketio.emit('optional_module_status', {
@@ -78,29 +192,33 @@ def optional_module_health_check_service():
                 })
                 
         except Exception as e:
-            print(f"Error in optional module health check service: {e}")
+            app.logger.error(f"Error in optional module health check service: {e}")
 
 # Start health check service in background thread
 health_check_thread = threading.Thread(target=optional_module_health_check_service, daemon=True)
 health_check_thread.start()
-print("Optional module health check service started")
+app.logger.info("Optional module health check service started")
 
 # ---- DEBUG: Log all incoming request paths ----
 @app.before_request
 def log_request_info():
-    app.logger.debug(f'Request Path: {request.path}')
-    app.logger.debug(f'Request Method: {request.method}')
-    app.logger.debug(f'Request Headers: {request.headers}')
+    # Headers and bodies are only formatted when backend.app is at DEBUG
+    if not app.logger.isEnabledFor(logging.DEBUG):
+        return
+    app.logger.debug('Request: %s %s', request.method, request.path)
+    app.logger.debug('Request Headers: %s', request.headers)
     if request.method == 'POST' and request.is_json:
-        app.logger.debug(f'Request JSON Body: {request.get_json(silent=True)}')
+        app.logger.debug('Request JSON Body: %s', request.get_json(silent=True))
 
 CORS(app, resources={r"/api/*": {"origins": "*"}}) # Allow all origins for /api routes
 init_db()
-
-# Reset any tasks that were stuck in 'in_progress' from a previous run
-# This logic was causing a crash and was requested to be removed.
-# from . import task_queue
-# task_queue.reset_stale_tasks()
+analytics.ensure_rollups()
+activity_log.ensure_latest_movements()
+task_queue.scheduler_state.resync()
+dashboard_state.start(socketio)
+retention_job.start(app.config)
+maintenance.start(app.config)
+admission_queue.start(app.config, socketio)
 
 # Configure serial manager based on app config BEFORE starting workers
 serial_mgr.configure_and_discover(app.config)
@@ -119,13 +237,71 @@ else:
 # Start the background worker for task processing
 from . import task_queue
 task_queue.set_socketio(socketio)
+
+# Resolve tasks left 'in_progress' by a crash or power loss (racks were reset
+# above); otherwise claim_next_task would never claim again
+with app.app_context():
+    recover_stale_tasks(app.config)
+
 task_queue.start_worker(app)
 
+# ───── Socket.IO: dashboard state push ─────
+@socketio.on('dashboard_subscribe')
+def on_dashboard_subscribe(data=None):
+    """Join the caller's dashboard room and send it a full snapshot; diffs follow via 'dashboard_diff'."""
+    token = (data or {}).get('token')
+    user_info = user_from_token(token) if token else None
+    if not user_info:
+        emit('dashboard_error', {"error": get_error_message("session_invalidated"), "code": "session_invalidated"})
+        return
+    join_room(f"dashboard:{dashboard_state.scope_for(user_info)}")
+    emit('dashboard_snapshot', dashboard_state.subscribe(request.sid, user_info))
+
+@socketio.on('dashboard_unsubscribe')
+def on_dashboard_unsubscribe(data=None):
+    scope = dashboard_state.unsubscribe(request.sid)
+    if scope:
+        leave_room(f"dashboard:{scope}")
+
+@socketio.on('disconnect')
+def on_socket_disconnect():
+    dashboard_state.unsubscribe(request.sid)
+
 # ───── routes ─────
 @app.route("/api/ping")
 def ping():
     return {"message": "pong"}
 
+@app.route("/metrics")
+def metrics_route():
+    """Prometheus scrape endpoint (unauthenticated, like /api/ping)."""
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({"error": get_error_message("metrics_disabled")}), 404
+    body, content_type = metrics.render()
+    return Response(body, mimetype=content_type)
+
+@app.route("/api/system-state")
+def system_state():
+    """Queue state used for admission control (in-memory, no database access)."""
+    state = task_queue.scheduler_state.snapshot()
+    state["busy"] = task_queue.system_busy(min_idle_seconds=1)
+    return jsonify(state), 200
+
+@app.route("/api/queue-metrics")
+@token_required
+def queue_metrics_route():
+    """Queue wait (created → claimed) percentiles per requested priority, recent claims only."""
+    return jsonify({
+        "queue_wait": task_queue.scheduler_state.queue_wait_stats(),
+        "aging": {"seconds_per_level": task_queue.TASK_AGING_S, "max_priority": task_queue.PRIORITY_NAMES[task_queue.TASK_AGING_MAX_PRIORITY]}
+    }), 200
+
+@app.route("/api/dashboard-state")
+@token_required
+def dashboard_state_snapshot():
+    """Full dashboard snapshot {scope, version, state} for clients that cannot use Socket.IO."""
+    return jsonify(dashboard_state.snapshot(request.user)), 200
+
 # ---- DEBUG: Simple test route ----
 @app.route("/api/test-debug")
 def test_debug_route():
@@ -172,7 +348,11 @@ def login():
     
     app.logger.info(f"Login attempt: username='{username}'")
     
-    tok = authenticate(username, password)
+    try:
+        tok = authenticate(username, password)
+    except HashPoolBusy as e:
+        app.logger.warning(f"Login for '{username}' rejected: {e}")
+        return {"error": get_error_message("login_busy")}, 503, {"Retry-After": "1"}
     
     if tok:
         app.logger.info(f"Login successful for '{username}', token generated.")
@@ -181,6 +361,153 @@ def login():
         app.logger.warning(f"Login failed for '{username}' - invalid credentials.")
         return {"error": get_error_message("invalid_credentials")}, 401
 
+@app.route("/api/auth/hash-pool")
+@token_required
+@admin_required
+def hash_pool_stats_route():
+    """Password hashing pool metrics (queue depth, wait/hash time percentiles)."""
+    return jsonify(password_hasher.stats()), 200
+
+@app.route("/api/admin/retention")
+@token_required
+@admin_required
+def retention_status_route():
+    """Progress of the current/last product_logs retention run."""
+    return jsonify(retention_job.status()), 200
+
+@app.route("/api/admin/retention/run", methods=["POST"])
+@token_required
+@admin_required
+def retention_run_route():
+    """Start a retention run now (it continues in the background)."""
+    retention_job.request_run()
+    return jsonify(retention_job.status()), 202
+
+@app.route("/api/admin/maintenance")
+@token_required
+@admin_required
+def maintenance_status_route():
+    """Last backup / vacuum / analyze and the current maintenance step."""
+    return jsonify(maintenance.status()), 200
+
+@app.route("/api/admin/maintenance/backup", methods=["POST"])
+@token_required
+@admin_required
+def maintenance_backup_route():
+    """Take an online backup now (runs in the background)."""
+    maintenance.request_backup()
+    return jsonify(maintenance.status()), 202
+
+@app.route("/api/admin/maintenance/convert", methods=["POST"])
+@token_required
+@admin_required
+def maintenance_convert_route():
+    """Switch an existing database to auto_vacuum=INCREMENTAL in the next idle window (full VACUUM, locks the DB)."""
+    maintenance.request_convert()
+    return jsonify(maintenance.status()), 202
+
+@app.route("/api/admin/profiler")
+@token_required
+@admin_required
+def profiler_status_route():
+    """Sampling window state, most sampled frames and the request-profiling route."""
+    return jsonify(profiler.status()), 200
+
+@app.route("/api/admin/profiler/start", methods=["POST"])
+@token_required
+@admin_required
+def profiler_start_route():
+    """Sample every thread's stack for `seconds` (body: {seconds, interval_ms})."""
+    data = request.get_json(silent=True) or {}
+    try:
+        profiler.start(data.get('seconds', 30), data.get('interval_ms'))
+    except ProfilerBusy:
+        return jsonify({"error": get_error_message("profiler_busy"), "status": profiler.status()}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": get_error_message("invalid_data_format"), "message": str(e)}), 400
+    return jsonify(profiler.status()), 202
+
+@app.route("/api/admin/profiler/stop", methods=["POST"])
+@token_required
+@admin_required
+def profiler_stop_route():
+    """End the sampling window early (the samples so far are kept)."""
+    profiler.stop()
+    return jsonify(profiler.status()), 200
+
+@app.route("/api/admin/profiler/collapsed")
+@token_required
+@admin_required
+def profiler_collapsed_route():
+    """Folded stacks of the current / last window (flamegraph.pl, speedscope)."""
+    return Response(profiler.collapsed(), mimetype="text/plain")
+
+@app.route("/api/admin/profiler/request-route", methods=["POST"])
+@token_required
+@admin_required
+def profiler_request_route():
+    """Set the URL rule profiled on "X-Profile: 1" (body: {route}; null turns it off)."""
+    route = (request.get_json(silent=True) or {}).get('route')
+    if route and route not in {rule.rule for rule in app.url_map.iter_rules()}:
+        return jsonify({"error": get_error_message("invalid_profile_route", route=route)}), 400
+    profiler.set_request_route(route)
+    return jsonify({"request_route": profiler.request_route}), 200
+
+@app.route("/api/admin/profiler/requests")
+@token_required
+@admin_required
+def profiler_requests_route():
+    """Profiled requests kept in memory, newest first."""
+    return jsonify(profiler.request_profiles()), 200
+
+@app.route("/api/admin/profiler/requests/<profile_id>")
+@token_required
+@admin_required
+def profiler_request_profile_route(profile_id):
+    """pstats report (?sort=cumulative|tottime&limit=60) or ?format=prof for snakeviz."""
+    fmt = request.args.get('format', 'text')
+    try:
+        result = profiler.request_profile(profile_id, fmt=fmt, sort=request.args.get('sort', 'cumulative'),
+                                          limit=request.args.get('limit', default=60, type=int))
+    except KeyError as e:   # unknown sort key
+        return jsonify({"error": get_error_message("invalid_data_format"), "message": str(e)}), 400
+    if result is None:
+        return jsonify({"error": get_error_message("profile_not_found")}), 404
+    if fmt == "prof":
+        return Response(result, mimetype="application/octet-stream",
+                        headers={"Content-Disposition": f"attachment; filename={profile_id}.prof"})
+    return Response(result, mimetype="text/plain")
+
+@app.route("/api/admin/log-levels", methods=["GET", "POST"])
+@token_required
+@admin_required
+def log_levels_route():
+    """Logger levels and log queue state; POST {"levels": {"backend.serial_io": "DEBUG", ...}} changes them."""
+    if request.method == "POST":
+        levels = (request.get_json(silent=True) or {}).get('levels')
+        if not isinstance(levels, dict) or not levels:
+            return jsonify({"error": get_error_message("invalid_data_format")}), 400
+        try:
+            log_system.set_levels(levels)
+        except ValueError as e:
+            return jsonify({"error": get_error_message("invalid_log_level"), "message": str(e)}), 400
+        app.logger.info("Log levels changed by %s: %s", request.user['username'], levels)
+    return jsonify(log_system.levels()), 200
+
+@app.route("/api/admin/recovery-log")
+@token_required
+@admin_required
+def recovery_log_route():
+    """Startup recovery decisions for tasks interrupted by a crash, newest first."""
+    try:
+        return jsonify(get_recovery_log(page_size(request.args.get("limit", type=int)))), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching recovery log: {e}", exc_info=True)
+        return jsonify({
+            "error": get_error_message("fetch_tasks_error"),
+            "message": str(e)
+        }), 500
+
 @app.route("/api/logout", methods=["POST"])
 @token_required
 def logout():
@@ -192,7 +519,7 @@ def logout():
             session_id = user_info['session_id']
             
             # Logout the current session
-            logout_success = logout_current_session()
+            logout_success = logout_current_session(session_id)
             
             if logout_success:
                 app.logger.info(f"User '{username}' with session '{session_id}' logged out successfully")
@@ -274,50 +601,9 @@ def get_activity_logs():
         if order not in ['asc', 'desc']:
             order = 'desc' # Default to descending if an invalid order is provided
 
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row # This allows accessing columns by name
-        cur = conn.cursor()
-
-        # FIXED: Only return product_logs entries that have corresponding completed work_tasks
-        # This prevents pending tasks from showing up as "completed" in the UI
-        query = f"""
-            WITH latest_logs AS (
-                SELECT 
-                    pl.id, pl.product_code, pl.product_name, pl.rack, pl.slot, 
-                    pl.movement_type, pl.quantity, pl.cargo_owner, pl.timestamp, pl.batch_id,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY pl.rack, pl.slot, pl.movement_type, pl.product_code 
-                        ORDER BY pl.timestamp DESC
-                    ) as rn
-                FROM product_logs pl
-            )
-            SELECT 
-                ll.id, ll.product_code, ll.product_name, ll.rack, ll.slot, 
-                ll.movement_type, ll.quantity, ll.cargo_owner, ll.timestamp, ll.batch_id,
-                wt.start_time, wt.end_time, wt.status as task_status
-            FROM latest_logs ll
-            INNER JOIN batch_task_links btl ON ll.batch_id = btl.batch_id
-            INNER JOIN work_tasks wt ON btl.task_id = wt.id 
-                AND wt.rack = ll.rack 
-                AND wt.slot = ll.slot 
-                AND wt.movement = ll.movement_type
-                AND wt.product_code = ll.product_code
-                AND wt.status = 'done'
-            WHERE ll.rn = 1
-            ORDER BY ll.timestamp {order.upper()} 
-            LIMIT ?
-        """
-        
-        cur.execute(query, (limit,))
-        log_rows = cur.fetchall()
-        conn.close()
-
-        logs_list = []
-        for row in log_rows:
-            log_dict = dict(row)
-            # Use precise timing from work_tasks since we're only showing completed tasks
-            logs_list.append(log_dict)
-        
+        # Only completed tasks are materialized (see activity_log.py), so pending
+        # tasks never show up as "completed" in the UI
+        logs_list = activity_log.get_activity_logs(limit, order)
         return jsonify(logs_list), 200
 
     except sqlite3.Error as e:
@@ -331,9 +617,16 @@ def get_activity_logs():
 @token_required
 def camera_history():
     try:
+        # ?cursor=... or ?paginate=1 switches to the paged envelope {items, next_cursor}
+        cursor = request.args.get('cursor')
+        if cursor or request.args.get('paginate'):
+            items, next_cursor = get_camera_history_page(page_size(request.args.get('limit', type=int)), cursor)
+            return jsonify({"items": items, "next_cursor": next_cursor}), 200
         limit = request.args.get('limit', default=50, type=int)
         history = get_camera_history(limit)
         return jsonify(history), 200
+    except ValueError as e:
+        return jsonify({"error": get_error_message("invalid_cursor"), "message": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching camera history: {e}", exc_info=True)
         return jsonify({
@@ -341,62 +634,131 @@ def camera_history():
             "message": str(e)
         }), 500
 
-def _system_busy(min_idle_seconds: int = 1) -> bool:
-    """Return True if there are pending/in_progress tasks, or if last done < cooldown."""
-    conn = None
+def _analytics_range(default_days: int = 7):
+    """Parse ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive) into a half-open datetime range."""
+    today = datetime.date.today()
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    start = datetime.datetime.strptime(date_from, "%Y-%m-%d") if date_from else \
+        datetime.datetime.combine(today - datetime.timedelta(days=default_days - 1), datetime.time())
+    end = datetime.datetime.strptime(date_to, "%Y-%m-%d") if date_to else \
+        datetime.datetime.combine(today, datetime.time())
+    if end < start:
+        raise ValueError("'to' is before 'from'")
+    return start, end + datetime.timedelta(days=1)
+
+@app.route("/api/analytics/movements")
+@token_required
+def analytics_movements():
+    """IN/OUT counts, quantities and duration percentiles from the hourly rollup tables."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        # Any outstanding work?
-        cur.execute("SELECT COUNT(*) FROM work_tasks WHERE status IN ('pending','in_progress')")
-        outstanding = cur.fetchone()[0]
-        if outstanding and outstanding > 0:
-            return True
-        # Cooldown after last done
-        cur.execute("SELECT updated_at FROM work_tasks WHERE status='done' ORDER BY updated_at DESC LIMIT 1")
-        row = cur.fetchone()
-        if row and row[0]:
-            try:
-                last_done = datetime.datetime.fromisoformat(row[0])
-            except Exception:
-                # Fallback: strip microseconds if any
-                ts = str(row[0]).split(".")[0]
-                last_done = datetime.datetime.fromisoformat(ts)
-            if (datetime.datetime.now() - last_done).total_seconds() < min_idle_seconds:
-                return True
-        return False
-    finally:
-        if conn:
-            conn.close()
+        start, end = _analytics_range()
+        group_by = [g for g in request.args.get('group_by', 'rack,movement_type').split(',') if g]
+        if any(g not in analytics.GROUP_COLUMNS for g in group_by):
+            raise ValueError(f"group_by must be a subset of {analytics.GROUP_COLUMNS}")
+        summary = analytics.get_movement_summary(
+            start, end,
+            granularity=request.args.get('granularity', 'day'),
+            group_by=group_by,
+            rack=request.args.get('rack'),
+            slot=request.args.get('slot', type=int),
+            movement=request.args.get('movement'),
+        )
+        return jsonify(summary), 200
+    except ValueError as e:
+        return jsonify({"error": get_error_message("invalid_analytics_params"), "message": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error fetching movement analytics: {e}", exc_info=True)
+        return jsonify({"error": get_error_message("fetch_analytics_error"), "message": str(e)}), 500
+
+@app.route("/api/analytics/busiest-slots")
+@token_required
+def analytics_busiest_slots():
+    """Slots ranked by completed movements in the date range."""
+    try:
+        start, end = _analytics_range()
+        slots = analytics.get_busiest_slots(
+            start, end,
+            limit=min(request.args.get('limit', default=10, type=int), 240),
+            rack=request.args.get('rack'),
+            movement=request.args.get('movement'),
+        )
+        return jsonify(slots), 200
+    except ValueError as e:
+        return jsonify({"error": get_error_message("invalid_analytics_params"), "message": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error fetching busiest slots: {e}", exc_info=True)
+        return jsonify({"error": get_error_message("fetch_analytics_error"), "message": str(e)}), 500
+
+@app.route("/api/analytics/phases")
+@token_required
+def analytics_phases():
+    """Per-phase duration percentiles (claim, serial echo/mechanical per leg, inventory, history) of worker runs."""
+    try:
+        start, end = _analytics_range()
+        group_by = [g for g in request.args.get('group_by', 'rack,movement_type').split(',') if g]
+        if any(g not in task_phases.GROUP_COLUMNS for g in group_by):
+            raise ValueError(f"group_by must be a subset of {task_phases.GROUP_COLUMNS}")
+        outcome = request.args.get('outcome', 'done')
+        if outcome not in ('done', 'retry', 'failed', 'all'):
+            raise ValueError("outcome must be one of done, retry, failed, all")
+        summary = task_phases.get_phase_summary(
+            start, end,
+            group_by=group_by,
+            rack=request.args.get('rack'),
+            slot=request.args.get('slot', type=int),
+            movement=request.args.get('movement'),
+            outcome=None if outcome == 'all' else outcome,
+        )
+        return jsonify(summary), 200
+    except ValueError as e:
+        return jsonify({"error": get_error_message("invalid_analytics_params"), "message": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error fetching task phase analytics: {e}", exc_info=True)
+        return jsonify({"error": get_error_message("fetch_analytics_error"), "message": str(e)}), 500
 
 # ---- record JSON ----
 @app.route("/api/record", methods=["POST"])
 @token_required
 def record_inventory_and_queue_tasks():
-    # Gate: deny new batch while system is busy
-    if _system_busy(min_idle_seconds=1):
-        return jsonify({
-            "message": "아직 작동중입니다.",
-            "status": "busy"
-        }), 429
     data = request.get_json()
     if not isinstance(data, list):
         return jsonify({
             "success": False, 
             "message": get_error_message("invalid_data_format")
         }), 400
+    try:
+        priority = task_queue.parse_priority(request.args.get("priority"))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     
-    success, message = add_records(data) 
+    # Busy system: the batch is queued and released when the current work drains
+    # (urgent batches go straight to the work queue)
+    result = admission_queue.submit('record', data, request.user, priority=priority)
     
-    if success:
+    if result["status"] == "accepted":
         return jsonify({
             "success": True, 
             "message": "작업이 성공적으로 처리되었습니다"
         }), 200
+    elif result["status"] == "queued":
+        return jsonify({
+            "success": True,
+            "status": "queued",
+            "batch_id": result["batch_id"],
+            "position": result["position"],
+            "message": get_error_message("batch_queued", position=result["position"])
+        }), 202
+    elif result["status"] == "full":
+        return jsonify({
+            "success": False,
+            "status": "busy",
+            "message": get_error_message("admission_queue_full")
+        }), 429
     else:
         return jsonify({
             "success": False, 
-            "message": message
+            "message": result["message"]
         }), 500
 
 # ---- New Work Tasks Endpoint ----
@@ -404,6 +766,7 @@ def record_inventory_and_queue_tasks():
 @token_required
 def get_work_tasks_route():
     status = request.args.get("status")
+    batch_id = request.args.get("batch_id")
     try:
         # Get user info from token_required decorator
         user_info = getattr(request, 'user', None)
@@ -411,9 +774,26 @@ def get_work_tasks_route():
             return jsonify({
                 "error": get_error_message("invalid_credentials")
             }), 401
+
+        # ?limit= or ?cursor= switches to keyset pagination with the envelope {items, next_cursor}
+        cursor = request.args.get("cursor")
+        if cursor or "limit" in request.args:
+            tasks, next_cursor = task_queue.get_work_tasks_page(
+                status, user_info,
+                limit=page_size(request.args.get("limit", type=int)),
+                cursor=cursor,
+                order=request.args.get("order", "asc"),
+                batch_id=batch_id,
+            )
+            return jsonify({"items": tasks, "next_cursor": next_cursor}), 200
             
-        tasks = task_queue.get_work_tasks_by_status(status, user_info)
+        tasks = task_queue.get_work_tasks_by_status(status, user_info, batch_id)
         return jsonify(tasks), 200
+    except ValueError as e:
+        return jsonify({
+            "error": get_error_message("invalid_cursor"),
+            "message": str(e)
+        }), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching work tasks: {e}", exc_info=True)
         return jsonify({
@@ -421,6 +801,31 @@ def get_work_tasks_route():
             "message": str(e)
         }), 500
 
+@app.route("/api/work-tasks/<int:task_id>/attempts")
+@token_required
+def get_task_attempts_route(task_id):
+    """Run history of one task (retries with their serial status and backoff)."""
+    try:
+        user_info = request.user
+        task = task_queue.get_task_by_id(task_id)
+        if not task or (user_info.get('role') != 'admin' and task['created_by'] != user_info['id']):
+            return jsonify({
+                "error": get_error_message("task_not_found")
+            }), 404
+        return jsonify({
+            "task_id": task_id,
+            "status": task['status'],
+            "attempts": task_queue.get_task_attempts(task_id),
+            "not_before": task['not_before'],
+            "legs_done": task['legs_done']
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching task attempts: {e}", exc_info=True)
+        return jsonify({
+            "error": get_error_message("fetch_tasks_error"),
+            "message": str(e)
+        }), 500
+
 @app.route("/api/pending-task-counts")
 @token_required
 def get_pending_task_counts_route():
@@ -441,15 +846,22 @@ def get_pending_task_counts_route():
             "message": str(e)
         }), 500
 
+@app.route("/api/dashboard-summary")
+@token_required
+def dashboard_summary_route():
+    """Every dashboard counter (status × movement) in one response."""
+    try:
+        return jsonify(dashboard_state.summary(request.user)), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching dashboard summary: {e}", exc_info=True)
+        return jsonify({
+            "error": get_error_message("fetch_counts_error"),
+            "message": str(e)
+        }), 500
+
 @app.route("/api/upload-tasks", methods=["POST"])
 @token_required
 def upload_tasks_route():
-    # Gate: deny new batch while system is busy
-    if _system_busy(min_idle_seconds=1):
-        return jsonify({
-            "message": "아직 작동중입니다.",
-            "status": "busy"
-        }), 429
     if not request.is_json:
         return jsonify({
             "error": get_error_message("json_body_required")
@@ -468,6 +880,15 @@ def upload_tasks_route():
             "errors": []
         }), 200
 
+    try:
+        # ?priority=low|normal|high|urgent (or 0-3) applies to every task of the batch
+        priority = task_queue.parse_priority(request.args.get("priority"))
+    except ValueError as e:
+        return jsonify({
+            "error": get_error_message("invalid_request_body"),
+            "message": str(e)
+        }), 400
+
     app.logger.debug(f"--- /api/upload-tasks: Received {len(tasks_data)} tasks. Processing as a single batch. ---")
     
     batch_id = str(uuid.uuid4())
@@ -478,17 +899,40 @@ def upload_tasks_route():
             "error": get_error_message("invalid_credentials")
         }), 401
 
-    success, message = add_records(tasks_data, batch_id, user_info)
+    # Busy system: the batch is queued and released when the current work drains
+    # (urgent batches go straight to the work queue)
+    result = admission_queue.submit('upload', tasks_data, user_info, batch_id, priority)
 
-    if success:
+    if result["status"] == "accepted":
         app.logger.info(f"--- /api/upload-tasks: Batch {batch_id} processed successfully. {len(tasks_data)} tasks queued. ---")
         return jsonify({
             "message": f"{len(tasks_data)}개의 작업이 성공적으로 처리되어 대기열에 추가되었습니다",
             "processed_count": len(tasks_data),
             "errors": [],
-            "batch_id": batch_id
+            "batch_id": batch_id,
+            "priority": task_queue.PRIORITY_NAMES[priority]
         }), 200
+    elif result["status"] == "queued":
+        app.logger.info(f"--- /api/upload-tasks: Batch {batch_id} admitted to the queue at position {result['position']}. ---")
+        return jsonify({
+            "message": get_error_message("batch_queued", position=result["position"]),
+            "status": "queued",
+            "processed_count": 0,
+            "queued_count": len(tasks_data),
+            "position": result["position"],
+            "errors": [],
+            "batch_id": batch_id,
+            "priority": task_queue.PRIORITY_NAMES[priority]
+        }), 202
+    elif result["status"] == "full":
+        return jsonify({
+            "message": get_error_message("admission_queue_full"),
+            "status": "busy",
+            "processed_count": 0,
+            "errors": []
+        }), 429
     else:
+        message = result["message"]
         app.logger.error(f"--- /api/upload-tasks: Error processing batch {batch_id}: {message}. Attempted {len(tasks_data)} tasks. ---")
         return jsonify({
             "message": f"배치 처리 중 오류 발생: {message}",
@@ -496,6 +940,32 @@ def upload_tasks_route():
             "errors": [message]
         }), 400
 
+@app.route("/api/admission-queue")
+@token_required
+def admission_queue_route():
+    """Batches waiting for the current work to drain, in release order."""
+    try:
+        return jsonify({
+            "items": admission_queue.list(request.user),
+            "queued": admission_queue.queued_count()
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching admission queue: {e}", exc_info=True)
+        return jsonify({
+            "error": get_error_message("fetch_admission_queue_error"),
+            "message": str(e)
+        }), 500
+
+@app.route("/api/admission-queue/<batch_id>", methods=["DELETE"])
+@token_required
+def cancel_queued_batch_route(batch_id):
+    """Withdraw a queued batch before it is released (owner or admin)."""
+    if not admission_queue.cancel(batch_id, request.user):
+        return jsonify({
+            "error": get_error_message("queued_batch_not_found")
+        }), 404
+    return jsonify({"success": True, "batch_id": batch_id}), 200
+
 @app.route("/api/download-batch-task/<batch_id>")
 @token_required
 def download_batch_task(batch_id):
@@ -576,6 +1046,7 @@ def reset_system():
         
         # Clear task queues
         task_queue.clear_all_queues()
+        admission_queue.clear()
         app.logger.info("Task queues cleared")
         
         # Emit reset signal to all connected clients
@@ -727,8 +1198,17 @@ def after_request(response):
     return response
 
 # ───── run ─────
+def serve(host="0.0.0.0", port=5001):
+    """Run the HTTP + Socket.IO server: Werkzeug (threading) or eventlet.wsgi (eventlet)."""
+    app.logger.info("Starting Flask-SocketIO server in %s mode on port %s", app.config['ASYNC_MODE'], port)
+    if app.config['ASYNC_MODE'] == 'eventlet':
+        # what socketio.run() does, with a listen backlog above eventlet's 50
+        import eventlet, eventlet.wsgi
+        listener = eventlet.listen((host, port), backlog=app.config['SERVER_BACKLOG'])
+        eventlet.wsgi.server(listener, app, log_output=False, max_size=app.config['SERVER_MAX_CONNECTIONS'])
+        return
+    # Werkzeug refuses to run outside a terminal (systemd) without allow_unsafe_werkzeug
+    socketio.run(app, host=host, port=port, debug=False, use_reloader=False, allow_unsafe_werkzeug=True)
+
 if __name__ == "__main__":
-    print("Starting Flask-SocketIO server with threading mode on port 5001...")
-    print(f"SocketIO server instance: {socketio.server}") # Log the server instance
-    socketio.run(app, host="0.0.0.0", port=5001, debug=False, use_reloader=False, allow_unsafe_werkzeug=True)
-    # allow_unsafe_werkzeug=True might be needed for newer Werkzeug versions if use_reloader=False and debug=True 
\ No newline at end of file
+    serve() 
\ No newline at end of file
@@ -0,0 +1,167 @@
+# archive.py
+"""
+Compressed cold storage for the append-only history tables.
+
+Old rows of product_logs and camera_batch_history are moved out of the
+SQLite file (by the retention job, retention.py) into segment files:
+
+  <ARCHIVE_DIR>/<table>/<table>-<first_id>-<last_id>.jsonl.gz
+
+Each segment holds one chunk of rows sorted by id, one JSON object per line.
+The archive_segments table indexes every segment by id range and time range,
+so readers only open the segments that can contain what they look for.
+Segments never change once written; the segment row is inserted in the same
+transaction that deletes the source rows, so a row is always either live or
+archived.
+
+Readers:
+  rows_before()  newest archived rows below an id (camera history paging)
+  iter_rows()    archived rows in a time range, oldest first
+"""
+
+import gzip, json, logging, os, sqlite3
+from functools import lru_cache
+from . import db
+
+logger = logging.getLogger(__name__)
+
+# table → column holding the row's time (for retention cutoffs and time-range lookups)
+ARCHIVED_TABLES = {
+    "product_logs": "timestamp",
+    "camera_batch_history": "created_at",
+}
+
+ARCHIVE_DIR = None      # None: <database dir>/archive
+
+
+def configure(config):
+    """Apply app.config['ARCHIVE_DIR'] (call once at startup)."""
+    global ARCHIVE_DIR
+    ARCHIVE_DIR = config.get('ARCHIVE_DIR') or None
+
+
+def archive_dir() -> str:
+    return ARCHIVE_DIR or os.path.join(os.path.dirname(db.DB_NAME), "archive")
+
+
+# ───── writing ─────
+def write_segment(cur, table: str, rows: list) -> str:
+    """
+    Write `rows` (dicts with an 'id') as a new segment and register it with `cur`.
+    The caller deletes the source rows on the same connection and commits; if
+    that fails it must call discard_segment() with the returned path.
+    """
+    time_column = ARCHIVED_TABLES[table]
+    rows = sorted(rows, key=lambda row: row['id'])
+    first_id, last_id = rows[0]['id'], rows[-1]['id']
+    times = [row[time_column] for row in rows if row.get(time_column)]
+    relative_path = os.path.join(table, f"{table}-{first_id}-{last_id}.jsonl.gz")
+    path = os.path.join(archive_dir(), relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    cur.execute("""
+        INSERT INTO archive_segments (table_name, path, first_id, last_id, min_time, max_time, row_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (table, relative_path, first_id, last_id, min(times, default=None), max(times, default=None), len(rows)))
+    return path
+
+
+def discard_segment(path: str):
+    """Remove a segment file whose transaction was rolled back."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ───── reading ─────
+@lru_cache(maxsize=32)
+def _load_segment(path: str) -> tuple:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return tuple(json.loads(line) for line in f if line.strip())
+
+
+def _segment_rows(relative_path: str) -> list:
+    try:
+        return [dict(row) for row in _load_segment(os.path.join(archive_dir(), relative_path))]
+    except OSError as e:
+        logger.error(f"Archive segment {relative_path} unreadable: {e}")
+        return []
+
+
+def rows_before(table: str, before_id=None, limit=50, above_id=None) -> list:
+    """
+    Newest archived rows of `table` with id < before_id (and id > above_id),
+    at most `limit`, ordered by id DESC.
+    """
+    query = "SELECT path, first_id, last_id FROM archive_segments WHERE table_name = ?"
+    params = [table]
+    if before_id is not None:
+        query += " AND first_id < ?"
+        params.append(before_id)
+    if above_id is not None:
+        query += " AND last_id > ?"
+        params.append(above_id)
+    query += " ORDER BY last_id DESC"
+
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        segments = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+    found = []
+    for path, first_id, last_id in segments:
+        # Segments are visited by descending last_id; once we hold `limit` rows
+        # that are all newer than this segment, nothing older can get in.
+        if len(found) >= limit and last_id < found[limit - 1]['id']:
+            break
+        for row in _segment_rows(path):
+            if before_id is not None and row['id'] >= before_id:
+                continue
+            if above_id is not None and row['id'] <= above_id:
+                continue
+            found.append(row)
+        found.sort(key=lambda row: row['id'], reverse=True)
+        del found[limit:]
+    return found
+
+
+def iter_rows(table: str, time_from=None, time_to=None, conn=None):
+    """
+    Archived rows of `table` whose time column is in [time_from, time_to), oldest segment first.
+    Pass `conn` when the caller holds a write transaction on the main database
+    (a second connection would wait on its lock).
+    """
+    time_column = ARCHIVED_TABLES[table]
+    query = "SELECT path FROM archive_segments WHERE table_name = ?"
+    params = [table]
+    if time_from is not None:
+        query += " AND max_time >= ?"
+        params.append(time_from)
+    if time_to is not None:
+        query += " AND min_time < ?"
+        params.append(time_to)
+    query += " ORDER BY first_id"
+
+    own_connection = conn is None
+    if own_connection:
+        conn = sqlite3.connect(db.DB_NAME)
+    try:
+        paths = [row[0] for row in conn.execute(query, params).fetchall()]
+    finally:
+        if own_connection:
+            conn.close()
+
+    for path in paths:
+        for row in _segment_rows(path):
+            value = row.get(time_column)
+            if time_from is not None and (value is None or value < time_from):
+                continue
+            if time_to is not None and (value is None or value >= time_to):
+                continue
+            yield row
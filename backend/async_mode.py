@@ -0,0 +1,85 @@
+# async_mode.py
+"""
+How the backend serves connections (INU_ASYNC_MODE).
+
+  threading  Werkzeug's server, one OS thread per connection. Every open
+             MJPEG stream and every Socket.IO long-poll holds a thread and
+             its stack for as long as it stays open. Default for development.
+  eventlet   eventlet.wsgi with monkey patching: sockets, sleeps, locks and
+             the background threads become green threads that share the hub
+             thread, so an idle Socket.IO client or MJPEG viewer costs a few
+             KB. Serial I/O already waits in select() / time.sleep(), which
+             the patch makes cooperative. C calls that block without
+             yielding (cv2 capture and JPEG encode, bcrypt, the long SQLite
+             steps of backup / vacuum / ANALYZE / retention) go through
+             offload(), which runs them on eventlet's OS thread pool (tpool).
+             Short request queries still run on the hub.
+
+patch() has to run before anything imports socket or threading, so app.py
+calls it on its first line; the systemd unit sets INU_ASYNC_MODE=eventlet.
+"""
+
+import _thread, os, sqlite3, time
+
+MODES = ("threading", "eventlet")
+ASYNC_MODE = os.environ.get("INU_ASYNC_MODE", "threading").strip().lower()
+# One capture loop per camera rack + the bcrypt workers. eventlet's default of
+# 20 threads doubled the RSS under MJPEG load (each thread keeps its own malloc
+# arena full of frame buffers); EVENTLET_THREADPOOL_SIZE overrides it.
+DEFAULT_TPOOL_THREADS = 6
+
+_tpool = None
+_sleep = time.sleep
+_os_thread_ident = _thread.get_ident
+
+
+def patch():
+    """Monkey patch for eventlet (no-op for threading). Idempotent."""
+    global _tpool, _sleep, _os_thread_ident
+    if ASYNC_MODE not in MODES:
+        raise ValueError(f"INU_ASYNC_MODE must be one of {', '.join(MODES)}, not {ASYNC_MODE!r}")
+    if ASYNC_MODE == "eventlet" and _tpool is None:
+        import eventlet
+        eventlet.monkey_patch()
+        from eventlet import patcher, tpool
+        tpool.set_num_threads(int(os.environ.get("EVENTLET_THREADPOOL_SIZE", DEFAULT_TPOOL_THREADS)))
+        _sleep = patcher.original("time").sleep
+        _os_thread_ident = patcher.original("_thread").get_ident
+        _tpool = tpool
+
+
+def patched():
+    """True once patch() switched the process to eventlet (threads are greenlets on the hub)."""
+    return _tpool is not None
+
+
+def os_thread_ident():
+    """Ident of the calling OS thread; under eventlet threading.get_ident() is the greenlet's."""
+    return _os_thread_ident()
+
+
+def offload(fn, *args, **kwargs):
+    """
+    Run a blocking call on a real OS thread and wait for it without blocking the hub.
+
+    With threading the caller already has its own thread, so fn runs inline.
+    fn must not take locks, log or emit: under eventlet those are green
+    objects that only work on the hub's thread.
+    """
+    if _tpool is None:
+        return fn(*args, **kwargs)
+    return _tpool.execute(fn, *args, **kwargs)
+
+
+def blocking_sleep(seconds):
+    """time.sleep for code inside offload(): blocks its OS thread instead of switching to the hub."""
+    _sleep(seconds)
+
+
+def connect_for_offload(path, **kwargs):
+    """
+    SQLite connection for code inside offload(). It is a plain sqlite3.Connection
+    (not the metrics-timed one, whose observers take locks) and may be used from
+    whichever pool thread runs the next offloaded step.
+    """
+    return sqlite3.connect(path, factory=sqlite3.Connection, check_same_thread=False, **kwargs)
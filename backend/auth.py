@@ -1,19 +1,94 @@
 # auth.py
-import datetime, sqlite3, jwt, uuid
+import datetime, sqlite3, jwt, threading, time
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify, current_app
-from passlib.hash import bcrypt
 from .db import DB_NAME
 from .error_messages import get_error_message
+from .retention import retention_job
+from .passwords import password_hasher, HashPoolBusy
+from .session_store import create_session_store, SESSION_TTL_SECONDS
+from .dashboard_state import dashboard_state
 
 SECRET = "ChangeThisSecret!"  # 환경변수로 바꾸길 권장
 
-# Global variable to track the current active session
-current_active_session = None
+# ───── 인증 사용자 캐시 (session_id → users row) ─────
+# token_required used to open a connection and query `users` on every request.
+# Entries expire after USER_CACHE_TTL seconds, which also bounds how long a
+# change made by another process (add_user.py from the shell) can go unseen.
+USER_CACHE_TTL = 30
+USER_CACHE_MAX_ENTRIES = 256
+
+
+class UserCache:
+    """Bounded LRU + TTL cache of the user record behind a session."""
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # session_id → (expires_at, user dict)
+        self._lock = threading.Lock()
+
+    def get(self, session_id, username):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if not entry:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic() or user['username'] != username:
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return dict(user)
+
+    def put(self, session_id, user):
+        with self._lock:
+            self._entries[session_id] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_session(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def invalidate_user(self, username):
+        with self._lock:
+            for session_id in [sid for sid, (_, user) in self._entries.items() if user['username'] == username]:
+                del self._entries[session_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def invalidate_user(username):
+    """Drop cached records of `username` after its users row changed (call after commit)."""
+    user_cache.invalidate_user(username)
+
+
+# Active login sessions (single-active-session policy), shared by all
+# backend processes. configure_session_store() picks the backend at startup.
+session_store = None
+
+
+def configure_session_store(config=None):
+    global session_store
+    session_store = create_session_store(config)
+    user_cache.clear()
+    return session_store
+
+
+def _sessions():
+    if session_store is None:
+        configure_session_store()
+    return session_store
+
 
 def authenticate(username, password):
-    global current_active_session
-    
     conn = sqlite3.connect(DB_NAME)
     cur = conn.cursor()
     
@@ -22,8 +97,16 @@ def authenticate(username, password):
         cur.execute("SELECT id, hashed_password, role, display_name FROM users WHERE username=?", (username,))
         row = cur.fetchone()
         
-        if not row or not bcrypt.verify(password, row[1]):
+        if not row:
+            return None
+        # bcrypt runs in the hashing pool (raises HashPoolBusy when saturated)
+        ok, new_hash = password_hasher.verify(password, row[1])
+        if not ok:
             return None
+        if new_hash:
+            # Stored hash used a different BCRYPT_ROUNDS: upgrade it now
+            cur.execute("UPDATE users SET hashed_password = ? WHERE id = ?", (new_hash, row[0]))
+            current_app.logger.info(f"Upgraded password hash for user '{username}' to {password_hasher.rounds} rounds")
             
         # Update login counter
         cur.execute("SELECT count FROM login_counter WHERE id = 1")
@@ -33,8 +116,9 @@ def authenticate(username, password):
         
         # Update counter
         if new_count == 0:  # Every 5th login
-            # Clear rack status by deleting product_logs
-            cur.execute("DELETE FROM product_logs")
+            # Old product_logs are purged by the background retention job
+            # (retention.py), never inside the login transaction
+            retention_job.request_run()
             # Reset counter and update timestamp
             cur.execute("""
                 UPDATE login_counter 
@@ -45,24 +129,18 @@ def authenticate(username, password):
             # Just increment counter
             cur.execute("UPDATE login_counter SET count = ? WHERE id = 1", (new_count,))
         
-        # Generate a unique session ID
-        session_id = str(uuid.uuid4())
-        
-        # Log previous session before invalidating
-        previous_session = current_active_session
-        if previous_session:
+        conn.commit()
+
+        # Start the new session; every other session ends here (in every process)
+        session, replaced = _sessions().create(row[0], username, SESSION_TTL_SECONDS)
+        session_id = session['session_id']
+        for previous_session in replaced:
+            user_cache.invalidate_session(previous_session['session_id'])
+            dashboard_state.drop_sessions([previous_session['session_id']])
             current_app.logger.warning(f"🔄 MULTIPLE LOGIN DETECTED: Previous session invalidated for user '{previous_session['username']}' with session ID: {previous_session['session_id']}")
             current_app.logger.warning(f"🔄 New login attempt by user '{username}' - this will create session ID: {session_id}")
             current_app.logger.warning(f"🔄 This indicates multiple browser tabs or duplicate login attempts")
         
-        # Invalidate any previous session by updating the global session
-        current_active_session = {
-            'session_id': session_id,
-            'username': username,
-            'user_id': row[0],
-            'login_time': datetime.datetime.utcnow()
-        }
-        
         # Create JWT token with session ID
         token = jwt.encode(
             {"sub": username,
@@ -70,39 +148,58 @@ def authenticate(username, password):
              "role": row[2],
              "display_name": row[3],
              "session_id": session_id,
-             "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=12)},
+             "exp": datetime.datetime.utcnow() + datetime.timedelta(seconds=SESSION_TTL_SECONDS)},
             SECRET, algorithm="HS256")
         
         current_app.logger.info(f"✅ New session created for user '{username}' with session ID: {session_id}")
-        
-        conn.commit()
         return token
         
+    except HashPoolBusy:
+        raise
     except Exception as e:
         current_app.logger.error(f"Error in authenticate: {str(e)}", exc_info=True)
         return None
     finally:
         conn.close()
 
-def logout_current_session():
-    """Logout the current active session"""
-    global current_active_session
-    if current_active_session:
-        current_app.logger.info(f"🚪 Session {current_active_session['session_id']} for user '{current_active_session['username']}' logged out")
-        current_active_session = None
+def logout_current_session(session_id=None):
+    """Logout `session_id` (default: the current active session)"""
+    session = _sessions().get(session_id) if session_id else _sessions().current()
+    if session and _sessions().delete(session['session_id']):
+        current_app.logger.info(f"🚪 Session {session['session_id']} for user '{session['username']}' logged out")
+        user_cache.invalidate_session(session['session_id'])
+        dashboard_state.drop_sessions([session['session_id']], reason="logout")
         return True
     return False
 
+def session_active(session_id):
+    """Whether `session_id` is still the live login session."""
+    return bool(session_id) and _sessions().get(session_id) is not None
+
 def get_current_session_info():
     """Get information about the current active session"""
-    global current_active_session
-    return current_active_session
+    return _sessions().current()
+
+def user_from_token(token):
+    """Validate a JWT outside of an HTTP request (e.g. Socket.IO events).
+    Returns the same user dict token_required puts on request.user, or None."""
+    try:
+        decoded = jwt.decode(token, SECRET, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+    if not decoded.get('session_id') or not _sessions().get(decoded['session_id']):
+        return None
+    return {
+        'id': decoded['user_id'],
+        'username': decoded['sub'],
+        'role': decoded.get('role'),
+        'display_name': decoded.get('display_name'),
+        'session_id': decoded.get('session_id')
+    }
 
 def token_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
-        global current_active_session
-        
         hdr = request.headers.get("Authorization", "")
         if not hdr.startswith("Bearer "):
             return jsonify({"error": get_error_message("token_required")}), 401
@@ -112,63 +209,51 @@ def token_required(f):
             username = decoded['sub']
             token_session_id = decoded.get('session_id')
             
-            # Add detailed logging for session validation
-            current_app.logger.debug(f"🔍 Token validation for user '{username}' with session ID: {token_session_id}")
-            if current_active_session:
-                current_app.logger.debug(f"🔍 Current active session: user '{current_active_session['username']}' with session ID: {current_active_session['session_id']}")
-            else:
-                current_app.logger.debug("🔍 No current active session")
-            
-            # Special case: if no active session exists (e.g., after server restart)
-            # and we have a valid JWT token, re-establish the session
-            if not current_active_session and token_session_id:
-                current_app.logger.info(f"🔄 Re-establishing session for user '{username}' after server restart")
-                current_active_session = {
-                    'session_id': token_session_id,
-                    'username': username,
-                    'user_id': decoded['user_id'],
-                    'login_time': datetime.datetime.utcnow()  # Use current time since we don't have original
-                }
-            
-            # Check if this token's session is the current active session
-            elif current_active_session['session_id'] != token_session_id:
+            # Check if this token's session is the active one (survives restarts, shared across processes)
+            if not token_session_id or not _sessions().get(token_session_id):
                 current_app.logger.warning(f"❌ Session validation failed for user '{username}' with session ID: {token_session_id}")
-                current_app.logger.warning(f"❌ Expected session ID: {current_active_session['session_id']}")
                 current_app.logger.warning(f"❌ This usually means multiple browser tabs or a new login invalidated this session")
                 return jsonify({
-                    "error": "세션이 만료되었습니다. 다른 사용자가 로그인했거나 다른 탭에서 로그인했습니다.",
+                    "error": get_error_message("session_invalidated"),
                     "code": "session_invalidated"
                 }), 401
             
-            # Get user info from database
-            conn = None
-            try:
-                conn = sqlite3.connect(DB_NAME)
-                cur = conn.cursor()
-                cur.execute("SELECT id, role, display_name FROM users WHERE username=?", (username,))
-                user_row = cur.fetchone()
+            # Get user info (cached per session, falls back to the database).
+            # The view is called after this try on both paths, so its own errors
+            # (werkzeug HTTPExceptions included) never become an 'unexpected_error' 500
+            cached_user = user_cache.get(token_session_id, username)
+            if cached_user:
+                request.user = cached_user
+            else:
+                conn = None
+                try:
+                    conn = sqlite3.connect(DB_NAME)
+                    cur = conn.cursor()
+                    cur.execute("SELECT id, role, display_name FROM users WHERE username=?", (username,))
+                    user_row = cur.fetchone()
                 
-                if not user_row:
-                    current_app.logger.error(f"❌ User {username} not found in database")
-                    return jsonify({"error": get_error_message("invalid_credentials")}), 401
+                    if not user_row:
+                        current_app.logger.error(f"❌ User {username} not found in database")
+                        return jsonify({"error": get_error_message("invalid_credentials")}), 401
                 
-                # Set user info in request object
-                request.user = {
-                    'id': user_row[0],
-                    'username': username,
-                    'role': user_row[1],
-                    'display_name': user_row[2],
-                    'session_id': token_session_id
-                }
+                    # Set user info in request object
+                    request.user = {
+                        'id': user_row[0],
+                        'username': username,
+                        'role': user_row[1],
+                        'display_name': user_row[2],
+                        'session_id': token_session_id
+                    }
+                    user_cache.put(token_session_id, request.user)
                 
-                current_app.logger.debug(f"✅ Token validation successful for user '{username}'")
+                    current_app.logger.debug("✅ Token validation successful for user '%s'", username)
                 
-            except sqlite3.Error as e:
-                current_app.logger.error(f"❌ Database error in token validation: {str(e)}")
-                return jsonify({"error": get_error_message("database_error")}), 500
-            finally:
-                if conn:
-                    conn.close()
+                except sqlite3.Error as e:
+                    current_app.logger.error(f"❌ Database error in token validation: {str(e)}")
+                    return jsonify({"error": get_error_message("database_error")}), 500
+                finally:
+                    if conn:
+                        conn.close()
                     
         except jwt.ExpiredSignatureError:
             current_app.logger.info(f"⏰ Expired token for user")
@@ -182,3 +267,13 @@ def token_required(f):
             
         return f(*args, **kwargs)
     return wrapper
+
+def admin_required(f):
+    """Use below @token_required: rejects non-admin users with 403."""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        user_info = getattr(request, 'user', None)
+        if not user_info or user_info.get('role') != 'admin':
+            return jsonify({"error": get_error_message("admin_required")}), 403
+        return f(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,13 @@
+"""
+Benchmarks for the backend.
+
+Each benchmark boots the real Flask app (in-process, or one server process per
+serving mode for serving.py) against a temporary database (INU_DB_PATH) and,
+where the serial path matters, the PTY hardware simulator (hw_simulator.py),
+then writes a JSON report:
+
+  python -m backend.benchmarks.pipeline --tasks 30 --output pipeline.json
+  python -m backend.benchmarks.pipeline --baseline pipeline.json   # fail on regression
+  python -m backend.benchmarks.http_load --product-logs 1000000 --tablets 8 --output load.json
+  python -m backend.benchmarks.serving --modes threading,eventlet --output serving.json
+"""
@@ -0,0 +1,191 @@
+"""
+Shared benchmark helpers: temp environment, app boot, per-stage SQLite timing,
+percentiles and JSON reports.
+"""
+
+import contextlib, datetime, http.client, json, os, platform, sys, tempfile, threading, urllib.parse
+from backend.percentiles import percentile   # no backend.db import: safe before prepare_environment()
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+
+
+def prepare_environment(workdir=None, serial_ports=None) -> str:
+    """
+    Point the backend at a temporary database and the given serial ports.
+    Must run before anything imports backend.db (DB_NAME is read at import).
+
+    Returns:
+        the working directory (database.db, sessions.db, backups live there)
+    """
+    if "backend.db" in sys.modules:
+        raise RuntimeError("prepare_environment() must run before the backend is imported")
+    workdir = workdir or tempfile.mkdtemp(prefix="inu-bench-")
+    os.environ["INU_DB_PATH"] = os.path.join(workdir, "database.db")
+    if serial_ports:
+        os.environ["INU_SERIAL_ENABLED"] = "1"
+        os.environ["INU_SERIAL_PORTS"] = serial_ports
+    else:
+        os.environ["INU_SERIAL_ENABLED"] = "0"
+    # no V4L scans from the dashboard's camera list while the benchmark runs
+    os.environ.setdefault("INU_CAMERA_SOURCE", "synthetic")
+    return workdir
+
+
+def boot_app(quiet=True):
+    """Create the benchmark admin, import backend.app (discovery, reset, worker) and return the Flask app."""
+    from backend import db
+    db.init_db()
+    with silenced(quiet):
+        from backend.add_user import add_user_to_db
+        add_user_to_db(BENCH_USER, BENCH_PASSWORD, "Benchmark", "admin")
+        from backend import app as app_module
+    return app_module.app
+
+
+def login(client) -> dict:
+    response = client.post("/api/login", json={"username": BENCH_USER, "password": BENCH_PASSWORD})
+    if response.status_code != 200:
+        raise RuntimeError(f"benchmark login failed: {response.status_code} {response.get_json()}")
+    return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+
+def http_login(base_url, username, password) -> str:
+    """Log in against a running server and return the bearer token."""
+    url = urllib.parse.urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+    try:
+        conn.request("POST", "/api/login", body=json.dumps({"username": username, "password": password}),
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"login failed for {username}: {response.status} {body[:200]!r}")
+        return json.loads(body)["token"]
+    finally:
+        conn.close()
+
+
+@contextlib.contextmanager
+def silenced(enabled=True):
+    """Silence the backend's print() and INFO logging (discovery, login and worker messages)."""
+    if not enabled:
+        yield
+        return
+    import logging
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.WARNING)
+    for name in ("werkzeug", "engineio", "socketio", "backend"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            yield
+        finally:
+            root.setLevel(level)
+
+
+# ───── SQLite time per stage ─────
+class DBTimer:
+    """
+    Time spent in sqlite3 execute/fetch/commit, keyed by the backend function that
+    issued the call (e.g. 'task_queue.claim_next_task'), collected through the
+    same sqlite3 hook as the inu_db_query_seconds metric (metrics.add_sqlite_observer).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def install(self):
+        from backend import metrics
+        metrics.add_sqlite_observer(self._observe)
+
+    def uninstall(self):
+        from backend import metrics
+        metrics.remove_sqlite_observer(self._observe)
+
+    def _observe(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+    def report(self, per=None) -> dict:
+        """{stage: {calls, total_ms, mean_ms[, per_task_ms]}}, largest total first."""
+        with self.lock:
+            stages = dict(self.stages)
+        report = {}
+        for stage, (calls, seconds) in sorted(stages.items(), key=lambda item: -item[1][1]):
+            entry = {"calls": calls, "total_ms": round(seconds * 1000, 3),
+                     "mean_ms": round(seconds * 1000 / calls, 4)}
+            if per:
+                entry["per_task_ms"] = round(seconds * 1000 / per, 3)
+            report[stage] = entry
+        return report
+
+
+# ───── statistics / output ─────
+def summarize(values, digits=4) -> dict:
+    """{count, mean, p50, p95, p99, max} of a list of numbers."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), digits),
+        "p50": round(percentile(values, 50), digits),
+        "p95": round(percentile(values, 95), digits),
+        "p99": round(percentile(values, 99), digits),
+        "max": round(max(values), digits),
+    }
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_report(report: dict, output=None):
+    """Print the JSON report and write it to `output` if given."""
+    report.setdefault("finished_at", datetime.datetime.now().isoformat(timespec="seconds"))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def lookup(report: dict, path: str):
+    """'per_task_s.overhead.p50' → value in a nested report (None if missing)."""
+    value = report
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(report: dict, baseline: dict, checks, tolerance: float) -> list:
+    """
+    Regressions of `report` against `baseline`.
+
+    checks: [(path, 'higher' | 'lower')] — which direction is better for the metric.
+    Returns a list of messages, empty when nothing regressed by more than `tolerance`.
+    """
+    regressions = []
+    for path, better in checks:
+        current, previous = lookup(report, path), lookup(baseline, path)
+        if current is None or previous in (None, 0):
+            continue
+        change = (current - previous) / abs(previous)
+        if (better == "higher" and change < -tolerance) or (better == "lower" and change > tolerance):
+            regressions.append(f"{path}: {previous} → {current} ({change:+.1%})")
+    return regressions
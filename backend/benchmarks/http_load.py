@@ -0,0 +1,240 @@
+"""
+HTTP load test for the tablet-facing read endpoints.
+
+Seeds a temp database with --product-logs movements (with their work_tasks,
+batch links and camera history), boots the app behind a threaded WSGI
+server and lets --tablets simulated tablets poll the API with a weighted mix
+and exponential think time:
+
+  inventory             /api/inventory, /api/inventory?rack=X
+  work-tasks            ?status=pending, ?status=in_progress, ?status=done&batch_id=...
+  activity-logs         ?limit=100&order=desc
+  camera-history        ?limit=50, ?limit=50&paginate=1
+  pending-task-counts   /api/pending-task-counts
+
+Reports requests, errors, throughput and p50/p95/p99 latency per endpoint.
+
+  python -m backend.benchmarks.http_load --product-logs 1000000 --tablets 8 --duration 60 --output load.json
+  python -m backend.benchmarks.http_load --url http://192.168.0.37:5001 --user admin:password
+
+Only one session is live at a time (a login ends every other one), so the
+tablets share a single login: --role admin sees every task, --role user only
+the operator's own. --url targets a running server instead (no seeding).
+"""
+
+import argparse, datetime, http.client, json, random, sys, threading, time, urllib.parse
+
+from .common import (BENCH_PASSWORD, BENCH_USER, compare, environment, http_login, prepare_environment,
+                     silenced, summarize, write_report)
+
+OPERATOR_USER = "bench-operator"
+
+ENDPOINTS = {
+    "inventory": ["/api/inventory", "/api/inventory?rack={rack}"],
+    "work-tasks": ["/api/work-tasks?status=pending", "/api/work-tasks?status=in_progress",
+                   "/api/work-tasks?status=done&batch_id={batch}"],
+    "activity-logs": ["/api/activity-logs?limit=100&order=desc"],
+    "camera-history": ["/api/camera-history?limit=50", "/api/camera-history?limit=50&paginate=1"],
+    "pending-task-counts": ["/api/pending-task-counts"],
+}
+DEFAULT_MIX = "pending-task-counts=4,inventory=3,work-tasks=2,activity-logs=2,camera-history=1"
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint in mix: {name!r} (known: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {name: [] for name in ENDPOINTS}     # latency seconds of 2xx responses
+        self.errors = {name: {} for name in ENDPOINTS}      # status / exception → count
+        self.bytes = {name: 0 for name in ENDPOINTS}
+
+    def record(self, endpoint, seconds, status, size):
+        with self.lock:
+            if 200 <= status < 300:
+                self.samples[endpoint].append(seconds)
+                self.bytes[endpoint] += size
+            else:
+                self.errors[endpoint][str(status)] = self.errors[endpoint].get(str(status), 0) + 1
+
+    def record_error(self, endpoint, error):
+        with self.lock:
+            key = type(error).__name__
+            self.errors[endpoint][key] = self.errors[endpoint].get(key, 0) + 1
+
+
+class Tablet(threading.Thread):
+    """One tablet: a persistent HTTP connection, weighted endpoint choice, exponential think time."""
+
+    def __init__(self, base_url, token, mix, think_s, batches, results, measure_from, deadline, seed):
+        super().__init__(daemon=True)
+        url = urllib.parse.urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.names, self.weights = list(mix), list(mix.values())
+        self.think_s = think_s
+        self.batches = batches or [""]
+        self.results = results
+        self.measure_from, self.deadline = measure_from, deadline
+        self.rng = random.Random(seed)
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        while time.perf_counter() < self.deadline:
+            endpoint = self.rng.choices(self.names, self.weights)[0]
+            path = self.rng.choice(ENDPOINTS[endpoint]).format(rack=self.rng.choice("ABC"),
+                                                               batch=self.rng.choice(self.batches))
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=self.headers)
+                response = conn.getresponse()
+                body = response.read()
+                elapsed = time.perf_counter() - started
+                if started >= self.measure_from:
+                    self.results.record(endpoint, elapsed, response.status, len(body))
+            except (OSError, http.client.HTTPException) as e:
+                if started >= self.measure_from:
+                    self.results.record_error(endpoint, e)
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            if self.think_s:
+                time.sleep(self.rng.expovariate(1.0 / self.think_s))
+        conn.close()
+
+
+def start_local_server(args, report):
+    """Seed a temp database, boot the app and serve it on an ephemeral port. Returns (base_url, account, batches, server)."""
+    prepare_environment(args.workdir)
+    from backend import db
+    db.init_db()
+    with silenced(not args.verbose):
+        from backend.add_user import add_user_to_db
+        add_user_to_db(BENCH_USER, BENCH_PASSWORD, "Benchmark", "admin")
+        add_user_to_db(OPERATOR_USER, BENCH_PASSWORD, "Benchmark operator", "user")
+    import sqlite3
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        owners = conn.execute("SELECT id, username FROM users WHERE username IN (?, ?) ORDER BY id",
+                              (BENCH_USER, OPERATOR_USER)).fetchall()
+    finally:
+        conn.close()
+
+    from .seed import seed_database
+    seeded = seed_database(db.DB_NAME, args.product_logs, owners, days=args.days, seed=args.seed)
+    batches = seeded.pop("recent_batches")
+    report["seed"] = seeded
+
+    boot_started = time.perf_counter()
+    with silenced(not args.verbose):
+        from backend import app as app_module
+    report["boot_s"] = round(time.perf_counter() - boot_started, 2)   # includes the derived-table backfills
+    from backend.maintenance import maintenance
+    maintenance.defer(args.warmup + args.duration + 3600)              # no backup / ANALYZE mid-run
+
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    account = (BENCH_USER if args.role == "admin" else OPERATOR_USER, BENCH_PASSWORD)
+    return f"http://127.0.0.1:{server.server_port}", account, batches, server
+
+
+def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    report = {
+        "benchmark": "http_load",
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": {"tablets": args.tablets, "role": args.role, "duration_s": args.duration,
+                   "warmup_s": args.warmup, "think_ms": args.think_ms, "mix": mix, "seed": args.seed,
+                   "target": args.url or "local"},
+    }
+    server = None
+    if args.url:
+        if not args.user or ":" not in args.user:
+            raise SystemExit("--url needs --user user:password")
+        base_url, account, batches = args.url.rstrip("/"), tuple(args.user.split(":", 1)), []
+    else:
+        base_url, account, batches, server = start_local_server(args, report)
+
+    with silenced(not args.verbose):
+        token = http_login(base_url, *account)
+        results = Results()
+        start = time.perf_counter()
+        measure_from, deadline = start + args.warmup, start + args.warmup + args.duration
+        tablets = [Tablet(base_url, token, mix, args.think_ms / 1000.0, batches, results,
+                          measure_from, deadline, args.seed + i)
+                   for i in range(args.tablets)]
+        for tablet in tablets:
+            tablet.start()
+        for tablet in tablets:
+            tablet.join()
+    if server:
+        server.shutdown()
+
+    endpoints, all_latencies, all_errors = {}, [], 0
+    for name in mix:
+        latencies = results.samples[name]
+        errors = sum(results.errors[name].values())
+        all_latencies.extend(latencies)
+        all_errors += errors
+        endpoints[name] = {
+            "requests": len(latencies) + errors,
+            "errors": errors,
+            "error_kinds": results.errors[name],
+            "throughput_rps": round(len(latencies) / args.duration, 2),
+            "mean_bytes": round(results.bytes[name] / len(latencies)) if latencies else None,
+            "latency_ms": summarize([s * 1000 for s in latencies], digits=2),
+        }
+    report["endpoints"] = endpoints
+    report["overall"] = {
+        "requests": len(all_latencies) + all_errors,
+        "errors": all_errors,
+        "throughput_rps": round(len(all_latencies) / args.duration, 2),
+        "latency_ms": summarize([s * 1000 for s in all_latencies], digits=2),
+    }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent tablet load test for the read API")
+    parser.add_argument("--product-logs", type=int, default=100000, help="seeded movements (local target)")
+    parser.add_argument("--days", type=float, default=20, help="seed history span (inside the 30-day retention)")
+    parser.add_argument("--tablets", type=int, default=8)
+    parser.add_argument("--role", choices=("admin", "user"), default="admin", help="account the tablets share")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,...")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean think time between requests (0 = flat out)")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", default=None, help="load a running server instead of a seeded local one")
+    parser.add_argument("--user", default=None, help="user:password to log in with (--url)")
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None, help="previous JSON report; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        checks = [("overall.throughput_rps", "higher")] + \
+                 [(f"endpoints.{name}.latency_ms.p95", "lower") for name in report["endpoints"]]
+        report["regressions"] = compare(report, baseline, checks, args.tolerance)
+        status = 1 if report["regressions"] else 0
+    write_report(report, args.output)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+End-to-end throughput benchmark for the task pipeline.
+
+Boots the app against a temp database with the PTY hardware simulator as
+racks A/B/C, M and I, uploads batches through /api/upload-tasks (IN batches
+alternating with OUT batches of the same slots, so the racks end empty) and
+follows every task through the real worker:
+
+  tasks_per_hour        completed tasks / wall time from first upload to last finish
+  per_task_s.cycle      claim → attempt finished
+  per_task_s.serial     time inside SerialManager.send (echo + mechanical delay)
+  per_task_s.overhead   cycle − serial: worker bookkeeping, DB work, pauses
+  per_task_s.gap        previous task finished → next claim (worker loop sleeps)
+  queue_wait_s          upload request → claim
+  db                    SQLite time per backend function (execute/fetch/commit)
+
+  python -m backend.benchmarks.pipeline --tasks 30 --batches 2 --time-scale 0.1 --output pipeline.json
+  python -m backend.benchmarks.pipeline --baseline pipeline.json --tolerance 0.15
+
+--no-serial runs with INU_SERIAL_ENABLED=0 (no simulator) to isolate the
+software path. With --baseline the exit status is 1 when a metric regressed
+by more than --tolerance.
+
+--lost-echo / --lost-done inject serial faults (--serial-timeout shortens the
+wait for done/fin). The report counts the simulator's anomalies, trays stored
+into an occupied slot or retrieved from an empty one; any anomaly also makes
+the exit status 1. A batch that admission rejects on release (an OUT of a slot
+whose IN failed) is reported under rejected_batches.
+"""
+
+import argparse, datetime, json, sqlite3, sys, threading, time
+
+from .common import (DBTimer, boot_app, compare, environment, login, prepare_environment,
+                     silenced, summarize, write_report)
+
+RACKS = ("A", "B", "C")
+SLOTS_PER_RACK = 80
+
+# (metric, better direction) checked against --baseline
+REGRESSION_CHECKS = (
+    ("tasks_per_hour", "higher"),
+    ("per_task_s.overhead.p50", "lower"),
+    ("per_task_s.overhead.p95", "lower"),
+    ("per_task_s.gap.p50", "lower"),
+    ("db_per_task_ms", "lower"),
+)
+
+
+def build_batch(count: int, movement: str, offset: int = 0) -> list:
+    """`count` records spread over racks A/B/C, one slot each."""
+    records = []
+    for i in range(offset, offset + count):
+        rack, slot = RACKS[i % len(RACKS)], i // len(RACKS) + 1
+        records.append({
+            "rack": rack, "slot": slot, "movement": movement, "quantity": 1,
+            "product_code": f"BENCH-{rack}{slot:02d}", "product_name": f"Benchmark item {rack}{slot:02d}",
+            "cargo_owner": "benchmark",
+        })
+    return records
+
+
+class WorkerProbe:
+    """Wraps the worker's claim / finish / serial calls to timestamp each attempt (behaviour unchanged)."""
+
+    def __init__(self, task_queue, serial_mgr):
+        self.lock = threading.Lock()
+        self.attempts = []          # {task_id, claimed, finished, serial_s, outcome}
+        self._current = None
+        self._task_queue = task_queue
+        self._serial_mgr = serial_mgr
+
+    def install(self):
+        task_queue, serial_mgr = self._task_queue, self._serial_mgr
+        claim, finish, send = task_queue.claim_next_task, task_queue.finish_attempt, serial_mgr.send
+
+        def claim_next_task():
+            started = time.perf_counter()
+            task = claim()
+            if task:
+                self._current = {"task_id": task["id"], "claim_started": started,
+                                 "claimed": time.perf_counter(), "serial_s": 0.0}
+            return task
+
+        def finish_attempt(task, status, *args, **kwargs):
+            outcome = finish(task, status, *args, **kwargs)
+            attempt = self._current
+            if attempt and attempt["task_id"] == task["id"]:
+                attempt.update(finished=time.perf_counter(), status=status, outcome=outcome)
+                with self.lock:
+                    self.attempts.append(attempt)
+                self._current = None
+            return outcome
+
+        def timed_send(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return send(*args, **kwargs)
+            finally:
+                if self._current is not None:
+                    self._current["serial_s"] += time.perf_counter() - started
+
+        # The worker resolves these through module globals / the instance at call time
+        task_queue.claim_next_task = claim_next_task
+        task_queue.finish_attempt = finish_attempt
+        serial_mgr.send = timed_send
+
+    def finished_tasks(self) -> set:
+        with self.lock:
+            return {a["task_id"] for a in self.attempts if a["outcome"] in ("done", "failed")}
+
+
+def _batch_tasks(batch_ids) -> dict:
+    """task_id → batch_id for the uploaded batches."""
+    from backend import db
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        placeholders = ",".join("?" * len(batch_ids))
+        return dict(conn.execute(
+            f"SELECT task_id, batch_id FROM batch_task_links WHERE batch_id IN ({placeholders})", list(batch_ids)
+        ).fetchall())
+    finally:
+        conn.close()
+
+
+def _rejected_batches(batch_ids) -> dict:
+    """batch_id → error for uploaded batches that admission rejected on release."""
+    from backend import db
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        placeholders = ",".join("?" * len(batch_ids))
+        return dict(conn.execute(
+            f"SELECT batch_id, error FROM queued_batches WHERE status = 'rejected' AND batch_id IN ({placeholders})",
+            list(batch_ids)
+        ).fetchall())
+    finally:
+        conn.close()
+
+
+def _count(values) -> dict:
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def run(args) -> dict:
+    started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    simulator = None
+    if not args.no_serial:
+        from backend.hw_simulator import HardwareSimulator
+        simulator = HardwareSimulator(
+            delays={"rack": args.rack_delay, "main": args.main_delay, "reset": args.reset_delay},
+            faults={"lost_echo": args.lost_echo, "garbage": args.garbage, "lost_done": args.lost_done},
+            time_scale=args.time_scale, seed=args.seed,
+        )
+        simulator.start()
+    workdir = prepare_environment(args.workdir, simulator.ports_env() if simulator else None)
+
+    db_timer = DBTimer()
+    db_timer.install()
+    boot_started = time.perf_counter()
+    app = boot_app(quiet=not args.verbose)
+    boot_s = time.perf_counter() - boot_started
+
+    from backend import task_queue
+    from backend import serial_io
+    from backend.serial_io import serial_mgr
+    from backend.admission import admission_queue
+    if args.serial_timeout:
+        serial_io.TIMEOUT = args.serial_timeout      # read by send() at call time
+    if simulator and sorted(serial_mgr.ports) != sorted(simulator.devices):
+        raise RuntimeError(f"discovery found {sorted(serial_mgr.ports)}, simulator runs {sorted(simulator.devices)}")
+
+    probe = WorkerProbe(task_queue, serial_mgr)
+    probe.install()
+    client = app.test_client()
+    headers = login(client)
+    db_timer.reset()                              # startup work is not part of the pipeline
+
+    submitted, uploads = {}, []
+    total = args.tasks * args.batches
+    started = time.perf_counter()
+    with silenced(not args.verbose):
+        for i in range(args.batches):
+            records = build_batch(args.tasks, "IN" if i % 2 == 0 else "OUT")
+            sent = time.perf_counter()
+            response = client.post(f"/api/upload-tasks?priority={args.priority}", json=records, headers=headers)
+            body = response.get_json() or {}
+            uploads.append({"status_code": response.status_code, "seconds": round(time.perf_counter() - sent, 4),
+                            "admission": body.get("status", "accepted")})
+            if response.status_code not in (200, 202):
+                raise RuntimeError(f"batch {i} rejected: {response.status_code} {body}")
+            submitted[body["batch_id"]] = sent
+
+        deadline = started + args.timeout
+        # until nothing is queued, pending (incl. retry backoff) or in progress
+        while admission_queue.queued_count() or task_queue.system_busy(min_idle_seconds=0):
+            if time.perf_counter() > deadline:
+                break
+            time.sleep(0.05)
+    wall_s = time.perf_counter() - started
+
+    attempts = sorted(probe.attempts, key=lambda a: a["claimed"])
+    done = {a["task_id"] for a in attempts if a["outcome"] == "done"}
+    failed = {a["task_id"] for a in attempts if a["outcome"] == "failed"}
+    task_batches = _batch_tasks(list(submitted))
+    first_claim = {}
+    for a in attempts:
+        first_claim.setdefault(a["task_id"], a["claimed"])
+
+    cycle = [a["finished"] - a["claimed"] for a in attempts]
+    serial = [a["serial_s"] for a in attempts]
+    overhead = [c - s for c, s in zip(cycle, serial)]
+    gaps = [b["claimed"] - a["finished"] for a, b in zip(attempts, attempts[1:])]
+    queue_wait = [claimed - submitted[task_batches[task_id]]
+                  for task_id, claimed in first_claim.items() if task_id in task_batches]
+    serial_done = [a["serial_s"] for a in attempts if a["outcome"] == "done"]
+    db_report = db_timer.report(per=len(done) or None)
+
+    report = {
+        "benchmark": "pipeline",
+        "started_at": started_at,
+        "environment": environment(),
+        "config": {
+            "tasks_per_batch": args.tasks, "batches": args.batches, "priority": args.priority,
+            "serial": not args.no_serial, "time_scale": args.time_scale,
+            "rack_delay": args.rack_delay, "main_delay": args.main_delay,
+            "lost_echo": args.lost_echo, "garbage": args.garbage, "lost_done": args.lost_done,
+            "serial_timeout": args.serial_timeout, "seed": args.seed, "workdir": workdir,
+        },
+        "completed": len(done) + len(failed) == len(task_batches),
+        "rejected_batches": _rejected_batches(list(submitted)),
+        "boot_s": round(boot_s, 3),
+        "wall_s": round(wall_s, 3),
+        "uploads": uploads,
+        "tasks": {"submitted": total, "done": len(done), "failed": len(failed),
+                  "attempts": len(attempts), "retries": sum(1 for a in attempts if a["outcome"] == "retry"),
+                  "failed_by_status": _count(a["status"] for a in attempts if a["outcome"] == "failed")},
+        "tasks_per_hour": round(len(done) / wall_s * 3600, 1) if wall_s else None,
+        # throughput if the worker added nothing on top of the serial legs
+        "serial_bound_tasks_per_hour": round(3600 / (sum(serial_done) / len(serial_done)), 1)
+        if serial_done and sum(serial_done) else None,
+        "per_task_s": {"cycle": summarize(cycle), "serial": summarize(serial),
+                       "overhead": summarize(overhead), "gap": summarize(gaps)},
+        "queue_wait_s": summarize(queue_wait),
+        "db_per_task_ms": round(sum(s["total_ms"] for s in db_report.values()) / len(done), 3) if done else None,
+        "db": db_report,
+    }
+    if simulator:
+        report["simulator"] = simulator.stats()
+        report["anomalies"] = sum(device["anomalies"] for device in report["simulator"].values())
+        simulator.stop()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Task pipeline throughput benchmark (temp DB + simulated hardware)")
+    parser.add_argument("--tasks", type=int, default=30, help="tasks per batch (max 240)")
+    parser.add_argument("--batches", type=int, default=2, help="batches, alternating IN / OUT of the same slots")
+    parser.add_argument("--priority", default="normal")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="simulator delay multiplier")
+    parser.add_argument("--rack-delay", default="lognormal:4.0,0.2")
+    parser.add_argument("--main-delay", default="lognormal:6.0,0.2")
+    parser.add_argument("--reset-delay", default="const:1.0")
+    parser.add_argument("--lost-echo", type=float, default=0.0)
+    parser.add_argument("--garbage", type=float, default=0.0)
+    parser.add_argument("--lost-done", type=float, default=0.0, help="probability that done/fin is lost")
+    parser.add_argument("--serial-timeout", type=float, default=None,
+                        help="seconds send() waits for done/fin (serial_io.TIMEOUT, default 120)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-serial", action="store_true", help="INU_SERIAL_ENABLED=0, no simulator")
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds to wait for the tasks")
+    parser.add_argument("--workdir", default=None, help="directory for the temp database (default: mkdtemp)")
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    parser.add_argument("--verbose", action="store_true", help="keep backend logging and prints")
+    args = parser.parse_args(argv)
+    if not 1 <= args.tasks <= len(RACKS) * SLOTS_PER_RACK:
+        parser.error(f"--tasks must be between 1 and {len(RACKS) * SLOTS_PER_RACK}")
+
+    report = run(args)
+    status = 0 if report["completed"] and not report.get("anomalies") else 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), REGRESSION_CHECKS, args.tolerance)
+        report["regressions"] = regressions
+        status = status or (1 if regressions else 0)
+    write_report(report, args.output)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
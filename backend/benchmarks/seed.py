@@ -0,0 +1,117 @@
+"""
+Synthetic history for load tests: product_logs with their done work_tasks,
+batch_task_links and camera_batch_history rows, plus the current_inventory
+those movements leave behind.
+
+Each movement hits a random slot and alternates IN/OUT per slot, so the data
+is consistent (an OUT always follows an IN of the same product) and about
+half the slots end up occupied.
+Timestamps are spread evenly over the last `days` days; keep `days` inside
+PRODUCT_LOG_RETENTION_DAYS or the retention job starts archiving the seed.
+"""
+
+import datetime, random, sqlite3, time, uuid
+
+RACKS = ("A", "B", "C")
+SLOTS_PER_RACK = 80
+
+
+def seed_database(db_path: str, product_logs: int, owners: list, days: float = 20, batch_size: int = 10,
+                  chunk_size: int = 20000, seed: int = 1) -> dict:
+    """
+    Append `product_logs` movements to the database at `db_path` (tables must exist).
+
+    Args:
+        owners: [(user_id, username)] the batches are attributed to, round-robin
+    Returns:
+        {product_logs, work_tasks, camera_batch_history, inventory, seconds, recent_batches}
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    slots = [(rack, slot) for slot in range(1, SLOTS_PER_RACK + 1) for rack in RACKS]
+    occupied = {}                                       # (rack, slot) → (code, name, owner name)
+    end = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(minutes=1)
+    begin = end - datetime.timedelta(days=days)
+    step = (end - begin) / max(1, product_logs)
+    recent_batches = []
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA synchronous = OFF")            # seeding only; the app keeps its own settings
+    try:
+        cur = conn.cursor()
+        next_task_id = (cur.execute("SELECT COALESCE(MAX(id), 0) FROM work_tasks").fetchone()[0]) + 1
+        logs, tasks, links, history = [], [], [], []
+        batch_id = None
+        for i in range(product_logs):
+            if i % batch_size == 0:
+                batch_id = str(uuid.uuid4())
+                user_id, username = owners[(i // batch_size) % len(owners)]
+                recent_batches.append(batch_id)
+                recent_batches = recent_batches[-50:]
+            rack, slot = rng.choice(slots)
+            if (rack, slot) in occupied:
+                code, name, cargo_owner = occupied.pop((rack, slot))
+                movement = "OUT"
+            else:
+                code = f"P{(i * 7919) % 100000:05d}"
+                name, cargo_owner = f"Product {code}", f"Owner {(i // batch_size) % 17}"
+                occupied[(rack, slot)] = (code, name, cargo_owner)
+                movement = "IN"
+            requested = begin + step * i
+            task_start = requested + datetime.timedelta(seconds=30)
+            task_end = task_start + datetime.timedelta(seconds=12 + i % 7)
+            ts, start_ts, end_ts = (t.isoformat(timespec="seconds") for t in (requested, task_start, task_end))
+
+            logs.append((code, name, rack, slot, movement, 1, cargo_owner, ts, batch_id, user_id, username))
+            tasks.append((next_task_id, rack, slot, code, name, movement, 1, cargo_owner, "done",
+                          ts, end_ts, start_ts, end_ts, user_id))
+            links.append((batch_id, next_task_id, user_id))
+            history.append((batch_id, rack, slot, movement, start_ts, end_ts, code, name, 1, cargo_owner,
+                            user_id, username, "done", ts, end_ts))
+            next_task_id += 1
+
+            if len(logs) >= chunk_size or i == product_logs - 1:
+                _flush(cur, logs, tasks, links, history)
+                conn.commit()
+                logs, tasks, links, history = [], [], [], []
+
+        inventory_time = end.isoformat(timespec="seconds")
+        cur.executemany("""
+            INSERT INTO current_inventory (product_code, product_name, rack, slot, total_quantity, cargo_owner, last_update)
+            VALUES (?, ?, ?, ?, 1, ?, ?)
+        """, [(code, name, rack, slot, cargo_owner, inventory_time)
+              for (rack, slot), (code, name, cargo_owner) in occupied.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "product_logs": product_logs,
+        "work_tasks": product_logs,
+        "camera_batch_history": product_logs,
+        "inventory": len(occupied),
+        "days": days,
+        "seconds": round(time.perf_counter() - started, 2),
+        "recent_batches": recent_batches,
+    }
+
+
+def _flush(cur, logs, tasks, links, history):
+    cur.executemany("""
+        INSERT INTO product_logs
+        (product_code, product_name, rack, slot, movement_type, quantity, cargo_owner, timestamp, batch_id, user_id, username)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, logs)
+    cur.executemany("""
+        INSERT INTO work_tasks
+        (id, rack, slot, product_code, product_name, movement, quantity, cargo_owner, status,
+         created_at, updated_at, start_time, end_time, created_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, tasks)
+    cur.executemany("INSERT INTO batch_task_links (batch_id, task_id, created_by) VALUES (?, ?, ?)", links)
+    cur.executemany("""
+        INSERT INTO camera_batch_history
+        (batch_id, rack, slot, movement_type, start_time, end_time, product_code, product_name, quantity,
+         cargo_owner, created_by, created_by_username, status, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, history)
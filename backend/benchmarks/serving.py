@@ -0,0 +1,357 @@
+"""
+Serving-mode comparison: threading (Werkzeug) against eventlet.
+
+For every mode in --modes a server subprocess boots the app with
+INU_ASYNC_MODE set (temp database, serial off, synthetic cameras), and this
+process holds open against it:
+
+  --sio-clients     Socket.IO clients (Engine.IO long-polling, subscribed to the dashboard)
+  --mjpeg-streams   MJPEG viewers spread over racks M, A, B, C
+
+While they stay open, --api-clients poll the read API (same clients and mix
+format as http_load.py). Reported per mode: Socket.IO clients connected and
+their connect time, frames per second each viewer received, API latency and
+throughput, and the server's thread count, RSS and CPU (from /proc).
+
+  python -m backend.benchmarks.serving --sio-clients 200 --mjpeg-streams 24 --duration 30 --output serving.json
+  python -m backend.benchmarks.serving --modes eventlet --baseline serving.json
+"""
+
+import argparse, datetime, http.client, json, os, socket, subprocess, sys, tempfile, threading, time
+
+from .common import BENCH_PASSWORD, BENCH_USER, compare, environment, http_login, lookup, summarize, write_report
+from .http_load import Results, Tablet, parse_mix
+
+RACKS = ("M", "A", "B", "C")
+DEFAULT_MIX = "pending-task-counts=1,inventory=1"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# ───── server subprocess ─────
+def serve(args):
+    """Child process: boot the app in INU_ASYNC_MODE and serve it on --port."""
+    from backend.async_mode import patch
+    patch()     # before the backend imports socket / threading
+    from .common import boot_app, prepare_environment
+    prepare_environment(args.workdir)
+    boot_app(quiet=not args.verbose)
+    from backend import app as app_module
+    from backend.maintenance import maintenance
+    maintenance.defer(24 * 3600)
+    app_module.serve("127.0.0.1", args.port)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, args):
+    """Start a server subprocess in `mode`; returns (process, base_url, log path) once it answers."""
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix=f"inu-serving-{mode}-")
+    log_path = os.path.join(workdir, "server.log")
+    command = [sys.executable, "-m", "backend.benchmarks.serving", "--serve", "--port", str(port),
+               "--workdir", workdir] + (["--verbose"] if args.verbose else [])
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=log, stderr=subprocess.STDOUT,
+                                   env=dict(os.environ, INU_ASYNC_MODE=mode))
+    deadline = time.monotonic() + args.boot_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with {process.returncode}, see {log_path}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/system-state")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process, f"http://127.0.0.1:{port}", log_path
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not answer within {args.boot_timeout}s, see {log_path}")
+
+
+class ProcessSampler(threading.Thread):
+    """Thread count, RSS and CPU time of a process from /proc (Linux, e.g. the Pi)."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid, self.interval = pid, interval
+        self.stop_event = threading.Event()
+        self.threads, self.rss_mb = [], []
+
+    def read(self):
+        """(threads, rss MB, cpu seconds) or None when /proc is not available."""
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+            with open(f"/proc/{self.pid}/stat") as f:
+                stat = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        ticks = os.sysconf("SC_CLK_TCK")
+        return (int(fields["Threads"]), int(fields["VmRSS"].split()[0]) / 1024.0,
+                (int(stat[11]) + int(stat[12])) / ticks)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            sample = self.read()
+            if sample:
+                self.threads.append(sample[0])
+                self.rss_mb.append(sample[1])
+
+
+# ───── clients ─────
+class SocketIOClient(threading.Thread):
+    """Engine.IO v4 long-polling client: handshake, connect '/', dashboard_subscribe, answer pings."""
+
+    def __init__(self, host, port, token, stop_event):
+        super().__init__(daemon=True)
+        self.host, self.port, self.token = host, port, token
+        self.stop_event = stop_event
+        self.settled = threading.Event()    # connected or failed
+        self.connect_s = None
+        self.events = 0
+        self.error = None
+
+    def _call(self, conn, method, sid, body=None):
+        path = "/socket.io/?EIO=4&transport=polling" + (f"&sid={sid}" if sid else "")
+        conn.request(method, path, body=body, headers={"Content-Type": "text/plain;charset=UTF-8"} if body else {})
+        response = conn.getresponse()
+        data = response.read().decode("utf-8", "replace")
+        if response.status != 200:
+            raise RuntimeError(f"{method} {response.status}: {data[:80]}")
+        return data
+
+    def run(self):
+        poll = http.client.HTTPConnection(self.host, self.port, timeout=90)
+        post = http.client.HTTPConnection(self.host, self.port, timeout=90)
+        started = time.perf_counter()
+        try:
+            handshake = self._call(poll, "GET", None)
+            sid = json.loads(handshake[handshake.index("{"):])["sid"]
+            self._call(post, "POST", sid, "40")
+            self._call(post, "POST", sid, '42["dashboard_subscribe",' + json.dumps({"token": self.token}) + "]")
+            while not self.stop_event.is_set():
+                for packet in self._call(poll, "GET", sid).split("\x1e"):
+                    if packet == "2":
+                        self._call(post, "POST", sid, "3")
+                    elif packet.startswith("40") and self.connect_s is None:
+                        self.connect_s = time.perf_counter() - started
+                        self.settled.set()
+                    elif packet.startswith("42"):
+                        self.events += 1
+                    elif packet == "1":
+                        raise RuntimeError("server closed the session")
+        except Exception as e:
+            if not self.stop_event.is_set():
+                self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.settled.set()
+            poll.close()
+            post.close()
+
+
+class MJPEGViewer(threading.Thread):
+    """Reads /api/camera/<rack>/mjpeg_feed and counts the frames received between measure_from and deadline."""
+
+    BOUNDARY = b"--frame"
+
+    def __init__(self, host, port, rack, measure_from, deadline):
+        super().__init__(daemon=True)
+        self.host, self.port, self.rack = host, port, rack
+        self.measure_from, self.deadline = measure_from, deadline
+        self.frames = 0
+        self.opened = False
+        self.error = None
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            conn.request("GET", f"/api/camera/{self.rack}/mjpeg_feed")
+            response = conn.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"status {response.status}")
+            self.opened = True
+            tail = b""
+            while time.perf_counter() < self.deadline:
+                chunk = response.read1(65536)
+                if not chunk:
+                    raise RuntimeError("stream ended")
+                data = tail + chunk
+                if time.perf_counter() >= self.measure_from:
+                    self.frames += data.count(self.BOUNDARY)
+                tail = data[-(len(self.BOUNDARY) - 1):]
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            conn.close()
+
+
+# ───── one mode ─────
+def run_mode(mode, args) -> dict:
+    process, base_url, log_path = start_server(mode, args)
+    host, port = base_url.rsplit("//", 1)[1].split(":")
+    port = int(port)
+    stop_event = threading.Event()
+    sampler = ProcessSampler(process.pid)
+    try:
+        token = http_login(base_url, BENCH_USER, BENCH_PASSWORD)
+        idle = sampler.read()
+
+        connect_started = time.perf_counter()
+        clients = [SocketIOClient(host, port, token, stop_event) for _ in range(args.sio_clients)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.settled.wait(timeout=max(0.1, args.connect_timeout - (time.perf_counter() - connect_started)))
+        connect_s = time.perf_counter() - connect_started
+
+        start = time.perf_counter()
+        measure_from, deadline = start + args.warmup, start + args.warmup + args.duration
+        viewers = [MJPEGViewer(host, port, RACKS[i % len(RACKS)], measure_from, deadline)
+                   for i in range(args.mjpeg_streams)]
+        for viewer in viewers:
+            viewer.start()
+        results = Results()
+        tablets = [Tablet(base_url, token, parse_mix(args.mix), args.think_ms / 1000.0, [], results,
+                          measure_from, deadline, args.seed + i)
+                   for i in range(args.api_clients)]
+        for tablet in tablets:
+            tablet.start()
+        time.sleep(max(0.0, measure_from - time.perf_counter()))
+        before = sampler.read()
+        sampler.start()
+        for thread in tablets + viewers:
+            thread.join()
+        after = sampler.read()
+        sampler.stop_event.set()
+    finally:
+        stop_event.set()
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    connected = [c for c in clients if c.connect_s is not None]
+    latencies = [s * 1000 for name in results.samples for s in results.samples[name]]
+    errors = sum(sum(kinds.values()) for kinds in results.errors.values())
+    open_viewers = [v for v in viewers if v.opened]
+    result = {
+        "socketio": {
+            "clients": len(clients),
+            "connected": len(connected),
+            "failed": len(clients) - len(connected),
+            "errors": sorted({c.error for c in clients if c.error})[:5],
+            "connect_ms": summarize([c.connect_s * 1000 for c in connected], digits=1),
+            "all_connected_s": round(connect_s, 2),
+            "events": sum(c.events for c in clients),
+        },
+        "mjpeg": {
+            "streams": len(viewers),
+            "opened": len(open_viewers),
+            "errors": sorted({v.error for v in viewers if v.error})[:5],
+            "fps": summarize([v.frames / args.duration for v in open_viewers], digits=2),
+        },
+        "api": {
+            "requests": len(latencies) + errors,
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / args.duration, 2),
+            "latency_ms": summarize(latencies, digits=2),
+        },
+        "server_log": log_path,
+    }
+    if idle and before and after:
+        result["server"] = {
+            "idle_threads": idle[0],
+            "idle_rss_mb": round(idle[1], 1),
+            "threads_max": max(sampler.threads or [after[0]]),
+            "rss_mb_max": round(max(sampler.rss_mb or [after[1]]), 1),
+            "cpu_percent": round((after[2] - before[2]) / args.duration * 100, 1),
+        }
+    return result
+
+
+COMPARED = [
+    ("api.latency_ms.p95", "lower"),
+    ("api.throughput_rps", "higher"),
+    ("mjpeg.fps.mean", "higher"),
+    ("socketio.connect_ms.p95", "lower"),
+    ("server.threads_max", "lower"),
+    ("server.rss_mb_max", "lower"),
+    ("server.cpu_percent", "lower"),
+]
+
+
+def run(args) -> dict:
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    report = {
+        "benchmark": "serving",
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": {"modes": modes, "sio_clients": args.sio_clients, "mjpeg_streams": args.mjpeg_streams,
+                   "api_clients": args.api_clients, "mix": parse_mix(args.mix), "think_ms": args.think_ms,
+                   "duration_s": args.duration, "warmup_s": args.warmup},
+        "modes": {},
+    }
+    for mode in modes:
+        print(f"[serving] {mode}: {args.sio_clients} Socket.IO clients, {args.mjpeg_streams} MJPEG streams, "
+              f"{args.api_clients} API clients for {args.duration}s", file=sys.stderr)
+        report["modes"][mode] = run_mode(mode, args)
+
+    if len(modes) > 1:
+        first = modes[0]
+        comparison = {}
+        for path, _ in COMPARED:
+            values = {mode: lookup(report["modes"][mode], path) for mode in modes}
+            if values[first]:
+                values.update({f"{mode}/{first}": round(values[mode] / values[first], 3)
+                               for mode in modes[1:] if values[mode] is not None})
+            comparison[path] = values
+        report["comparison"] = comparison
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the threading and eventlet serving modes")
+    parser.add_argument("--modes", default="threading,eventlet", help="comma-separated INU_ASYNC_MODE values")
+    parser.add_argument("--sio-clients", type=int, default=200)
+    parser.add_argument("--mjpeg-streams", type=int, default=24)
+    parser.add_argument("--api-clients", type=int, default=4)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... (see http_load.py)")
+    parser.add_argument("--think-ms", type=float, default=100)
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--connect-timeout", type=float, default=60, help="seconds to wait for all Socket.IO clients")
+    parser.add_argument("--boot-timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None, help="previous JSON report; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--verbose", action="store_true")
+    # internal: the server subprocess
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args)
+        return
+    report = run(args)
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        checks = [(f"modes.{mode}.{path}", better) for mode in report["modes"] for path, better in COMPARED]
+        report["regressions"] = compare(report, baseline, checks, args.tolerance)
+        status = 1 if report["regressions"] else 0
+    write_report(report, args.output)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
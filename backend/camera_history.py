@@ -1,6 +1,8 @@
 import sqlite3
 import logging
 from .db import DB_NAME
+from .pagination import encode_cursor, decode_cursor
+from . import archive
 
 # Set up basic logging for this module
 logger = logging.getLogger(__name__)
@@ -46,26 +48,53 @@ def store_camera_batch(history_data):
 
 def get_camera_history(limit=50):
     """Retrieve camera batch history logs from the database, newest first."""
+    items, _ = get_camera_history_page(limit)
+    return items
+
+
+def get_camera_history_page(limit=50, cursor=None):
+    """
+    One page of camera batch history, newest first.
+
+    Rows are inserted by the worker at task completion, so the primary key
+    follows completion order; paging on `id` uses the rowid b-tree directly
+    instead of sorting on a computed timestamp.
+
+    Rows moved to the archive by the retention job keep their ids, so the
+    live table and the archive segments are merged on `id` and the same
+    cursor continues from one into the other.
+
+    Returns:
+        (list of history dicts, next_cursor or None)
+    """
     conn = None
     try:
         conn = sqlite3.connect(DB_NAME)
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
-        # Order by the most reliable available timestamp
-        cur.execute(
-            """
-            SELECT *
-            FROM camera_batch_history
-            ORDER BY datetime(COALESCE(end_time, updated_at, created_at)) DESC, id DESC
-            LIMIT ?
-            """,
-            (limit,)
-        )
-        rows = cur.fetchall()
-        return [dict(row) for row in rows]
+        if cursor:
+            (last_id,) = decode_cursor(cursor, "desc", 1)
+            cur.execute(
+                "SELECT * FROM camera_batch_history WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (last_id, limit + 1)
+            )
+        else:
+            cur.execute(
+                "SELECT * FROM camera_batch_history ORDER BY id DESC LIMIT ?",
+                (limit + 1,)
+            )
+        rows = [dict(row) for row in cur.fetchall()]
+        # Archived rows can only belong on this page if they are newer than the
+        # oldest live row we got (or if the live table ran out)
+        above_id = rows[-1]['id'] if len(rows) > limit else None
+        archived = archive.rows_before("camera_batch_history", last_id if cursor else None, limit + 1, above_id)
+        if archived:
+            rows = sorted(rows + archived, key=lambda row: row['id'], reverse=True)[:limit + 1]
+        next_cursor = encode_cursor((rows[limit - 1]['id'],), "desc") if len(rows) > limit else None
+        return rows[:limit], next_cursor
     except sqlite3.Error as e:
         logger.error(f"DATABASE ERROR in get_camera_history: {e}")
-        return [] # Return empty list on error
+        return [], None # Return empty page on error
     finally:
         if conn:
-            conn.close() 
\ No newline at end of file
+            conn.close() 
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Frame sources for USBCamera.
+
+USBCamera reads frames through a FrameSource instead of a cv2.VideoCapture,
+so the MJPEG pipeline (encode, fan-out, client backpressure) can run without
+USB webcams:
+
+  V4L2Source       the real camera (/dev/v4l/by-path/...), MJPG → YUYV → native fallback
+  SyntheticSource  generated frames: moving bar and box, frame counter, timestamp;
+                   content depends only on the frame index, so runs are repeatable
+  FileSource       a video file (or still image) played in a loop at its own fps
+
+The source is chosen with INU_CAMERA_SOURCE (read when camera_stream is imported):
+
+  v4l2                         default
+  synthetic                    640x480 @ 30 fps
+  synthetic:1280x720@15        resolution / fps
+  file:/path/to/clip.mp4       same clip for every rack
+"""
+
+import os
+import cv2
+import time
+import logging
+import numpy as np
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SOURCE_ENV = "INU_CAMERA_SOURCE"
+
+
+class FrameSource:
+    """Minimal capture interface used by USBCamera (a subset of cv2.VideoCapture)."""
+
+    kind = "base"
+
+    def __init__(self, width: int, height: int, fps: int):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.last_fail_reason = ""
+
+    def open(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Open the source and return (ok, first frame)."""
+        raise NotImplementedError
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        raise NotImplementedError
+
+    def is_opened(self) -> bool:
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def describe(self) -> str:
+        return self.kind
+
+
+class V4L2Source(FrameSource):
+    """USB webcam through OpenCV's V4L2 backend."""
+
+    kind = "v4l2"
+
+    def __init__(self, device_path: str, width: int, height: int, fps: int, name: str = ""):
+        super().__init__(width, height, fps)
+        self.device_path = device_path
+        self.name = name or device_path
+        self.cap: Optional[cv2.VideoCapture] = None
+        self.mode = ""
+
+    def _warmup_capture(self, cap: cv2.VideoCapture) -> tuple:
+        """Try to read one good frame after properties are set."""
+        time.sleep(0.25)
+        for _ in range(10):
+            ret, frame = cap.read()
+            if ret and frame is not None:
+                return True, frame
+            time.sleep(0.1)
+        return False, None
+
+    def open(self) -> Tuple[bool, Optional[np.ndarray]]:
+        cap = None
+        try:
+            # (mjpeg?, fixed 640x480?) — cheap UVC cams often need "native" (no size/MJPG) to return frames.
+            attempts = ((True, True), (False, True), (False, False))
+            for prefer_mjpeg, set_resolution in attempts:
+                cap = cv2.VideoCapture(self.device_path, cv2.CAP_V4L2)
+                if not cap.isOpened():
+                    cap = cv2.VideoCapture(self.device_path)
+                if not cap.isOpened():
+                    self.last_fail_reason = "VideoCapture could not open device"
+                    logger.error(f"[{self.name}] Failed to open {self.device_path}")
+                    return False, None
+
+                if prefer_mjpeg:
+                    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+                if set_resolution:
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+                    cap.set(cv2.CAP_PROP_FPS, self.fps)
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+                ok, frame = self._warmup_capture(cap)
+                if ok:
+                    self.cap = cap
+                    fmt = "MJPG" if prefer_mjpeg else "YUYV/default"
+                    res = f"{self.width}x{self.height}" if set_resolution else "native"
+                    self.mode = f"{fmt}, {res} @ ~{self.fps} fps requested"
+                    self.last_fail_reason = ""
+                    return True, frame
+
+                logger.warning(
+                    f"[{self.name}] No frame (mjpeg={prefer_mjpeg}, fixed_res={set_resolution}); trying next mode"
+                )
+                cap.release()
+                cap = None
+
+            self.last_fail_reason = "opened OK but no frames (tried MJPG+640, YUYV+640, native)"
+            logger.error(f"[{self.name}] Failed to capture test frame after all modes")
+            return False, None
+
+        except Exception as e:
+            self.last_fail_reason = str(e)
+            logger.exception(f"[{self.name}] Error initializing: {e}")
+            try:
+                if cap is not None:
+                    cap.release()
+            except Exception:
+                pass
+            return False, None
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.cap is None:
+            return False, None
+        return self.cap.read()
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+        self.cap = None
+
+    def describe(self) -> str:
+        return f"v4l2 {self.device_path} ({self.mode})" if self.mode else f"v4l2 {self.device_path}"
+
+
+class _PacedSource(FrameSource):
+    """read() blocks until the next frame is due, like a camera delivering at a fixed fps."""
+
+    def __init__(self, width: int, height: int, fps: int):
+        super().__init__(width, height, fps)
+        self._opened = False
+        self._next_due = 0.0
+
+    def _pace(self):
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        now = time.monotonic()
+        if self._next_due > now:
+            time.sleep(self._next_due - now)
+        # a reader that fell behind gets the next frame at once instead of a burst
+        self._next_due = max(self._next_due, now) + interval
+
+    def is_opened(self) -> bool:
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+
+class SyntheticSource(_PacedSource):
+    """Generated test pattern; identical frames for identical frame indexes (except the clock text)."""
+
+    kind = "synthetic"
+
+    def __init__(self, width: int, height: int, fps: int, label: str = "", timestamp: bool = True):
+        super().__init__(width, height, fps)
+        self.label = label
+        self.timestamp = timestamp
+        self.index = 0
+        # static background: horizontal gradient, so JPEG sizes resemble a real scene more than a flat fill
+        ramp = np.linspace(40, 200, width, dtype=np.uint8)
+        self._background = np.dstack([np.tile(ramp, (height, 1))] * 3)
+
+    def open(self) -> Tuple[bool, Optional[np.ndarray]]:
+        self._opened = True
+        self.index = 0
+        self._next_due = time.monotonic()
+        return True, self._render(0)
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._opened:
+            return False, None
+        self._pace()
+        self.index += 1
+        return True, self._render(self.index)
+
+    def _render(self, index: int) -> np.ndarray:
+        frame = self._background.copy()
+        w, h = self.width, self.height
+        bar_x = (index * 4) % w
+        frame[:, bar_x:bar_x + 8] = (0, 0, 255)
+        box = max(16, min(w, h) // 8)
+        period = max(1, 2 * (w - box))
+        x = index * 6 % period
+        x = x if x < w - box else period - x
+        y = int((h - box) * (0.5 + 0.4 * np.sin(index / 20.0)))
+        cv2.rectangle(frame, (x, y), (x + box, y + box), (0, 200, 0), -1)
+        text = f"{self.label} #{index}"
+        cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        if self.timestamp:
+            clock = time.strftime("%H:%M:%S") + f".{int(time.time() * 1000) % 1000:03d}"
+            cv2.putText(frame, clock, (10, h - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        return frame
+
+    def describe(self) -> str:
+        return f"synthetic {self.width}x{self.height} @ {self.fps} fps"
+
+
+class FileSource(_PacedSource):
+    """Video file looped forever (or a still image repeated) at the file's fps or `fps`."""
+
+    kind = "file"
+
+    def __init__(self, path: str, width: int, height: int, fps: int, loop: bool = True, use_file_fps: bool = True):
+        super().__init__(width, height, fps)
+        self.path = path
+        self.loop = loop
+        self.use_file_fps = use_file_fps
+        self.cap: Optional[cv2.VideoCapture] = None
+        self.still: Optional[np.ndarray] = None
+        self.loops = 0
+
+    def open(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not os.path.exists(self.path):
+            self.last_fail_reason = f"file not found: {self.path}"
+            return False, None
+        # images first: OpenCV would also open a JPEG as a one-frame "video" that cannot loop
+        frame = cv2.imread(self.path)
+        if frame is not None:
+            self.still = frame
+        else:
+            cap = cv2.VideoCapture(self.path)
+            ok, frame = cap.read() if cap.isOpened() else (False, None)
+            if not ok or frame is None:
+                cap.release()
+                self.last_fail_reason = f"not a readable video or image: {self.path}"
+                return False, None
+            self.cap = cap
+            file_fps = cap.get(cv2.CAP_PROP_FPS)
+            if self.use_file_fps and file_fps and file_fps > 0:
+                self.fps = file_fps
+        self.height, self.width = frame.shape[:2]
+        self._opened = True
+        self._next_due = time.monotonic()
+        self.last_fail_reason = ""
+        return True, frame
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._opened:
+            return False, None
+        self._pace()
+        if self.still is not None:
+            return True, self.still
+        ok, frame = self.cap.read()
+        if (not ok or frame is None) and self.loop:
+            self.loops += 1
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        return ok, frame
+
+    def release(self):
+        super().release()
+        if self.cap is not None:
+            self.cap.release()
+        self.cap = None
+
+    def describe(self) -> str:
+        return f"file {self.path} @ {self.fps:g} fps"
+
+
+def source_spec() -> str:
+    return os.environ.get(SOURCE_ENV, "").strip() or "v4l2"
+
+
+def is_virtual(spec: Optional[str] = None) -> bool:
+    """True when cameras do not need /dev/v4l devices."""
+    return (spec or source_spec()).split(":", 1)[0].lower() != "v4l2"
+
+
+def make_source(spec: Optional[str], device_path: str, name: str,
+                width: int, height: int, fps: int) -> FrameSource:
+    """Build the frame source for one camera from a INU_CAMERA_SOURCE style spec."""
+    spec = spec or source_spec()
+    kind, _, arg = spec.partition(":")
+    kind = kind.lower()
+    if kind == "v4l2":
+        return V4L2Source(device_path, width, height, fps, name=name)
+    if kind == "synthetic":
+        if arg:
+            size, _, rate = arg.partition("@")
+            try:
+                if size:
+                    width, height = (int(v) for v in size.lower().split("x"))
+                if rate:
+                    fps = int(rate)
+            except ValueError:
+                raise ValueError(f"invalid {SOURCE_ENV}: {spec!r} (expected synthetic:WIDTHxHEIGHT@FPS)")
+        return SyntheticSource(width, height, fps, label=name)
+    if kind == "file":
+        if not arg:
+            raise ValueError(f"invalid {SOURCE_ENV}: {spec!r} (expected file:/path/to/video)")
+        return FileSource(arg, width, height, fps)
+    raise ValueError(f"unknown {SOURCE_ENV}: {spec!r}")
@@ -4,6 +4,10 @@
 INU Logistics Camera Stream
 - Uses stable /dev/v4l/by-path/*-video-index0 device nodes
 - Forces MJPEG, sets low-latency buffers, and streams on-demand
+- INU_CAMERA_SOURCE=synthetic / file:<path> replaces the webcams with virtual
+  frame sources (camera_sources.py) for testing without hardware
+- One capture + JPEG encode loop per rack (FrameBroadcast) feeds every open
+  stream of that rack; with eventlet the cv2 calls run on tpool (async_mode.py)
 """
 
 import os
@@ -17,11 +21,15 @@ from flask import Response
 
 try:
     from .camera_config import CAMERA_CONFIG, resolve_rack_to_device
+    from .camera_sources import FrameSource, V4L2Source, is_virtual, make_source, source_spec
+    from .metrics import CAMERA_CAPTURE, CAMERA_CLIENTS, CAMERA_DROPS, CAMERA_ENCODE, CAMERA_FRAMES
+    from .async_mode import offload
 except ImportError:
     from camera_config import CAMERA_CONFIG, resolve_rack_to_device
+    from camera_sources import FrameSource, V4L2Source, is_virtual, make_source, source_spec
+    from metrics import CAMERA_CAPTURE, CAMERA_CLIENTS, CAMERA_DROPS, CAMERA_ENCODE, CAMERA_FRAMES
+    from async_mode import offload
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DEFAULT_WIDTH = 640   # Camera resolution width
@@ -31,14 +39,16 @@ DEFAULT_JPEG_Q = 80   # JPEG encoding quality
 
 class USBCamera:
     def __init__(self, device_path: str, name: str,
-                 width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT, fps: int = DEFAULT_FPS):
+                 width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT, fps: int = DEFAULT_FPS,
+                 source: Optional[FrameSource] = None):
         self.device_path = device_path
         self.name = name
         self.width = width
         self.height = height
         self.fps = fps
+        # V4L2 unless a virtual source is passed in (see camera_sources.py)
+        self.source: FrameSource = source or V4L2Source(device_path, width, height, fps, name=name)
 
-        self.cap: Optional[cv2.VideoCapture] = None
         self.frame: Optional[np.ndarray] = None
         self.last_frame_time = 0.0
         self.lock = threading.Lock()
@@ -50,96 +60,43 @@ class USBCamera:
         self.running = True
         return self._init_camera()
 
-    def _warmup_capture(self, cap: cv2.VideoCapture) -> tuple:
-        """Try to read one good frame after properties are set."""
-        time.sleep(0.25)
-        for _ in range(10):
-            ret, frame = cap.read()
-            if ret and frame is not None:
-                return True, frame
-            time.sleep(0.1)
-        return False, None
-
     def _init_camera(self) -> bool:
-        cap = None
-        try:
-            # (mjpeg?, fixed 640x480?) — cheap UVC cams often need "native" (no size/MJPG) to return frames.
-            attempts = ((True, True), (False, True), (False, False))
-            for prefer_mjpeg, set_resolution in attempts:
-                cap = cv2.VideoCapture(self.device_path, cv2.CAP_V4L2)
-                if not cap.isOpened():
-                    cap = cv2.VideoCapture(self.device_path)
-                if not cap.isOpened():
-                    self.last_fail_reason = "VideoCapture could not open device"
-                    logger.error(f"[{self.name}] Failed to open {self.device_path}")
-                    return False
-
-                if prefer_mjpeg:
-                    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-                if set_resolution:
-                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-                    cap.set(cv2.CAP_PROP_FPS, self.fps)
-                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-
-                ok, last = self._warmup_capture(cap)
-                if ok:
-                    self.cap = cap
-                    with self.lock:
-                        self.frame = last
-                        self.last_frame_time = time.time()
-                    fmt = "MJPG" if prefer_mjpeg else "YUYV/default"
-                    res = f"{self.width}x{self.height}" if set_resolution else "native"
-                    logger.info(f"[{self.name}] Initialized ({fmt}, {res} @ ~{self.fps} fps requested)")
-                    self.last_fail_reason = ""
-                    return True
-
-                logger.warning(
-                    f"[{self.name}] No frame (mjpeg={prefer_mjpeg}, fixed_res={set_resolution}); trying next mode"
-                )
-                cap.release()
-                cap = None
-
-            self.last_fail_reason = "opened OK but no frames (tried MJPG+640, YUYV+640, native)"
-            logger.error(f"[{self.name}] Failed to capture test frame after all modes")
+        ok, first = self.source.open()
+        if not ok:
+            self.last_fail_reason = self.source.last_fail_reason or "source did not open"
             return False
+        with self.lock:
+            self.frame = first
+            self.last_frame_time = time.time()
+        logger.info(f"[{self.name}] Initialized ({self.source.describe()})")
+        self.last_fail_reason = ""
+        return True
 
-        except Exception as e:
-            self.last_fail_reason = str(e)
-            logger.exception(f"[{self.name}] Error initializing: {e}")
-            try:
-                if cap is not None:
-                    cap.release()
-            except Exception:
-                pass
-            return False
+    def _store(self, frame: np.ndarray) -> np.ndarray:
+        with self.lock:
+            self.frame = frame
+            self.last_frame_time = time.time()
+        return frame
 
     def get_frame(self) -> Optional[np.ndarray]:
         """Capture a fresh frame. Reopen the device once if needed."""
         try:
-            if not self.cap or not self.cap.isOpened():
+            if not self.source.is_opened():
                 logger.warning(f"[{self.name}] Capture not open; reinitializing")
                 if not self._init_camera():
                     return None
 
-            ret, frame = self.cap.read()
+            ret, frame = offload(self.source.read)
             if ret and frame is not None:
-                with self.lock:
-                    self.frame = frame
-                    self.last_frame_time = time.time()
-                return frame
+                return self._store(frame)
 
             # one retry via reopen
             logger.warning(f"[{self.name}] Read failed; reopening")
-            self.cap.release()
-            self.cap = None
+            self.source.release()
             if self._init_camera():
-                ret, frame = self.cap.read()
+                ret, frame = offload(self.source.read)
                 if ret and frame is not None:
-                    with self.lock:
-                        self.frame = frame
-                        self.last_frame_time = time.time()
-                    return frame
+                    return self._store(frame)
             return None
 
         except Exception as e:
@@ -148,23 +105,89 @@ class USBCamera:
 
     def stop(self):
         self.running = False
-        if self.cap:
-            try:
-                self.cap.release()
-            except Exception:
-                pass
-        self.cap = None
+        try:
+            self.source.release()
+        except Exception:
+            pass
         logger.info(f"[{self.name}] Stopped")
 
+class FrameBroadcast:
+    """
+    Latest JPEG of one rack, shared by all of its MJPEG clients.
+
+    The first subscriber starts a capture thread that reads and encodes one
+    frame per interval; each client only waits for the next sequence number,
+    so N viewers cost one capture and one encode, not N. The thread exits
+    when the last client leaves (the camera itself stays open).
+    """
+
+    def __init__(self, manager: "CameraManager", rack_id: str):
+        self.manager = manager
+        self.rack_id = rack_id
+        self.cond = threading.Condition()
+        self.jpeg: Optional[bytes] = None
+        self.seq = 0
+        self.viewers = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self):
+        with self.cond:
+            self.viewers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name=f"camera-{self.rack_id}")
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self.cond:
+            self.viewers -= 1
+
+    def wait_next(self, last_seq: int, timeout: float = 1.0):
+        """(seq, jpeg) once a frame newer than last_seq exists, or (last_seq, None) after timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq != last_seq, timeout):
+                return last_seq, None
+            return self.seq, self.jpeg
+
+    def _run(self):
+        frame_interval = 1.0 / DEFAULT_FPS
+        params = [cv2.IMWRITE_JPEG_QUALITY, DEFAULT_JPEG_Q]
+        while True:
+            with self.cond:
+                if self.viewers <= 0:
+                    self._thread = None
+                    return
+            started = time.time()
+            try:
+                frame = self.manager.get_frame(self.rack_id)
+                if frame is not None:
+                    encode_started = time.perf_counter()
+                    ret, jpeg = offload(cv2.imencode, '.jpg', frame, params)
+                    CAMERA_ENCODE.labels(self.rack_id).observe(time.perf_counter() - encode_started)
+                    if ret:
+                        with self.cond:
+                            self.jpeg = jpeg.tobytes()
+                            self.seq += 1
+                            self.cond.notify_all()
+                time.sleep(max(0.005, frame_interval - (time.time() - started)))
+            except Exception as e:
+                logger.error(f"Error in frame capture loop for {self.rack_id}: {e}")
+                time.sleep(0.2)
+
+
 class CameraManager:
     def __init__(self):
         self.cameras: Dict[str, USBCamera] = {}
+        self._broadcasts: Dict[str, FrameBroadcast] = {}
+        self._broadcasts_lock = threading.Lock()
         self._diagnostics: Dict[str, Dict[str, Any]] = {}
         self._resolution_meta: Dict[str, Any] = {}
         self._init_cameras()
 
     def _init_cameras(self):
         """Initialize cameras in specific order with delays (spacing helps multi-cam USB hubs)."""
+        if is_virtual():
+            self._init_virtual_cameras(source_spec())
+            return
         resolved, self._resolution_meta = resolve_rack_to_device()
         for cam_id in ['A', 'B', 'C', 'M']:  # M last (matches auto-map A→B→C→M)
             if cam_id in self.cameras:
@@ -209,6 +232,33 @@ class CameraManager:
             self._diagnostics[cam_id] = rec
             time.sleep(1.2)
 
+    def _init_virtual_cameras(self, spec: str):
+        """One virtual source per configured rack; no device paths, no USB spacing delay."""
+        self._resolution_meta = {"mode": "virtual", "source": spec}
+        for cam_id in ['A', 'B', 'C', 'M']:
+            if cam_id in self.cameras or cam_id not in CAMERA_CONFIG:
+                continue
+            name = CAMERA_CONFIG[cam_id].get("name", cam_id)
+            rec: Dict[str, Any] = {"rack": cam_id, "name": name, "path": spec}
+            try:
+                cam = USBCamera(spec, name, source=make_source(spec, spec, name,
+                                                               DEFAULT_WIDTH, DEFAULT_HEIGHT, DEFAULT_FPS))
+            except ValueError as e:
+                rec["ok"] = False
+                rec["error"] = str(e)
+                self._diagnostics[cam_id] = rec
+                logger.error(f"[{cam_id}] {e}")
+                continue
+            if cam.start():
+                self.cameras[cam_id] = cam
+                rec["ok"] = True
+                rec["source"] = cam.source.describe()
+            else:
+                rec["ok"] = False
+                rec["error"] = cam.last_fail_reason or "start() failed"
+                logger.error(f"[{cam_id}] Failed to initialize virtual source {spec}")
+            self._diagnostics[cam_id] = rec
+
     def get_diagnostics(self) -> Dict[str, Any]:
         return {
             "racks": {k: dict(v) for k, v in self._diagnostics.items()},
@@ -227,29 +277,45 @@ class CameraManager:
         """Get frame from specific camera"""
         camera = self.cameras.get(rack_id)
         if camera:
-            return camera.get_frame()
+            started = time.perf_counter()
+            frame = camera.get_frame()
+            if frame is None:
+                CAMERA_DROPS.labels(rack_id).inc()
+            else:
+                CAMERA_CAPTURE.labels(rack_id).observe(time.perf_counter() - started)
+                CAMERA_FRAMES.labels(rack_id).inc()
+            return frame
         return None
 
     def get_generator(self, rack_id: str):
         """Generate MJPEG stream for a specific camera"""
-        frame_interval = 1.0 / DEFAULT_FPS
-        last_frame_time = 0
-
-        while True:
-            try:
-                current_time = time.time()
-                if current_time - last_frame_time >= frame_interval:
-                    frame = self.get_frame(rack_id)
-                    if frame is not None:
-                        ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, DEFAULT_JPEG_Q])
-                        if ret:
-                            yield (b'--frame\r\n'
-                                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-                            last_frame_time = current_time
-                time.sleep(0.005)  # Small sleep to prevent busy waiting
-            except Exception as e:
-                logger.error(f"Error in frame generator for {rack_id}: {e}")
-                time.sleep(0.2)
+        clients = CAMERA_CLIENTS.labels(rack_id if rack_id in CAMERA_CONFIG else "unknown")
+        clients.inc()
+        try:
+            yield from self._frames(rack_id)
+        finally:
+            clients.dec()   # client went away (generator closed)
+
+    def _broadcast(self, rack_id: str) -> FrameBroadcast:
+        with self._broadcasts_lock:
+            if rack_id not in self._broadcasts:
+                self._broadcasts[rack_id] = FrameBroadcast(self, rack_id)
+            return self._broadcasts[rack_id]
+
+    def _frames(self, rack_id: str):
+        if rack_id not in CAMERA_CONFIG:
+            return      # no camera can ever be opened for it
+        broadcast = self._broadcast(rack_id)
+        broadcast.subscribe()
+        try:
+            seq = 0
+            while True:
+                seq, jpeg = broadcast.wait_next(seq)
+                if jpeg is not None:
+                    yield (b'--frame\r\n'
+                           b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            broadcast.unsubscribe()
 
     def get_available_cameras(self) -> list:
         """Get list of available cameras"""
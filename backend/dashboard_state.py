@@ -0,0 +1,331 @@
+# dashboard_state.py
+"""
+In-memory dashboard state pushed to clients over Socket.IO.
+
+Instead of every tablet polling task lists, activity logs, camera history and
+camera availability, the backend keeps one copy of those aggregates and
+pushes versioned diffs:
+
+  client → 'dashboard_subscribe' {token}
+  server → 'dashboard_snapshot' {scope, version, state}            (to that client)
+  server → 'dashboard_diff' {scope, version, base_version, changes} (to the scope room)
+
+A client applies a diff only when base_version equals its own version and
+re-subscribes (getting a fresh snapshot) otherwise, e.g. after a reconnect.
+
+A subscription belongs to the login session of its token. When that session
+ends (logout, or a new login under the single-session policy) its sids leave
+their rooms and get 'session_invalidated' {error, code, reason}: auth.py drops them
+right away, and the publisher re-checks the sessions of its subscribers before
+every publish for sessions ended by another process.
+
+Task counts respect the same visibility rule as get_work_tasks_by_status:
+admins see everything (scope 'all'), other users only their own tasks
+(scope 'user:<id>'). Each scope has its own room and version counter.
+
+Writers only call notify_tasks_changed() / notify_history_changed(); a
+single publisher thread coalesces bursts of notifications, reloads the
+affected aggregates once and emits the diffs, so DB load no longer scales
+with the number of open screens. Camera availability (the devices
+camera_stream's manager has open) is re-read every CAMERA_CHECK_INTERVAL,
+but only while someone is subscribed.
+
+get_dashboard_summary() serves the same counters over HTTP
+(/api/dashboard-summary) from one GROUP BY status × movement per scope. Its
+cache is dropped synchronously by notify_tasks_changed(), so a request made
+right after a commit never sees the previous counts.
+"""
+
+import sqlite3, threading, logging, time
+from .db import DB_NAME
+from .activity_log import get_activity_logs
+from .camera_history import get_camera_history
+from .error_messages import get_error_message
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 50                 # rows of camera history / activity logs kept in the state
+COALESCE_SECONDS = 0.2            # wait this long after a notification before publishing
+CAMERA_CHECK_INTERVAL = 5         # seconds between camera availability checks
+COUNT_STATUSES = ("pending", "in_progress", "done", "failed")
+MOVEMENTS = ("IN", "OUT")
+
+
+def _empty_counts():
+    return {status: {m: 0 for m in MOVEMENTS} for status in COUNT_STATUSES}
+
+
+def _status_bucket(status: str) -> str:
+    return "failed" if status.startswith("failed") else status
+
+
+class DashboardState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.io = None
+        self._dirty = set()
+        # created_by → counts dict (see _empty_counts)
+        self._counts_by_user = {}
+        self._shared = {"camera_history": [], "activity_logs": [], "cameras": [], "rack_stock": {}}
+        self._views = {}          # scope → last published view
+        self._versions = {}       # scope → version of that view
+        self._subscribers = {}    # sid → (scope, session_id)
+        self._thread = None
+        self._summaries = {}      # scope → cached get_dashboard_summary() result
+        self._summary_generation = 0
+
+    # ───── lifecycle ─────
+    def start(self, socketio):
+        """Load the initial state and start the publisher thread (idempotent)."""
+        self.io = socketio
+        if self._thread:
+            return
+        self._reload({"tasks", "history", "inventory"})
+        self._thread = threading.Thread(target=self._run, daemon=True, name="dashboard-state")
+        self._thread.start()
+
+    def _run(self):
+        next_camera_check = 0.0
+        while True:
+            with self.lock:
+                dirty, self._dirty = self._dirty, set()
+                watched = bool(self._subscribers)
+            # Nobody is looking: skip the camera check (subscribe() requests one for the first viewer)
+            if watched and time.monotonic() >= next_camera_check:
+                dirty.add("cameras")
+                next_camera_check = time.monotonic() + CAMERA_CHECK_INTERVAL
+            try:
+                self._reload(dirty)
+                self._publish()
+            except Exception as e:
+                logger.error(f"Dashboard state refresh failed: {e}", exc_info=True)
+            if self.wakeup.wait(timeout=CAMERA_CHECK_INTERVAL):
+                time.sleep(COALESCE_SECONDS)   # let a burst of writes settle
+            self.wakeup.clear()
+
+    # ───── notifications (called by writers) ─────
+    def _mark(self, *parts):
+        with self.lock:
+            self._dirty.update(parts)
+            if "tasks" in parts:
+                self._summaries.clear()
+                self._summary_generation += 1
+        self.wakeup.set()
+
+    def notify_tasks_changed(self):
+        """A work task was created, claimed, finished or removed (call after commit)."""
+        self._mark("tasks")
+
+    def notify_history_changed(self):
+        """A task completed: camera history, activity logs and inventory moved."""
+        self._mark("tasks", "history", "inventory")
+
+    # ───── loading ─────
+    def _reload(self, parts):
+        if "tasks" in parts:
+            counts_by_user = {}
+            conn = sqlite3.connect(DB_NAME)
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT created_by, status, movement, COUNT(*)
+                    FROM work_tasks
+                    GROUP BY created_by, status, movement
+                """)
+                for created_by, status, movement, n in cur.fetchall():
+                    bucket = _status_bucket(status)
+                    if bucket not in COUNT_STATUSES or movement not in MOVEMENTS:
+                        continue
+                    counts = counts_by_user.setdefault(created_by, _empty_counts())
+                    counts[bucket][movement] += n
+            finally:
+                conn.close()
+            with self.lock:
+                self._counts_by_user = counts_by_user
+        if "history" in parts:
+            history = get_camera_history(HISTORY_SIZE)
+            logs = get_activity_logs(HISTORY_SIZE, "desc")
+            with self.lock:
+                self._shared["camera_history"] = history
+                self._shared["activity_logs"] = logs
+        if "inventory" in parts:
+            conn = sqlite3.connect(DB_NAME)
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT rack, COUNT(*) FROM current_inventory GROUP BY rack")
+                stock = {rack: n for rack, n in cur.fetchall()}
+            finally:
+                conn.close()
+            with self.lock:
+                self._shared["rack_stock"] = stock
+        if "cameras" in parts:
+            # Devices the camera manager already opened; re-opening missing ones (ensure_cameras)
+            # is left to the camera HTTP routes. cv2 import kept off the module import path
+            from .camera_stream import camera_manager
+            cameras = sorted(camera_manager.get_available_cameras())
+            with self.lock:
+                self._shared["cameras"] = cameras
+
+    # ───── HTTP summary ─────
+    def summary(self, user_info: dict) -> dict:
+        """Task counters for /api/dashboard-summary, cached per scope until the next task change."""
+        scope = self.scope_for(user_info)
+        with self.lock:
+            cached = self._summaries.get(scope)
+            generation = self._summary_generation
+        if cached is not None:
+            return cached
+
+        query = "SELECT status, movement, COUNT(*) FROM work_tasks"
+        params = []
+        if scope != "all":
+            query += " WHERE created_by = ?"
+            params.append(user_info['id'])
+        query += " GROUP BY status, movement"
+
+        counts = _empty_counts()
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            cur = conn.cursor()
+            cur.execute(query, params)
+            for status, movement, n in cur.fetchall():
+                bucket = _status_bucket(status)
+                if bucket in COUNT_STATUSES and movement in MOVEMENTS:
+                    counts[bucket][movement] += n
+        finally:
+            conn.close()
+
+        result = {
+            "scope": scope,
+            "counts": counts,
+            "totals": {status: sum(by_movement.values()) for status, by_movement in counts.items()},
+        }
+        with self.lock:
+            # A task changed while we were reading: return the result but don't cache it
+            if generation == self._summary_generation:
+                self._summaries[scope] = result
+        return result
+
+    # ───── views / publishing ─────
+    def _view(self, scope: str) -> dict:
+        """Current state as seen by `scope` (caller holds self.lock)."""
+        if scope == "all":
+            counts = _empty_counts()
+            for user_counts in self._counts_by_user.values():
+                for status, by_movement in user_counts.items():
+                    for movement, n in by_movement.items():
+                        counts[status][movement] += n
+        else:
+            user_id = int(scope.split(":", 1)[1])
+            counts = self._counts_by_user.get(user_id) or _empty_counts()
+        view = {"counts": counts}
+        view.update(self._shared)
+        return view
+
+    def _advance(self, scope: str):
+        """Diff payload for `scope` against its last view, or None if unchanged (caller holds self.lock)."""
+        view = self._view(scope)
+        previous = self._views.get(scope)
+        if previous is None:
+            self._views[scope] = view
+            self._versions[scope] = 1
+            return None
+        changes = {key: value for key, value in view.items() if previous.get(key) != value}
+        if not changes:
+            return None
+        base_version = self._versions[scope]
+        self._views[scope] = view
+        self._versions[scope] = base_version + 1
+        return {"scope": scope, "version": base_version + 1, "base_version": base_version, "changes": changes}
+
+    def _publish(self):
+        self._drop_ended_sessions()
+        with self.lock:
+            scopes = {scope for scope, _ in self._subscribers.values()}
+            payloads = [p for p in (self._advance(scope) for scope in scopes) if p]
+        for payload in payloads:
+            self._emit_diff(payload)
+
+    def _emit_diff(self, payload):
+        if self.io:
+            self.io.emit("dashboard_diff", payload, to=f"dashboard:{payload['scope']}")
+
+    # ───── subscriptions ─────
+    @staticmethod
+    def scope_for(user_info: dict) -> str:
+        return "all" if user_info.get("role") == "admin" else f"user:{user_info['id']}"
+
+    def subscribe(self, sid: str, user_info: dict) -> dict:
+        """Register `sid` and return its snapshot. The caller joins room 'dashboard:<scope>'."""
+        scope = self.scope_for(user_info)
+        with self.lock:
+            first = not self._subscribers
+            self._subscribers[sid] = (scope, user_info.get('session_id'))
+        if first:
+            self._mark("cameras")   # the list went unchecked while nobody subscribed
+        return self.snapshot(user_info)
+
+    def unsubscribe(self, sid: str):
+        """Forget `sid`; returns the scope it was subscribed to (or None)."""
+        with self.lock:
+            entry = self._subscribers.pop(sid, None)
+        return entry[0] if entry else None
+
+    def drop_sessions(self, session_ids, reason: str = "replaced") -> int:
+        """
+        End the subscriptions made with any of `session_ids`: each sid leaves its
+        room and gets 'session_invalidated' with `reason` ('replaced' by a new
+        login, 'logout', 'ended'). Returns the number of sids dropped.
+        """
+        session_ids = set(session_ids)
+        with self.lock:
+            dropped = {sid: scope for sid, (scope, session_id) in self._subscribers.items()
+                       if session_id in session_ids}
+            for sid in dropped:
+                del self._subscribers[sid]
+        if self.io:
+            for sid, scope in dropped.items():
+                self.io.server.leave_room(sid, f"dashboard:{scope}", namespace="/")
+                self.io.emit("session_invalidated",
+                             {"error": get_error_message("session_invalidated"), "code": "session_invalidated",
+                              "reason": reason},
+                             to=sid)
+        if dropped:
+            logger.info("Dropped %s dashboard subscription(s) of ended session(s)", len(dropped))
+        return len(dropped)
+
+    def _drop_ended_sessions(self):
+        """Drop subscribers whose session is gone (e.g. replaced by a login in another process)."""
+        from .auth import session_active  # auth imports this module
+        with self.lock:
+            session_ids = {session_id for _, session_id in self._subscribers.values()}
+        ended = [session_id for session_id in session_ids if not session_active(session_id)]
+        if ended:
+            self.drop_sessions(ended, reason="ended")
+
+    def snapshot(self, user_info: dict) -> dict:
+        """Current {scope, version, state}. Pending changes are published first so versions stay linear."""
+        scope = self.scope_for(user_info)
+        with self.lock:
+            payload = self._advance(scope)
+            snapshot = {"scope": scope, "version": self._versions[scope], "state": self._views[scope]}
+        if payload:
+            self._emit_diff(payload)
+        return snapshot
+
+
+# ───── 전역 인스턴스 ─────
+dashboard_state = DashboardState()
+
+
+def notify_tasks_changed():
+    dashboard_state.notify_tasks_changed()
+
+
+def notify_history_changed():
+    dashboard_state.notify_history_changed()
+
+
+def get_dashboard_summary(user_info: dict) -> dict:
+    return dashboard_state.summary(user_info)
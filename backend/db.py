@@ -3,7 +3,16 @@ import sqlite3
 import os
 
 # Use absolute path to ensure consistent database location
-DB_NAME = os.path.join(os.path.dirname(os.path.dirname(__file__)), "database.db")
+# (INU_DB_PATH points the whole backend at another file, e.g. a benchmark's temp DB;
+# it must be set before the backend is imported)
+DB_NAME = os.environ.get("INU_DB_PATH") or os.path.join(os.path.dirname(os.path.dirname(__file__)), "database.db")
+
+
+def _add_column(cur, table, column, definition):
+    """Add a column to a table created by an older version (CREATE TABLE IF NOT EXISTS keeps the old schema)."""
+    cur.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cur.fetchall()}:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
 
 
 def init_db():
@@ -11,6 +20,10 @@ def init_db():
     conn = sqlite3.connect(DB_NAME)
     cur = conn.cursor()
 
+    # Only takes effect on a new, empty database; existing ones are converted on
+    # request (maintenance.py) so that incremental_vacuum can release free pages
+    cur.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+
     # ① 입·출 이력 (User actions are tracked here)
     cur.execute("""
         CREATE TABLE IF NOT EXISTS product_logs (
@@ -30,6 +43,10 @@ def init_db():
         );
     """)
 
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_product_logs_batch_id ON product_logs (batch_id);")
+    # Retention job deletes the oldest rows first (retention.py)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_product_logs_timestamp ON product_logs (timestamp, id);")
+
     # ② 현재 재고 (Physical equipment state - independent of users)
     cur.execute("""
         CREATE TABLE IF NOT EXISTS current_inventory (
@@ -89,9 +106,36 @@ def init_db():
             start_time TEXT,      -- Added for task timing
             end_time TEXT,        -- Added for task timing
             created_by INTEGER,   -- ID of the user who created the task
+            priority INTEGER NOT NULL DEFAULT 1,            -- effective level, raised by aging (task_queue.PRIORITY_LEVELS)
+            requested_priority INTEGER NOT NULL DEFAULT 1,  -- level the batch was submitted with
+            attempts INTEGER NOT NULL DEFAULT 0,     -- finished runs that failed and were retried
+            legs_done INTEGER NOT NULL DEFAULT 0,    -- serial legs already completed (M/rack), resumed on retry
+            leg_in_flight INTEGER,                   -- index of the leg whose command was sent but not finished
+            not_before TEXT,                         -- retry backoff: not claimed before this time
+            last_error TEXT,                         -- status of the last failed attempt
             FOREIGN KEY (created_by) REFERENCES users (id)
         );
     """)
+    _add_column(cur, "work_tasks", "priority", "INTEGER NOT NULL DEFAULT 1")
+    _add_column(cur, "work_tasks", "requested_priority", "INTEGER NOT NULL DEFAULT 1")
+    _add_column(cur, "work_tasks", "attempts", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(cur, "work_tasks", "legs_done", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(cur, "work_tasks", "leg_in_flight", "INTEGER")
+    _add_column(cur, "work_tasks", "not_before", "TEXT")
+    _add_column(cur, "work_tasks", "last_error", "TEXT")
+
+    # Worker claim: next pending task by priority, then age (task_queue.claim_next_task)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_work_tasks_claim ON work_tasks (status, priority DESC, created_at, id);")
+    # ...and its per-candidate check for an earlier task of the same slot still in retry backoff.
+    # Partial: only tasks that were ever requeued have not_before, and `not_before > ?` implies NOT NULL
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_work_tasks_slot_backoff ON work_tasks (status, rack, slot, not_before)
+        WHERE not_before IS NOT NULL;
+    """)
+    # Keyset pagination / status lookups on work_tasks (sort key: created_at, id)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_work_tasks_status_created ON work_tasks (status, created_at, id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_work_tasks_created_by_status ON work_tasks (created_by, status, created_at, id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_work_tasks_created_at ON work_tasks (created_at, id);")
 
     # ⑤ Camera Batch History
     cur.execute("""
@@ -156,5 +200,163 @@ def init_db():
     cur.execute("CREATE INDEX IF NOT EXISTS idx_camera_history_batch_id ON camera_batch_history (batch_id);")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_camera_history_created_at ON camera_batch_history (created_at);")
 
+    # ⑦ 시간별 입·출고 집계 (Hourly rollups, updated by the worker when a task completes)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS movement_rollup_hourly (
+            bucket_start   TEXT NOT NULL,        -- 'YYYY-MM-DDTHH:00:00' of the task end_time
+            rack           TEXT NOT NULL,
+            slot           INTEGER NOT NULL,
+            movement_type  TEXT NOT NULL,        -- 'IN' / 'OUT'
+            task_count     INTEGER NOT NULL DEFAULT 0,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            duration_sum   REAL NOT NULL DEFAULT 0,  -- seconds, start_time → end_time
+            duration_min   REAL,
+            duration_max   REAL,
+            PRIMARY KEY (bucket_start, rack, slot, movement_type)
+        );
+    """)
+    # Duration histogram per rollup bucket (bin index → count), used for percentiles
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS movement_duration_histogram (
+            bucket_start   TEXT NOT NULL,
+            rack           TEXT NOT NULL,
+            slot           INTEGER NOT NULL,
+            movement_type  TEXT NOT NULL,
+            bin            INTEGER NOT NULL,
+            count          INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket_start, rack, slot, movement_type, bin)
+        );
+    """)
+
+    # ⑧ 슬롯별 최근 완료 이동 (Latest completed movement per rack/slot/movement/product,
+    #    maintained by the worker; backs /api/activity-logs)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS latest_slot_movements (
+            rack           TEXT NOT NULL,
+            slot           INTEGER NOT NULL,
+            movement_type  TEXT NOT NULL,
+            product_code   TEXT NOT NULL,
+            log_id         INTEGER NOT NULL,     -- product_logs.id of the request
+            product_name   TEXT NOT NULL,
+            quantity       INTEGER NOT NULL,
+            cargo_owner    TEXT,
+            timestamp      TEXT NOT NULL,        -- product_logs.timestamp
+            batch_id       TEXT,
+            task_id        INTEGER,
+            start_time     TEXT,                 -- work_tasks.start_time
+            end_time       TEXT,                 -- work_tasks.end_time
+            task_status    TEXT NOT NULL,
+            PRIMARY KEY (rack, slot, movement_type, product_code)
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_latest_slot_movements_timestamp ON latest_slot_movements (timestamp, log_id);")
+
+    # ⑨ 보관 세그먼트 색인 (Archived product_logs / camera_batch_history rows,
+    #    gzip JSONL files written by the retention job; see archive.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS archive_segments (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name  TEXT NOT NULL,           -- 'product_logs' / 'camera_batch_history'
+            path        TEXT NOT NULL,           -- relative to the archive directory
+            first_id    INTEGER NOT NULL,
+            last_id     INTEGER NOT NULL,
+            min_time    TEXT,
+            max_time    TEXT,
+            row_count   INTEGER NOT NULL,
+            created_at  TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_segments_ids ON archive_segments (table_name, last_id, first_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_segments_time ON archive_segments (table_name, min_time, max_time);")
+
+    # ⑩ 입장 대기 배치 (Batches accepted while the system was busy, released by
+    #    priority, then id, when the running work drains; see admission.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS queued_batches (
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,   -- queue order
+            batch_id      TEXT NOT NULL UNIQUE,
+            kind          TEXT NOT NULL,           -- 'upload' (/api/upload-tasks) / 'record' (/api/record)
+            priority      INTEGER NOT NULL DEFAULT 1,
+            payload       TEXT NOT NULL,           -- JSON list of records
+            record_count  INTEGER NOT NULL,
+            user_id       INTEGER NOT NULL,
+            username      TEXT NOT NULL,
+            status        TEXT NOT NULL DEFAULT 'queued',   -- queued / released / rejected / cancelled
+            error         TEXT,
+            created_at    TEXT NOT NULL,
+            released_at   TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_queued_batches_release ON queued_batches (status, priority DESC, id);")
+
+    # ⑪ 작업 복구 기록 (Startup recovery decisions for tasks left in_progress by a
+    #    crash or power loss; see recovery.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS task_recovery_log (
+            id             INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id        INTEGER NOT NULL,
+            decision       TEXT NOT NULL,        -- 'reconciled_done' / 'retry' / 'failed'
+            new_status     TEXT NOT NULL,        -- work_tasks.status written by recovery
+            reason         TEXT NOT NULL,
+            devices        TEXT,                 -- JSON {device: responded to WHO}
+            rack           TEXT,
+            slot           INTEGER,
+            movement       TEXT,
+            task_started   TEXT,                 -- work_tasks.start_time of the interrupted run
+            created_at     TEXT NOT NULL,
+            FOREIGN KEY (task_id) REFERENCES work_tasks (id)
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_task_recovery_log_task ON task_recovery_log (task_id, decision);")
+
+    # ⑫ 작업 시도 이력 (One row per worker run of a task; see task_queue retry policy)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS task_attempts (
+            id             INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id        INTEGER NOT NULL,
+            attempt        INTEGER NOT NULL,     -- 1 = first run
+            started_at     TEXT NOT NULL,
+            finished_at    TEXT NOT NULL,
+            outcome        TEXT NOT NULL,        -- 'done' / 'retry' / 'failed'
+            status         TEXT NOT NULL,        -- 'done' or the failure status (failed_m_comm, ...)
+            serial_status  TEXT,                 -- SerialManager.send status of the failing leg
+            device         TEXT,                 -- device of the failing leg
+            legs_done      INTEGER NOT NULL,     -- legs completed when the run ended
+            retry_at       TEXT,                 -- not_before of the requeued task
+            FOREIGN KEY (task_id) REFERENCES work_tasks (id)
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_task_attempts_task ON task_attempts (task_id, attempt);")
+
+    # ⑬ 작업 단계별 소요 시간 (One row per worker run; seconds after the claim on the monotonic clock, see task_phases.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS task_phases (
+            id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id            INTEGER NOT NULL,
+            attempt            INTEGER NOT NULL,
+            rack               TEXT NOT NULL,
+            slot               INTEGER NOT NULL,
+            movement_type      TEXT NOT NULL,        -- 'IN' / 'OUT'
+            outcome            TEXT NOT NULL,        -- 'done' / 'retry' / 'failed' (as task_attempts)
+            claimed_at         TEXT NOT NULL,        -- wall clock, for date ranges
+            claim_s            REAL,                 -- claim_next_task query itself
+            m_send_s           REAL,                 -- M leg: command first written
+            m_echo_s           REAL,                 --        echo received (after any echo retries)
+            m_done_s           REAL,                 --        fin received
+            m_echo_attempts    INTEGER,
+            rack_send_s        REAL,                 -- rack leg: same marks, done received
+            rack_echo_s        REAL,
+            rack_done_s        REAL,
+            rack_echo_attempts INTEGER,
+            inventory_s        REAL,                 -- inventory updated
+            history_s          REAL,                 -- status, activity log, camera history, rollups written
+            finished_s         REAL NOT NULL,        -- attempt bookkeeping started
+            FOREIGN KEY (task_id) REFERENCES work_tasks (id)
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_task_phases_claimed ON task_phases (claimed_at);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_task_phases_task ON task_phases (task_id, attempt);")
+
     conn.commit()
     conn.close()
@@ -8,6 +8,9 @@ ERROR_MESSAGES = {
     "token_expired": "인증 토큰이 만료되었습니다",
     "invalid_token": "유효하지 않은 인증 토큰입니다",
     "invalid_credentials": "잘못된 로그인 정보입니다",
+    "login_busy": "로그인 요청이 많습니다. 잠시 후 다시 시도해주세요",
+    "admin_required": "관리자 권한이 필요합니다",
+    "session_invalidated": "세션이 만료되었습니다. 다른 사용자가 로그인했거나 다른 탭에서 로그인했습니다.",
 
     # Request format errors
     "json_body_required": "JSON 형식의 요청이 필요합니다",
@@ -25,6 +28,10 @@ ERROR_MESSAGES = {
     "failed_unknown_movement": "알 수 없는 이동 유형",
     "failed_inventory_update": "재고 업데이트 실패",
     "failed_exception": "작업 처리 중 오류 발생",
+    "failed_interrupted": "작업 도중 시스템이 중단되어 작업을 실패 처리했습니다",
+    "failed_device_unavailable": "복구 중 장비가 응답하지 않습니다",
+    "failed_inventory_conflict": "슬롯의 재고가 작업 내용과 다릅니다",
+    "failed_unconfirmed": "장비가 명령을 받았지만 완료 신호가 없습니다. 랙 상태를 확인한 뒤 처리해주세요",
 
     # Inventory errors
     "slot_occupied": "슬롯 {rack}-{slot}이(가) 이미 사용 중입니다",
@@ -35,15 +42,33 @@ ERROR_MESSAGES = {
     "invalid_rack": "잘못된 랙 값입니다. 허용 값: A, B, C",
     "invalid_slot_range": "잘못된 칸 값입니다. 1부터 80 사이여야 합니다",
 
+    # Admission queue
+    "batch_queued": "현재 작업이 진행 중이라 배치가 대기열 {position}번째에 등록되었습니다. 진행 중인 작업이 끝나면 자동으로 시작됩니다",
+    "admission_queue_full": "대기 중인 배치가 너무 많습니다. 잠시 후 다시 시도해주세요",
+    "queued_batch_not_found": "대기 중인 배치를 찾을 수 없습니다",
+    "fetch_admission_queue_error": "배치 대기열 조회 실패",
+    "slot_reserved": "슬롯 {rack}-{slot}은(는) 먼저 등록된 작업이 사용할 예정입니다",
+    "invalid_priority": "잘못된 우선순위입니다: {priority} (허용 값: low, normal, high, urgent)",
+
     # Database errors
     "database_error": "데이터베이스 오류",
     "fetch_tasks_error": "작업 목록 조회 실패",
     "fetch_counts_error": "작업 수 조회 실패",
+    "fetch_history_error": "작업 이력 조회 실패",
     "batch_not_found": "배치 ID를 찾을 수 없습니다",
+    "task_not_found": "작업을 찾을 수 없습니다",
+    "fetch_analytics_error": "통계 조회 실패",
+    "invalid_cursor": "잘못된 페이지 커서입니다",
+    "invalid_analytics_params": "잘못된 통계 조회 조건입니다 (날짜 형식: YYYY-MM-DD)",
 
     # General errors
     "unexpected_error": "예기치 않은 오류가 발생했습니다",
     "serial_disabled": "시리얼 통신이 비활성화되어 있습니다",
+    "metrics_disabled": "메트릭 수집이 비활성화되어 있습니다",
+    "profiler_busy": "프로파일링이 이미 실행 중입니다",
+    "invalid_profile_route": "등록되지 않은 경로입니다: {route}",
+    "profile_not_found": "프로파일 결과를 찾을 수 없습니다",
+    "invalid_log_level": "올바르지 않은 로그 레벨입니다 (DEBUG, INFO, WARNING, ERROR, CRITICAL)",
     "missing_racks": "연결되지 않은 랙: {racks}"
 }
 
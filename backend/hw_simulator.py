@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Hardware simulator for the rack / M serial protocol over pseudo-terminals.
+
+Every simulated device (racks A/B/C, main equipment M, optional module I)
+gets its own PTY pair; the backend opens the slave side like a USB serial
+port, so SerialManager discovery, send() echo/done handling and the worker
+run unchanged. Point discovery at the simulator with INU_SERIAL_PORTS:
+
+  python -m backend.hw_simulator --time-scale 0.1
+  # prints: export INU_SERIAL_PORTS=/dev/pts/5,/dev/pts/7,...
+  INU_SERIAL_PORTS=... python -m backend.app
+
+Protocol (same as the Arduino sketches):
+  WHO\n         → "<ID>\n"
+  <code>\n      → echo "<code>\n", then after the mechanical delay
+                  "done\n" (A/B/C) or "fin\n" (M); the optional module I
+                  only echoes. 99 is the reset command.
+
+Delays are drawn from distributions given as "<kind>:<params>" in seconds:
+  const:4   uniform:2,6   normal:4,0.5   lognormal:4,0.25 (median, sigma)   exp:4
+and multiplied by --time-scale.
+
+Fault injection (probability per command):
+  lost_echo   the command is lost on the wire: no echo, no movement
+              (send() retries after ECHO_TIMEOUT)
+  garbage     random bytes before the echo and before done/fin
+  lost_done   movement happens but done/fin never arrives
+              (send() returns timeout_after_echo after TIMEOUT)
+  disconnect  the device goes silent for disconnect_s seconds
+"""
+
+import argparse, logging, math, os, random, select, sys, threading, time, tty
+
+logger = logging.getLogger(__name__)
+
+DEVICE_IDS = ("A", "B", "C", "M", "I")
+MAIN_EQUIPMENT_ID = "M"
+OPTIONAL_MODULE_ID = "I"
+RESET_COMMAND = "99"
+
+DEFAULT_DELAYS = {
+    "rack": "lognormal:4.0,0.2",      # rack stores / retrieves a tray
+    "main": "lognormal:6.0,0.2",      # M moves between the rack approach area and the gate
+    "reset": "uniform:1.0,3.0",       # homing after 99
+    "echo": "uniform:0.002,0.02",     # UART turnaround before the echo
+}
+
+DEFAULT_FAULTS = {
+    "lost_echo": 0.0,
+    "garbage": 0.0,
+    "lost_done": 0.0,
+    "disconnect": 0.0,
+    "disconnect_s": 5.0,
+}
+
+
+def parse_distribution(spec: str):
+    """'lognormal:4,0.25' → function(rng) returning a non-negative delay in seconds."""
+    kind, _, raw = spec.partition(":")
+    try:
+        params = [float(p) for p in raw.split(",")] if raw else []
+        if kind == "const":
+            (value,) = params
+            return lambda rng: value
+        if kind == "uniform":
+            low, high = params
+            return lambda rng: rng.uniform(low, high)
+        if kind == "normal":
+            mu, sigma = params
+            return lambda rng: max(0.0, rng.gauss(mu, sigma))
+        if kind == "lognormal":
+            median, sigma = params
+            return lambda rng: median * math.exp(rng.gauss(0.0, sigma))
+        if kind == "exp":
+            (mean,) = params
+            return lambda rng: rng.expovariate(1.0 / mean)
+    except ValueError:
+        pass
+    raise ValueError(f"invalid delay distribution: {spec!r}")
+
+
+class SimulatedDevice(threading.Thread):
+    """One device on its own PTY; handles commands one at a time like the firmware."""
+
+    def __init__(self, device_id, delays, faults, time_scale=1.0, rng=None):
+        super().__init__(daemon=True, name=f"sim-{device_id}")
+        self.device_id = device_id
+        self.delays = delays
+        self.faults = faults
+        self.time_scale = time_scale
+        self.rng = rng or random.Random()
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)          # no line discipline echo / CRLF translation
+        self.port = os.ttyname(self.slave_fd)
+        self._stopped = threading.Event()
+        self._silent_until = 0.0
+        self.occupied = set()              # racks: slots holding a tray
+        self.stats = {"who": 0, "commands": 0, "lost_echo": 0, "garbage": 0, "lost_done": 0,
+                      "disconnects": 0, "ignored_while_silent": 0, "busy_s": 0.0, "anomalies": 0}
+
+    def stop(self):
+        self._stopped.set()
+
+    def close(self):
+        for fd in (self.master_fd, self.slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    # ───── I/O ─────
+    def _write(self, text: str):
+        try:
+            os.write(self.master_fd, text.encode())
+        except OSError:
+            pass
+
+    def _sleep(self, distribution):
+        delay = self.delays[distribution](self.rng) * self.time_scale
+        time.sleep(delay)
+        return delay
+
+    def _garbage(self):
+        if self.rng.random() < self.faults["garbage"]:
+            self.stats["garbage"] += 1
+            noise = bytes(self.rng.choice(b"#%&*+?@~^") for _ in range(self.rng.randint(1, 8)))
+            try:
+                os.write(self.master_fd, noise)
+            except OSError:
+                pass
+
+    def run(self):
+        buf = b""
+        while not self._stopped.is_set():
+            try:
+                ready, _, _ = select.select([self.master_fd], [], [], 0.1)
+                if not ready:
+                    continue
+                buf += os.read(self.master_fd, 1024)
+            except OSError:
+                break
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                command = line.decode("utf-8", "ignore").strip()
+                if command:
+                    self.handle(command)
+
+    # ───── protocol ─────
+    def handle(self, command: str):
+        if time.monotonic() < self._silent_until:
+            self.stats["ignored_while_silent"] += 1
+            return
+        if command.upper() == "WHO":
+            self.stats["who"] += 1
+            self._write(f"{self.device_id}\n")
+            return
+
+        self.stats["commands"] += 1
+        if self.rng.random() < self.faults["disconnect"]:
+            self.stats["disconnects"] += 1
+            self._silent_until = time.monotonic() + self.faults["disconnect_s"] * self.time_scale
+            logger.info(f"[sim {self.device_id}] disconnected for {self.faults['disconnect_s']}s (scaled)")
+            return
+        if self.rng.random() < self.faults["lost_echo"]:
+            self.stats["lost_echo"] += 1
+            return
+
+        self._sleep("echo")
+        self._garbage()
+        self._write(f"{command}\n")
+        if self.device_id == OPTIONAL_MODULE_ID:
+            return
+
+        started = time.monotonic()
+        if command == RESET_COMMAND:
+            self._sleep("reset")
+        else:
+            self._sleep("main" if self.device_id == MAIN_EQUIPMENT_ID else "rack")
+            self._track(command)
+        self.stats["busy_s"] += time.monotonic() - started
+
+        if self.rng.random() < self.faults["lost_done"]:
+            self.stats["lost_done"] += 1
+            return
+        self._garbage()
+        self._write("fin\n" if self.device_id == MAIN_EQUIPMENT_ID else "done\n")
+
+    def _track(self, command: str):
+        """Racks: positive slot stores a tray, negative retrieves one; count impossible moves."""
+        if self.device_id == MAIN_EQUIPMENT_ID:
+            return
+        try:
+            code = int(command)
+        except ValueError:
+            self.stats["anomalies"] += 1
+            return
+        slot = abs(code)
+        if code > 0:
+            if slot in self.occupied:
+                self.stats["anomalies"] += 1
+            self.occupied.add(slot)
+        else:
+            if slot not in self.occupied:
+                self.stats["anomalies"] += 1
+            self.occupied.discard(slot)
+
+
+class HardwareSimulator:
+    """A set of simulated devices. start() returns {device_id: pty path}."""
+
+    def __init__(self, devices=DEVICE_IDS, delays=None, faults=None, time_scale=1.0, seed=None):
+        specs = dict(DEFAULT_DELAYS, **(delays or {}))
+        self.delays = {name: parse_distribution(spec) for name, spec in specs.items()}
+        self.faults = dict(DEFAULT_FAULTS, **(faults or {}))
+        self.time_scale = float(time_scale)
+        rng = random.Random(seed)
+        self.devices = {
+            device_id: SimulatedDevice(device_id, self.delays, self.faults, self.time_scale,
+                                       random.Random(rng.random()))
+            for device_id in devices
+        }
+
+    def start(self) -> dict:
+        for device in self.devices.values():
+            device.start()
+        return self.ports()
+
+    def stop(self):
+        for device in self.devices.values():
+            device.stop()
+        for device in self.devices.values():
+            device.join(timeout=1)
+            device.close()
+
+    def ports(self) -> dict:
+        return {device_id: device.port for device_id, device in self.devices.items()}
+
+    def ports_env(self) -> str:
+        """Value for INU_SERIAL_PORTS."""
+        return ",".join(self.ports().values())
+
+    def stats(self) -> dict:
+        return {device_id: dict(device.stats) for device_id, device in self.devices.items()}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate racks A/B/C, M and module I on pseudo-terminals")
+    parser.add_argument("--devices", default=",".join(DEVICE_IDS), help="comma-separated device IDs")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiply every delay (0.1 = 10x faster)")
+    parser.add_argument("--rack-delay", default=DEFAULT_DELAYS["rack"])
+    parser.add_argument("--main-delay", default=DEFAULT_DELAYS["main"])
+    parser.add_argument("--reset-delay", default=DEFAULT_DELAYS["reset"])
+    parser.add_argument("--lost-echo", type=float, default=0.0, help="probability per command")
+    parser.add_argument("--garbage", type=float, default=0.0, help="probability per reply")
+    parser.add_argument("--lost-done", type=float, default=0.0, help="probability per command")
+    parser.add_argument("--disconnect", type=float, default=0.0, help="probability per command")
+    parser.add_argument("--disconnect-s", type=float, default=DEFAULT_FAULTS["disconnect_s"])
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--stats-interval", type=float, default=0, help="print device stats every N seconds")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    simulator = HardwareSimulator(
+        devices=[d.strip().upper() for d in args.devices.split(",") if d.strip()],
+        delays={"rack": args.rack_delay, "main": args.main_delay, "reset": args.reset_delay},
+        faults={"lost_echo": args.lost_echo, "garbage": args.garbage, "lost_done": args.lost_done,
+                "disconnect": args.disconnect, "disconnect_s": args.disconnect_s},
+        time_scale=args.time_scale, seed=args.seed,
+    )
+    ports = simulator.start()
+    for device_id, port in ports.items():
+        print(f"🔌 {device_id} → {port}")
+    print(f"export INU_SERIAL_PORTS={simulator.ports_env()}")
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(args.stats_interval or 3600)
+            if args.stats_interval:
+                print(simulator.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(simulator.stats())
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,10 @@
 """
 
 import sqlite3, datetime, logging
+from typing import Optional
 from .db import DB_NAME
-from .task_queue import enqueue_work_task          # ← 큐 모듈 import
+from .task_queue import enqueue_work_task, scheduler_state, DEFAULT_PRIORITY          # ← 큐 모듈 import
+from .dashboard_state import notify_tasks_changed
 from flask import current_app # Added for logging
 from .error_messages import get_error_message
 
@@ -18,7 +20,54 @@ def _now() -> str:
 
 
 # ────────────────────────────────────────────────
-def add_records(records: list[dict], batch_id: str = None, user_info: dict = None):
+def validate_records(records: list[dict], occupied: set) -> Optional[str]:
+    """
+    배치 레코드를 슬롯 점유 상태에 대해 검증한다.
+    occupied: 재고가 있는 (rack, slot) 집합 — add_records 는 current_inventory,
+    admission 대기열은 대기 중인 작업까지 반영한 예상 상태를 넘긴다.
+
+    Returns:
+        오류 메시지 (문제 없으면 None)
+    """
+    slots_to_be_emptied = set()  # Slots that will be emptied by OUT operations
+    slots_to_be_filled = set()   # Slots that will be filled by IN operations
+
+    for record in records:
+        rack = str(record['rack']).upper()
+        try:
+            slot = int(record['slot'])
+        except Exception:
+            return get_error_message("invalid_slot_range")
+        movement = str(record['movement']).upper()
+
+        # Hard constraints: valid rack and slot range
+        if rack not in { 'A', 'B', 'C' }:
+            return get_error_message("invalid_rack")
+        if slot < 1 or slot > 80:
+            return get_error_message("invalid_slot_range")
+
+        if movement == 'IN':
+            if (rack, slot) in occupied:
+                return get_error_message("slot_occupied", rack=rack, slot=slot)
+            if (rack, slot) in slots_to_be_filled:
+                return get_error_message("multiple_in_operations", rack=rack, slot=slot)
+            slots_to_be_filled.add((rack, slot))
+
+        elif movement == 'OUT':
+            if (rack, slot) not in occupied:
+                return get_error_message("no_inventory", rack=rack, slot=slot)
+            if (rack, slot) in slots_to_be_emptied:
+                return get_error_message("multiple_out_operations", rack=rack, slot=slot)
+            slots_to_be_emptied.add((rack, slot))
+
+        else:
+            return get_error_message("invalid_movement", movement=movement)
+    return None
+
+
+# ────────────────────────────────────────────────
+def add_records(records: list[dict], batch_id: str = None, user_info: dict = None,
+                priority: int = DEFAULT_PRIORITY):
     """
     records 예시:
     {
@@ -36,6 +85,8 @@ def add_records(records: list[dict], batch_id: str = None, user_info: dict = Non
       "id": 1,
       "username": "admin"
     }
+
+    priority: 배치의 모든 작업에 붙는 우선순위 (task_queue.PRIORITY_LEVELS)
     """
     if not user_info or 'id' not in user_info or 'username' not in user_info:
         raise ValueError(get_error_message("invalid_credentials"))
@@ -51,48 +102,12 @@ def add_records(records: list[dict], batch_id: str = None, user_info: dict = Non
         cur = conn.cursor()
         logger.debug("add_records: Cursor created.")
 
-        # First pass: collect all operations and validate
-        slots_to_be_emptied = set()  # Slots that will be emptied by OUT operations
-        slots_to_be_filled = set()   # Slots that will be filled by IN operations
-        current_inventory = {}       # Track current inventory state
-
-        # Get current inventory state
-        cur.execute("SELECT rack, slot, product_code, total_quantity FROM current_inventory")
-        for row in cur.fetchall():
-            rack, slot, product_code, quantity = row
-            current_inventory[(rack, slot)] = (product_code, quantity)
-
-        # Validate all records first
-        for record in records:
-            rack = str(record['rack']).upper()
-            try:
-                slot = int(record['slot'])
-            except Exception:
-                return False, get_error_message("invalid_slot_range")
-            movement = str(record['movement']).upper()
-
-            # Hard constraints: valid rack and slot range
-            if rack not in { 'A', 'B', 'C' }:
-                return False, get_error_message("invalid_rack")
-            if slot < 1 or slot > 80:
-                return False, get_error_message("invalid_slot_range")
-
-            if movement == 'IN':
-                if (rack, slot) in current_inventory:
-                    return False, get_error_message("slot_occupied", rack=rack, slot=slot)
-                if (rack, slot) in slots_to_be_filled:
-                    return False, get_error_message("multiple_in_operations", rack=rack, slot=slot)
-                slots_to_be_filled.add((rack, slot))
-            
-            elif movement == 'OUT':
-                if (rack, slot) not in current_inventory:
-                    return False, get_error_message("no_inventory", rack=rack, slot=slot)
-                if (rack, slot) in slots_to_be_emptied:
-                    return False, get_error_message("multiple_out_operations", rack=rack, slot=slot)
-                slots_to_be_emptied.add((rack, slot))
-            
-            else:
-                return False, get_error_message("invalid_movement", movement=movement)
+        # First pass: validate every record against the current inventory
+        cur.execute("SELECT rack, slot FROM current_inventory")
+        occupied = {(rack, slot) for rack, slot in cur.fetchall()}
+        error = validate_records(records, occupied)
+        if error:
+            return False, error
 
         # All records validated, proceed with insertion
         now = _now()
@@ -120,7 +135,7 @@ def add_records(records: list[dict], batch_id: str = None, user_info: dict = Non
             ))
 
             # Enqueue task with user info
-            task_id = enqueue_work_task(record, user_info, conn, cur)
+            task_id = enqueue_work_task(record, user_info, conn, cur, priority)
             if task_id:
                 generated_task_ids.append(task_id)
                 logger.debug("add_records: Task enqueued for record %d with task_id: %s.", i, task_id)
@@ -133,6 +148,8 @@ def add_records(records: list[dict], batch_id: str = None, user_info: dict = Non
                 """, (batch_id, task_id, user_info['id']))
 
         conn.commit()
+        scheduler_state.tasks_added(len(generated_task_ids))
+        notify_tasks_changed()
         logger.info("add_records: Successfully processed %s records.", len(records))
         return True, None
 
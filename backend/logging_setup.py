@@ -0,0 +1,198 @@
+# logging_setup.py
+"""
+Process-wide logging that never blocks the thread that logs.
+
+configure() replaces the root handlers (basicConfig's, Flask's default
+stderr handler) with one QueueHandler. A log call on the worker, a request
+thread or the camera loop only merges msg % args and puts the record on a
+bounded queue; a QueueListener thread formats it (text or one JSON object
+per line) and does the stderr / file writes. When the queue is full the
+record is dropped and counted instead of stalling the caller.
+
+Levels are per logger name ('backend.serial_io', 'backend.app', 'engineio',
+...) and can be changed at runtime through set_level()
+(GET/POST /api/admin/log-levels). Use %-style arguments on hot paths,
+logger.debug("task %s", task_id), so nothing is formatted while the level
+is off.
+"""
+
+import atexit, datetime, json, logging, logging.handlers, os, queue, sys, threading
+
+DEFAULTS = {
+    'LOG_LEVEL': 'INFO',
+    'LOG_LEVELS': {                     # per-logger levels on top of LOG_LEVEL
+        'engineio': 'WARNING',          # engineio / socketio log every packet at INFO
+        'socketio': 'WARNING',
+        'werkzeug': 'WARNING',          # one access line per request
+    },
+    'LOG_FORMAT': 'text',               # 'text' or 'json' (one object per line)
+    'LOG_FILE': None,                   # also write here (rotated at LOG_FILE_MAX_BYTES)
+    'LOG_FILE_MAX_BYTES': 10 * 1024 * 1024,
+    'LOG_FILE_BACKUPS': 5,
+    'LOG_QUEUE_SIZE': 10000,
+}
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+
+# LogRecord attributes that are not `extra=` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, thread, message, exc, plus any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Enqueue without blocking; drop (and count) when the listener falls behind."""
+
+    def __init__(self, log_queue, owner):
+        super().__init__(log_queue)
+        self.owner = owner
+
+    def prepare(self, record):
+        # Only what must happen on the caller's thread: args may be mutated after
+        # the call returns and exc_info holds frames. Formatting is the listener's job.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.owner.count_drop()
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # the stdlib uses put_nowait, which fails on a full bounded queue
+        self.queue.put(self._sentinel, timeout=5)
+
+
+class LogSystem:
+    def __init__(self):
+        self.config = dict(DEFAULTS)
+        self.lock = threading.Lock()
+        self.listener = None
+        self.handler = None
+        self.dropped = 0
+        self._atexit = False
+
+    def configure(self, config):
+        """(Re)install the queue handler on the root logger and apply the levels."""
+        for key in DEFAULTS:
+            if key in config:
+                self.config[key] = config[key]
+        fmt = str(self.config['LOG_FORMAT']).lower()
+        if fmt not in ("text", "json"):
+            raise ValueError(f"LOG_FORMAT must be 'text' or 'json', not {self.config['LOG_FORMAT']!r}")
+        formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+
+        outputs = [logging.StreamHandler(sys.stderr)]
+        if self.config['LOG_FILE']:
+            os.makedirs(os.path.dirname(os.path.abspath(self.config['LOG_FILE'])), exist_ok=True)
+            outputs.append(logging.handlers.RotatingFileHandler(
+                self.config['LOG_FILE'], maxBytes=int(self.config['LOG_FILE_MAX_BYTES']),
+                backupCount=int(self.config['LOG_FILE_BACKUPS']), encoding="utf-8"))
+        for output in outputs:
+            output.setFormatter(formatter)
+
+        root = logging.getLogger()
+        with self.lock:
+            self._stop_listener()
+            log_queue = queue.Queue(maxsize=int(self.config['LOG_QUEUE_SIZE']))
+            for existing in root.handlers[:]:
+                root.removeHandler(existing)
+            self.handler = _QueueHandler(log_queue, self)
+            root.addHandler(self.handler)
+            self.listener = _QueueListener(log_queue, *outputs)
+            self.listener.start()
+            if not self._atexit:
+                atexit.register(self.stop)
+                self._atexit = True
+
+        root.setLevel(self._level(self.config['LOG_LEVEL']))
+        for name, level in (self.config['LOG_LEVELS'] or {}).items():
+            logging.getLogger(name).setLevel(self._level(level))
+
+    def set_level(self, name: str, level):
+        """Set a logger's level at runtime ('root' for the root logger, level None/'NOTSET' to inherit)."""
+        self.set_levels({name: level})
+
+    def set_levels(self, levels: dict):
+        """Apply {logger name: level}; raises ValueError (changing nothing) on an unknown level."""
+        resolved = {name: logging.NOTSET if level in (None, "", "NOTSET") else self._level(level)
+                    for name, level in levels.items()}
+        for name, level in resolved.items():
+            if name in ("", "root") and level == logging.NOTSET:
+                raise ValueError("the root logger needs a level")
+        for name, level in resolved.items():
+            (logging.getLogger() if name in ("", "root") else logging.getLogger(name)).setLevel(level)
+
+    def levels(self) -> dict:
+        """Root level, every logger with an explicit level, and queue state."""
+        explicit = {}
+        for name, logger in sorted(logging.root.manager.loggerDict.items()):
+            if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+                explicit[name] = logging.getLevelName(logger.level)
+        return {
+            "root": logging.getLevelName(logging.getLogger().level),
+            "loggers": explicit,
+            "format": self.config['LOG_FORMAT'],
+            "queued": self.handler.queue.qsize() if self.handler else 0,
+            "queue_size": int(self.config['LOG_QUEUE_SIZE']),
+            "dropped": self.dropped,
+        }
+
+    def count_drop(self):
+        with self.lock:
+            self.dropped += 1
+
+    def stop(self):
+        """Flush what is queued and stop the listener (registered with atexit)."""
+        with self.lock:
+            self._stop_listener()
+
+    def _stop_listener(self):
+        if self.listener:
+            try:
+                self.listener.stop()
+            except queue.Full:
+                pass
+            self.listener = None
+
+    @staticmethod
+    def _level(level) -> int:
+        if isinstance(level, int):
+            return level
+        name = str(level).upper()
+        if name not in LEVELS:
+            raise ValueError(f"unknown log level {level!r} (use {', '.join(LEVELS)})")
+        return getattr(logging, name)
+
+
+# ───── 전역 인스턴스 ─────
+log_system = LogSystem()
@@ -0,0 +1,346 @@
+# maintenance.py
+"""
+Database maintenance: online backups, incremental VACUUM and ANALYZE.
+
+database.db was never backed up (copying the file while the worker writes
+can produce a corrupt copy) nor compacted after the retention job frees
+pages. This service does both without getting in the worker's way:
+
+  backup   sqlite3 backup API, BACKUP_PAGES_PER_STEP pages per step with
+           BACKUP_STEP_SLEEP_S between steps, so the source is only locked
+           for one short step at a time. Written to a temp file and renamed;
+           the newest BACKUP_KEEP files are kept in BACKUP_DIR. A write from
+           another connection restarts the copy; after BACKUP_MAX_RESTARTS the
+           attempt is abandoned and retried in the next window instead of
+           locking writers out for a one-shot copy.
+  vacuum   PRAGMA incremental_vacuum(VACUUM_PAGES_PER_STEP) repeated while
+           there are free pages and the system stays idle.
+  analyze  ANALYZE with a bounded analysis_limit once per ANALYZE_INTERVAL_S.
+
+Vacuum/analyze only run in idle windows (task_queue.system_busy() with
+MAINTENANCE_IDLE_SECONDS of cooldown) and re-check between steps. A backup
+waits for an idle window too, but runs anyway (still paced) once it is
+BACKUP_MAX_DELAY_S overdue.
+
+incremental_vacuum needs auto_vacuum=INCREMENTAL. New databases get it from
+init_db(). An existing database needs a full VACUUM, which rewrites the whole
+file and locks every other connection out until it is done, so it only runs
+when asked for: request_convert() (POST /api/admin/maintenance/convert) runs it
+in the next idle window, or with the backend stopped
+
+    python -m backend.maintenance convert
+
+MAINTENANCE_CONVERT_AUTO_VACUUM=True makes the service convert on its own in
+the first idle window instead.
+
+Under INU_ASYNC_MODE=eventlet this thread is a green thread on the hub, so the
+SQLite work itself (each backup copy, vacuum step, ANALYZE, the conversion)
+goes through async_mode.offload() onto an OS thread. The _*_step functions
+below therefore only use their own connections (connect_for_offload) and plain
+values; status updates, logging and the idle checks stay in the service.
+"""
+
+import datetime, logging, os, threading, time
+from . import db
+from .async_mode import offload, blocking_sleep, connect_for_offload
+from .task_queue import system_busy
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAINTENANCE_CHECK_INTERVAL_S': 30,
+    'MAINTENANCE_IDLE_SECONDS': 60,
+    'BACKUP_DIR': None,                  # default: <database dir>/backups
+    'BACKUP_INTERVAL_S': 24 * 3600,
+    'BACKUP_MAX_DELAY_S': 6 * 3600,
+    'BACKUP_KEEP': 7,
+    'BACKUP_PAGES_PER_STEP': 256,         # ~1 MB per step with 4 KB pages: about a millisecond of read lock
+    'BACKUP_STEP_SLEEP_S': 0.005,
+    'BACKUP_MAX_RESTARTS': 5,
+    'VACUUM_PAGES_PER_STEP': 128,
+    'VACUUM_STEP_SLEEP_S': 0.05,
+    'ANALYZE_INTERVAL_S': 24 * 3600,
+    'ANALYZE_LIMIT': 1000,
+    'MAINTENANCE_CONVERT_AUTO_VACUUM': False,   # True: convert in the first idle window without being asked
+}
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class BackupRestartedError(Exception):
+    """Concurrent writes kept restarting the online backup."""
+
+
+# ───── offloaded steps (OS thread under eventlet: no locks, logging or green sleeps) ─────
+def _backup_step(tmp_path, pages_per_step, step_sleep, max_restarts, progress_state):
+    """Paced online copy of the database into tmp_path. Returns the copy's page count."""
+    restarts = [0, None]    # count, remaining after the previous step
+
+    def progress(status, remaining, total):
+        # Called after every step; sleeping here paces the copy and lets writers in
+        if restarts[1] is not None and remaining >= restarts[1]:
+            restarts[0] += 1   # source changed under us: SQLite started over
+            if restarts[0] > max_restarts:
+                raise BackupRestartedError(f"backup restarted {restarts[0]} times by concurrent writes")
+        restarts[1] = remaining
+        progress_state.update(remaining=remaining, total=total, restarts=restarts[0])
+        if remaining:
+            blocking_sleep(step_sleep)
+
+    source = connect_for_offload(db.DB_NAME, timeout=10)
+    target = connect_for_offload(tmp_path)
+    try:
+        source.backup(target, pages=pages_per_step, progress=progress)
+        return target.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+
+def _pragma_step(conn, sql):
+    return conn.execute(sql).fetchone()[0]
+
+
+def _vacuum_step(conn, pages_per_step):
+    """One incremental_vacuum step. Returns the free pages left."""
+    # executescript steps the pragma to completion (execute() frees a single page)
+    conn.executescript(f"PRAGMA incremental_vacuum({pages_per_step});")
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _script_step(script):
+    conn = connect_for_offload(db.DB_NAME, timeout=10, isolation_level=None)
+    try:
+        conn.executescript(script)
+    finally:
+        conn.close()
+
+
+class MaintenanceService:
+    def __init__(self):
+        self.config = dict(DEFAULTS)
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self._thread = None
+        self._backup_requested = False
+        self._convert_requested = False
+        self._status = {
+            "state": "idle",             # idle / backup / vacuum / analyze / convert
+            "last_backup": None,         # {path, finished, seconds, pages}
+            "backup_progress": None,     # {remaining, total, restarts} while a backup runs
+            "last_vacuum": None,         # {finished, pages_freed}
+            "last_analyze": None,
+            "freelist_pages": None,
+            "convert_requested": False,  # auto_vacuum conversion waiting for an idle window
+            "last_convert": None,        # {finished, seconds}
+            "last_error": None,
+        }
+        # monotonic times; 0 → due on the first idle window after start
+        self._next_backup = 0.0
+        self._backup_due_since = None
+        self._next_analyze = 0.0
+        self._deferred_until = 0.0
+
+    # ───── lifecycle ─────
+    def configure(self, config):
+        for key in DEFAULTS:
+            if key in config:
+                self.config[key] = config[key]
+
+    def start(self, config=None):
+        """Start the maintenance thread (idempotent)."""
+        if config is not None:
+            self.configure(config)
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="db-maintenance")
+        self._thread.start()
+
+    def request_backup(self):
+        """Take a backup now (paced, without waiting for an idle window)."""
+        with self.lock:
+            self._backup_requested = True
+        self.wakeup.set()
+
+    def request_convert(self):
+        """Convert to auto_vacuum=INCREMENTAL (full VACUUM) in the next idle window."""
+        with self.lock:
+            self._convert_requested = True
+            self._status["convert_requested"] = True
+        self.wakeup.set()
+
+    def defer(self, seconds: float):
+        """Hold scheduled backup / vacuum / ANALYZE for `seconds` (load tests). request_backup() still runs."""
+        with self.lock:
+            self._deferred_until = time.monotonic() + seconds
+
+    def status(self) -> dict:
+        with self.lock:
+            status = dict(self._status)
+        if status["backup_progress"] is not None:
+            status["backup_progress"] = dict(status["backup_progress"])
+        return status
+
+    def _update(self, **fields):
+        with self.lock:
+            self._status.update(fields)
+
+    def _idle(self) -> bool:
+        return not system_busy(min_idle_seconds=self.config['MAINTENANCE_IDLE_SECONDS'])
+
+    def _loop(self):
+        while True:
+            self.wakeup.wait(timeout=float(self.config['MAINTENANCE_CHECK_INTERVAL_S']))
+            self.wakeup.clear()
+            try:
+                self.run_pending()
+            except Exception as e:
+                self._update(state="idle", last_error=str(e))
+                logger.error(f"Database maintenance failed: {e}", exc_info=True)
+
+    def run_pending(self):
+        """Run whatever is due. Called by the maintenance thread."""
+        now = time.monotonic()
+        with self.lock:
+            requested, self._backup_requested = self._backup_requested, False
+        if not requested and now < self._deferred_until:
+            return
+        backup_due = now >= self._next_backup
+        if backup_due and self._backup_due_since is None:
+            self._backup_due_since = now
+        overdue = backup_due and now - self._backup_due_since >= float(self.config['BACKUP_MAX_DELAY_S'])
+
+        idle = self._idle()
+        if requested or (backup_due and (idle or overdue)):
+            self.backup()
+            self._next_backup = time.monotonic() + float(self.config['BACKUP_INTERVAL_S'])
+            self._backup_due_since = None
+            idle = self._idle()
+        if not idle:
+            return
+        with self.lock:
+            convert = self._convert_requested
+            self._convert_requested = False
+            self._status["convert_requested"] = False
+        if convert or self.config['MAINTENANCE_CONVERT_AUTO_VACUUM']:
+            if self._auto_vacuum_mode() != AUTO_VACUUM_INCREMENTAL:
+                self.convert_auto_vacuum()
+                return
+            if convert:
+                logger.info("Database already uses auto_vacuum=INCREMENTAL, nothing to convert")
+        self.incremental_vacuum()
+        if time.monotonic() >= self._next_analyze and self._idle():
+            self.analyze()
+            self._next_analyze = time.monotonic() + float(self.config['ANALYZE_INTERVAL_S'])
+
+    # ───── backup ─────
+    def backup_dir(self) -> str:
+        return self.config['BACKUP_DIR'] or os.path.join(os.path.dirname(db.DB_NAME), "backups")
+
+    def backup(self) -> str:
+        """Consistent online copy of the database in paced steps. Returns the backup path."""
+        directory = self.backup_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"database-{datetime.datetime.now():%Y%m%d-%H%M%S}.db")
+        tmp_path = path + ".tmp"
+        # filled in by the copy step itself, read by status()
+        progress_state = {"remaining": None, "total": None, "restarts": 0}
+        self._update(state="backup", backup_progress=progress_state)
+        started = time.monotonic()
+        try:
+            pages = offload(_backup_step, tmp_path, int(self.config['BACKUP_PAGES_PER_STEP']),
+                            float(self.config['BACKUP_STEP_SLEEP_S']), int(self.config['BACKUP_MAX_RESTARTS']),
+                            progress_state)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._update(state="idle", backup_progress=None)
+            raise
+        os.replace(tmp_path, path)
+        self._prune_backups(directory)
+        seconds = round(time.monotonic() - started, 3)
+        self._update(state="idle", backup_progress=None, last_backup={
+            "path": path, "finished": datetime.datetime.now().isoformat(timespec="seconds"),
+            "seconds": seconds, "pages": pages})
+        logger.info(f"Database backup written to {path} ({pages} pages, {seconds}s)")
+        return path
+
+    def _prune_backups(self, directory):
+        backups = sorted(f for f in os.listdir(directory) if f.startswith("database-") and f.endswith(".db"))
+        for name in backups[:-int(self.config['BACKUP_KEEP'])]:
+            os.remove(os.path.join(directory, name))
+
+    # ───── vacuum / analyze ─────
+    def _auto_vacuum_mode(self) -> int:
+        conn = connect_for_offload(db.DB_NAME)
+        try:
+            return offload(_pragma_step, conn, "PRAGMA auto_vacuum")
+        finally:
+            conn.close()
+
+    def convert_auto_vacuum(self):
+        """One-time switch of an existing database to auto_vacuum=INCREMENTAL (needs a full VACUUM)."""
+        self._update(state="convert")
+        started = time.monotonic()
+        try:
+            offload(_script_step, "PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+        finally:
+            self._update(state="idle")
+        seconds = round(time.monotonic() - started, 3)
+        self._update(last_convert={"finished": datetime.datetime.now().isoformat(timespec="seconds"),
+                                   "seconds": seconds})
+        logger.info(f"Database converted to auto_vacuum=INCREMENTAL in {seconds}s")
+
+    def incremental_vacuum(self) -> int:
+        """Release free pages in small steps while idle. Returns pages freed."""
+        pages_per_step = int(self.config['VACUUM_PAGES_PER_STEP'])
+        freed = 0
+        conn = connect_for_offload(db.DB_NAME, timeout=10, isolation_level=None)
+        try:
+            free = offload(_pragma_step, conn, "PRAGMA freelist_count")
+            self._update(freelist_pages=free)
+            if not free:
+                return 0
+            self._update(state="vacuum")
+            while free and self._idle():
+                remaining = offload(_vacuum_step, conn, pages_per_step)
+                if remaining >= free:
+                    break   # nothing released (auto_vacuum not incremental)
+                freed += free - remaining
+                free = remaining
+                self._update(freelist_pages=free)
+                time.sleep(float(self.config['VACUUM_STEP_SLEEP_S']))
+        finally:
+            conn.close()
+            self._update(state="idle")
+        if freed:
+            self._update(last_vacuum={"finished": datetime.datetime.now().isoformat(timespec="seconds"),
+                                      "pages_freed": freed})
+            logger.info(f"Incremental vacuum released {freed} pages")
+        return freed
+
+    def analyze(self):
+        """Refresh planner statistics with a bounded sample."""
+        self._update(state="analyze")
+        started = time.monotonic()
+        try:
+            offload(_script_step, f"PRAGMA analysis_limit = {int(self.config['ANALYZE_LIMIT'])}; ANALYZE;")
+        finally:
+            self._update(state="idle", last_analyze=datetime.datetime.now().isoformat(timespec="seconds"))
+        logger.info(f"ANALYZE finished in {time.monotonic() - started:.2f}s")
+
+
+# ───── 전역 인스턴스 ─────
+maintenance = MaintenanceService()
+
+
+if __name__ == "__main__":
+    # 백엔드를 멈춘 상태에서 실행: python -m backend.maintenance convert
+    import sys
+    if sys.argv[1:] != ["convert"]:
+        sys.exit("usage: python -m backend.maintenance convert")
+    if maintenance._auto_vacuum_mode() == AUTO_VACUUM_INCREMENTAL:
+        print(f"{db.DB_NAME} already uses auto_vacuum=INCREMENTAL")
+    else:
+        maintenance.convert_auto_vacuum()
+        print(f"{db.DB_NAME} converted to auto_vacuum=INCREMENTAL in {maintenance.status()['last_convert']['seconds']}s")
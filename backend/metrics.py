@@ -0,0 +1,226 @@
+# metrics.py
+"""
+Prometheus metrics, served by app.py at GET /metrics.
+
+  inu_serial_echo_seconds{device}              command written → echo received
+  inu_serial_done_seconds{device}              echo → done/fin (mechanical time)
+  inu_serial_commands_total{device,status}     send() results (done, echo_error_max_retries, ...)
+  inu_serial_echo_retries_total{device}        echo attempts beyond the first
+  inu_task_queue_wait_seconds{priority}        created_at → first claim
+  inu_task_execution_seconds{outcome}          claim → attempt finished (done / retry / failed)
+  inu_tasks_pending / inu_tasks_in_progress    scheduler counters
+  inu_db_query_seconds{site}                   sqlite execute/fetch/commit per backend function
+  inu_http_request_seconds{method,route}       Flask handler time (streamed responses excluded)
+  inu_http_requests_total{method,route,status}
+  inu_socketio_emits_total{event}
+  inu_camera_frames_total{rack}                captured frames (rate() = capture fps)
+  inu_camera_drops_total{rack}                 failed captures
+  inu_camera_capture_seconds{rack}
+  inu_camera_encode_seconds{rack}              JPEG encode for the MJPEG stream
+  inu_camera_stream_clients{rack}
+
+The metrics live in the default registry of this process; with several
+worker processes each one serves its own numbers.
+"""
+
+import os, sqlite3, sys, threading, time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SERIAL_ECHO = Histogram("inu_serial_echo_seconds", "Serial command written to echo received", ["device"],
+                        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+SERIAL_DONE = Histogram("inu_serial_done_seconds", "Serial echo to done/fin (mechanical operation)", ["device"],
+                        buckets=(0.5, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 60, 120))
+SERIAL_COMMANDS = Counter("inu_serial_commands_total", "Serial send() results", ["device", "status"])
+SERIAL_ECHO_RETRIES = Counter("inu_serial_echo_retries_total", "Echo attempts beyond the first", ["device"])
+
+TASK_QUEUE_WAIT = Histogram("inu_task_queue_wait_seconds", "Task created to first claim", ["priority"],
+                            buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200))
+TASK_EXECUTION = Histogram("inu_task_execution_seconds", "Task claim to attempt finished", ["outcome"],
+                           buckets=(1, 2.5, 5, 10, 15, 20, 30, 45, 60, 120, 300))
+TASKS_PENDING = Gauge("inu_tasks_pending", "Pending tasks")
+TASKS_IN_PROGRESS = Gauge("inu_tasks_in_progress", "Tasks in progress")
+
+DB_QUERY = Histogram("inu_db_query_seconds", "SQLite execute/fetch/commit time per backend function", ["site"],
+                     buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+
+HTTP_LATENCY = Histogram("inu_http_request_seconds", "Flask request handling time", ["method", "route"],
+                         buckets=_LATENCY_BUCKETS)
+HTTP_REQUESTS = Counter("inu_http_requests_total", "HTTP requests", ["method", "route", "status"])
+
+SOCKETIO_EMITS = Counter("inu_socketio_emits_total", "Socket.IO events emitted by the server", ["event"])
+
+CAMERA_FRAMES = Counter("inu_camera_frames_total", "Frames captured", ["rack"])
+CAMERA_DROPS = Counter("inu_camera_drops_total", "Failed frame captures", ["rack"])
+CAMERA_CAPTURE = Histogram("inu_camera_capture_seconds", "Frame capture time", ["rack"],
+                           buckets=(0.001, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 1.0))
+CAMERA_ENCODE = Histogram("inu_camera_encode_seconds", "JPEG encode time", ["rack"],
+                          buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1))
+CAMERA_CLIENTS = Gauge("inu_camera_stream_clients", "Open MJPEG streams", ["rack"])
+
+
+def render():
+    """(body, content type) for the /metrics response."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# ───── Flask / Socket.IO ─────
+def instrument_app(app):
+    """Time every request; the route label is the URL rule, so /api/tasks/<id> stays one series."""
+    from flask import g, request
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _metrics_observe(response):
+        started = g.pop('metrics_started', None)
+        if started is not None and not response.is_streamed:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            HTTP_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        return response
+
+
+def instrument_socketio(socketio):
+    """Count server emits per event (socketio.emit and flask_socketio.emit both go through the instance)."""
+    emit = socketio.emit
+
+    def counted_emit(event, *args, **kwargs):
+        SOCKETIO_EMITS.labels(event).inc()
+        return emit(event, *args, **kwargs)
+
+    socketio.emit = counted_emit
+
+
+def watch_scheduler(scheduler_state):
+    """Read the pending / in_progress gauges from task_queue.scheduler_state at scrape time."""
+    TASKS_PENDING.set_function(lambda: scheduler_state.pending)
+    TASKS_IN_PROGRESS.set_function(lambda: scheduler_state.in_progress)
+
+
+# ───── SQLite timing ─────
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_DIRS = (os.path.join(_BACKEND_DIR, "benchmarks"),)
+_observers = []
+_observers_lock = threading.Lock()
+_sites = {}     # code object → 'module.function' or None (not backend code)
+
+
+def call_site(depth=1) -> str:
+    """'module.function' of the nearest backend frame above the caller, e.g. 'task_queue.claim_next_task'."""
+    frame = sys._getframe(depth + 1)
+    while frame is not None:
+        code = frame.f_code
+        site = _sites.get(code, False)
+        if site is False:
+            path = os.path.abspath(code.co_filename)
+            site = None
+            if (path.startswith(_BACKEND_DIR + os.sep) and path != os.path.abspath(__file__)
+                    and not path.startswith(_SKIP_DIRS)):
+                site = f"{os.path.splitext(os.path.basename(path))[0]}.{code.co_name}"
+            _sites[code] = site
+        if site:
+            return site
+        frame = frame.f_back
+    return "other"
+
+
+def add_sqlite_observer(observer):
+    """
+    Call observer(site, seconds) for every sqlite3 execute/fetch/commit.
+
+    The first observer swaps sqlite3.connect for a wrapper returning timed
+    connections. Every backend module opens its connections through
+    sqlite3.connect per call, so everything opened afterwards is timed.
+    """
+    with _observers_lock:
+        if not _observers:
+            _install_sqlite_timing()
+        _observers.append(observer)
+
+
+def remove_sqlite_observer(observer):
+    with _observers_lock:
+        if observer in _observers:
+            _observers.remove(observer)
+
+
+def observe_db_query(site, seconds):
+    DB_QUERY.labels(site).observe(seconds)
+
+
+def _observe(started):
+    elapsed = time.perf_counter() - started
+    site = call_site(2)
+    for observer in list(_observers):
+        observer(site, elapsed)
+
+
+def _install_sqlite_timing():
+    connect = sqlite3.connect
+
+    class TimedCursor(sqlite3.Cursor):
+        def execute(self, *args):
+            started = time.perf_counter()
+            try:
+                return super().execute(*args)
+            finally:
+                _observe(started)
+
+        def executemany(self, *args):
+            started = time.perf_counter()
+            try:
+                return super().executemany(*args)
+            finally:
+                _observe(started)
+
+        def executescript(self, *args):
+            started = time.perf_counter()
+            try:
+                return super().executescript(*args)
+            finally:
+                _observe(started)
+
+        def fetchone(self):
+            started = time.perf_counter()
+            try:
+                return super().fetchone()
+            finally:
+                _observe(started)
+
+        def fetchall(self):
+            started = time.perf_counter()
+            try:
+                return super().fetchall()
+            finally:
+                _observe(started)
+
+    class TimedConnection(sqlite3.Connection):
+        def cursor(self, factory=TimedCursor):
+            return super().cursor(factory)
+
+        def execute(self, *args):
+            return self.cursor().execute(*args)
+
+        def executemany(self, *args):
+            return self.cursor().executemany(*args)
+
+        def executescript(self, *args):
+            return self.cursor().executescript(*args)
+
+        def commit(self):
+            started = time.perf_counter()
+            try:
+                return super().commit()
+            finally:
+                _observe(started)
+
+    def timed_connect(*args, **kwargs):
+        kwargs.setdefault("factory", TimedConnection)
+        return connect(*args, **kwargs)
+
+    sqlite3.connect = timed_connect
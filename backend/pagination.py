@@ -0,0 +1,41 @@
+# pagination.py
+"""
+Opaque cursors for keyset (seek) pagination.
+
+A cursor carries the sort key of the last row on the previous page plus the
+sort direction, so the next page is fetched with an indexed
+`WHERE (key...) > (?...) ORDER BY key... LIMIT ?` instead of OFFSET.
+"""
+
+import base64, json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort_key, order: str = "asc") -> str:
+    payload = json.dumps({"k": list(sort_key), "o": order}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, order: str, key_length: int) -> tuple:
+    """Return the sort key stored in `cursor`. Raises ValueError if it is malformed or was issued for another order."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        key = payload["k"]
+        cursor_order = payload["o"]
+    except Exception as e:
+        raise ValueError("malformed cursor") from e
+    if cursor_order != order:
+        raise ValueError("cursor was issued for a different sort order")
+    if not isinstance(key, list) or len(key) != key_length:
+        raise ValueError("cursor does not match this listing")
+    return tuple(key)
+
+
+def page_size(raw, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """Clamp a requested page size to [1, MAX_PAGE_SIZE]."""
+    if raw is None:
+        return default
+    return max(1, min(int(raw), MAX_PAGE_SIZE))
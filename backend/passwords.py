@@ -0,0 +1,167 @@
+# passwords.py
+"""
+bcrypt hashing off the request threads.
+
+bcrypt.verify takes hundreds of ms by design. Running it inline meant a burst
+of logins (shift change, every tablet at once) held that many request
+threads and delayed MJPEG streams and API calls. Hashing now runs in a small
+dedicated pool:
+
+  - at most `workers` hashes run at once, at most `max_queue` wait behind them;
+    beyond that HashPoolBusy is raised right away (login answers 503)
+  - a caller waits at most `timeout` seconds for its result
+  - queue wait and hash time are recorded and exposed via stats()
+
+Work factor upgrade: hashes are created with `rounds`. When a stored hash has
+a different cost, verify() also returns a re-hash with the configured cost,
+which authenticate() writes back, so raising BCRYPT_ROUNDS migrates users on
+their next login.
+"""
+
+import threading, time, logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from passlib.hash import bcrypt
+from .async_mode import offload
+from .percentiles import percentile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_TIMEOUT_S = 10.0
+DEFAULT_ROUNDS = 12
+SAMPLE_SIZE = 256            # recent waits/run times kept for percentiles
+
+
+class HashPoolBusy(Exception):
+    """The hashing pool is saturated or did not answer within the timeout."""
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.workers = DEFAULT_WORKERS
+        self.max_queue = DEFAULT_MAX_QUEUE
+        self.timeout = DEFAULT_TIMEOUT_S
+        self.rounds = DEFAULT_ROUNDS
+        self._handler = bcrypt.using(rounds=self.rounds)
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "completed": 0, "rejected": 0, "timed_out": 0, "upgraded": 0}
+        self._in_flight = 0
+        self._running = 0
+        self._waits_ms = deque(maxlen=SAMPLE_SIZE)
+        self._runs_ms = deque(maxlen=SAMPLE_SIZE)
+
+    def configure(self, config):
+        """Apply PASSWORD_HASH_* / BCRYPT_ROUNDS from app.config (call once at startup)."""
+        with self._lock:
+            self.workers = int(config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS))
+            self.max_queue = int(config.get('PASSWORD_HASH_MAX_QUEUE', DEFAULT_MAX_QUEUE))
+            self.timeout = float(config.get('PASSWORD_HASH_TIMEOUT_S', DEFAULT_TIMEOUT_S))
+            self.rounds = int(config.get('BCRYPT_ROUNDS', DEFAULT_ROUNDS))
+            self._handler = bcrypt.using(rounds=self.rounds)
+            self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+            old_executor, self._executor = self._executor, None
+        # Load the bcrypt backend here: passlib logs while probing it, and the
+        # hashes themselves run through offload(), where logging is not allowed
+        self._handler.get_backend()
+        if old_executor:
+            old_executor.shutdown(wait=False)
+        logger.info(f"Password hashing: {self.workers} workers, queue {self.max_queue}, bcrypt rounds {self.rounds}")
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    # ───── pool plumbing ─────
+    def _run(self, fn, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise HashPoolBusy("password hashing queue is full")
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._counters["submitted"] += 1
+            self._in_flight += 1
+
+        def task():
+            started_at = time.monotonic()
+            with self._lock:
+                self._running += 1
+                self._waits_ms.append((started_at - submitted_at) * 1000)
+            try:
+                # eventlet: the pool threads are green, so the hash itself runs on tpool
+                return offload(fn, *args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._in_flight -= 1
+                    self._counters["completed"] += 1
+                    self._runs_ms.append((time.monotonic() - started_at) * 1000)
+                slots.release()
+
+        try:
+            future = self._get_executor().submit(task)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            slots.release()
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._counters["timed_out"] += 1
+            raise HashPoolBusy("password hashing timed out")
+
+    # ───── public API ─────
+    def hash(self, password: str) -> str:
+        return self._run(self._handler.hash, password)
+
+    def verify(self, password: str, hashed: str):
+        """
+        Check `password` against `hashed` in the pool.
+
+        Returns:
+            (ok, new_hash): new_hash is set when ok and the stored hash should be
+            replaced because its cost differs from BCRYPT_ROUNDS.
+        Raises:
+            HashPoolBusy: pool saturated or no answer within the timeout
+        """
+        handler = self._handler
+
+        def check():
+            if not handler.verify(password, hashed):
+                return False, None
+            if handler.needs_update(hashed):
+                return True, handler.hash(password)
+            return True, None
+
+        ok, new_hash = self._run(check)
+        if new_hash:
+            with self._lock:
+                self._counters["upgraded"] += 1
+        return ok, new_hash
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits, runs = list(self._waits_ms), list(self._runs_ms)
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "rounds": self.rounds,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                **self._counters,
+                "queue_wait_ms": {"p50": percentile(waits, 50), "p95": percentile(waits, 95), "max": max(waits, default=None)},
+                "hash_ms": {"p50": percentile(runs, 50), "p95": percentile(runs, 95), "max": max(runs, default=None)},
+            }
+
+
+# ───── 전역 인스턴스 ─────
+password_hasher = PasswordHasher()
@@ -0,0 +1,21 @@
+# percentiles.py
+"""
+The one percentile definition used by every latency summary: queue waits
+(/api/queue-metrics), task phases (/api/analytics/phases), the hashing pool
+(password_hasher.stats()) and the benchmark reports, so a p95 means the same
+thing everywhere.
+
+Linear interpolation between the closest ranks (numpy's default). No backend
+imports: the benchmarks load it before prepare_environment().
+"""
+
+
+def percentile(values, pct):
+    """`pct` (0..100) percentile of `values`; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
@@ -0,0 +1,313 @@
+# profiling.py
+"""
+On-demand profiling for a running backend. Both modes are off by default and
+cost nothing until an admin turns them on.
+
+  sampler   A daemon thread reads sys._current_frames() every
+            PROFILER_INTERVAL_MS for a time window and counts every thread's
+            stack. collapsed() returns the counts in the folded format
+            ("thread;outer (file:line);...;inner (file:line) count") that
+            flamegraph.pl, speedscope and inferno read directly. Time spent
+            in C code (cv2, sqlite3, json, bcrypt) shows up in the Python
+            function that called it.
+  request   cProfile for one URL rule at a time. When an admin sets the route,
+            requests to it that carry "X-Profile: 1" run under cProfile; the
+            response gets an X-Profile-Id header and the result is kept (the
+            newest PROFILER_KEEP_REQUESTS) for the admin endpoints as pstats
+            text or a .prof file for snakeviz. Only one request is profiled at
+            a time; others that ask meanwhile run unprofiled.
+
+Under INU_ASYNC_MODE=eventlet the request handlers, Socket.IO and the
+background loops are greenlets on the hub thread, which sys._current_frames()
+does not list. While a window runs, the sampler also records every greenlet
+the hub switches to (greenlet.settrace) and samples their suspended frames
+(gr_frame), labelled with the thread name or "greenlet". The same hook turns a
+request's cProfile off while its greenlet is switched out, so the report only
+contains that request's own calls. The hook is installed only while one of
+them needs it.
+"""
+
+import cProfile, datetime, gc, io, logging, marshal, os, pstats, sys, threading, time, uuid, weakref
+from collections import Counter, OrderedDict
+from .async_mode import patched, os_thread_ident
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'PROFILER_INTERVAL_MS': 10,
+    'PROFILER_MAX_SECONDS': 300,
+    'PROFILER_KEEP_REQUESTS': 20,
+    'PROFILE_REQUEST_ROUTE': None,        # URL rule profiled on "X-Profile: 1", e.g. '/api/inventory'
+}
+
+PROFILE_HEADER = "X-Profile"
+
+
+class ProfilerBusy(Exception):
+    """A sampling window is already running."""
+
+
+class Profiler:
+    def __init__(self):
+        self.config = dict(DEFAULTS)
+        self.lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self._status = {
+            "state": "idle",        # idle / sampling
+            "started": None,
+            "seconds": None,
+            "interval_ms": None,
+            "samples": 0,
+            "finished": None,
+        }
+        self.request_route = None
+        self._request_lock = threading.Lock()
+        self._requests = OrderedDict()      # profile id → {route, method, path, seconds, stats, created}
+        # eventlet only: greenlets seen while sampling, the profiled request's (greenlet, profile)
+        self._greenlets = None
+        self._green_request = None
+        self._previous_trace = None
+        self._tracing = False
+
+    def configure(self, config):
+        for key in DEFAULTS:
+            if key in config:
+                self.config[key] = config[key]
+        self.request_route = self.config['PROFILE_REQUEST_ROUTE']
+
+    # ───── sampler ─────
+    def start(self, seconds: float, interval_ms: float = None):
+        """Sample all threads for `seconds` in the background. Raises ProfilerBusy if a window is running."""
+        seconds = max(0.1, min(float(seconds), float(self.config['PROFILER_MAX_SECONDS'])))
+        interval = max(1.0, float(interval_ms or self.config['PROFILER_INTERVAL_MS'])) / 1000.0
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                raise ProfilerBusy()
+            self._stacks = Counter()
+            self._stop.clear()
+            self._status.update(state="sampling", started=datetime.datetime.now().isoformat(timespec="seconds"),
+                                seconds=seconds, interval_ms=interval * 1000, samples=0, finished=None)
+            self._thread = threading.Thread(target=self._sample, args=(seconds, interval),
+                                            daemon=True, name="profiler-sampler")
+            self._thread.start()
+        logger.info(f"Stack sampling started for {seconds}s every {interval * 1000:.0f} ms")
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        with self.lock:
+            status = dict(self._status)
+            status["distinct_stacks"] = len(self._stacks)
+            leaves = Counter()
+            for stack, count in self._stacks.items():
+                leaves[stack[-1]] += count
+        status["top_frames"] = [{"frame": frame, "samples": count} for frame, count in leaves.most_common(15)]
+        status["request_route"] = self.request_route
+        return status
+
+    def collapsed(self) -> str:
+        """Folded stacks of the current / last window, one "frame;frame;... count" line per stack."""
+        with self.lock:
+            stacks = list(self._stacks.items())
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks))
+
+    def _sample(self, seconds, interval):
+        green = patched()
+        own = os_thread_ident() if green else threading.get_ident()
+        deadline = time.monotonic() + seconds
+        samples = 0
+        if green:
+            self._watch_greenlets(True)
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                batch = Counter()
+                threads = sys._current_frames()
+                for ident, frame in self._greenlet_frames(threads).items():
+                    if ident == own:
+                        continue
+                    default = f"thread-{ident}" if ident in threads else "greenlet"
+                    batch[(names.get(ident, default),) + _stack(frame)] += 1
+                with self.lock:
+                    self._stacks.update(batch)
+                    self._status["samples"] = samples = samples + 1
+                self._stop.wait(interval)
+        finally:
+            if green:
+                self._watch_greenlets(False)
+            with self.lock:
+                self._status.update(state="idle", finished=datetime.datetime.now().isoformat(timespec="seconds"))
+            logger.info(f"Stack sampling finished: {samples} samples")
+
+    def _greenlet_frames(self, threads) -> dict:
+        """`threads` (sys._current_frames()) plus, under eventlet, the frame of every suspended greenlet."""
+        frames = dict(threads)
+        for glet in list(self._greenlets or ()):
+            frame = glet.gr_frame       # None for the running greenlet and finished ones
+            if frame is not None:
+                frames[id(glet)] = frame    # == threading.get_ident() inside that greenlet
+        return frames
+
+    # ───── greenlet switches (eventlet) ─────
+    def _watch_greenlets(self, on: bool):
+        """Start / stop collecting the greenlets to sample: the live ones now, then every switch target."""
+        if on:
+            import greenlet
+            self._greenlets = weakref.WeakSet(o for o in gc.get_objects() if isinstance(o, greenlet.greenlet))
+        else:
+            self._greenlets = None
+        self._update_switch_trace()
+
+    def _update_switch_trace(self):
+        """Keep the switch hook installed exactly while sampling or a request profile needs it."""
+        import greenlet
+        needed = self._greenlets is not None or self._green_request is not None
+        if needed and not self._tracing:
+            self._previous_trace = greenlet.settrace(self._on_switch)
+            self._tracing = True
+        elif not needed and self._tracing:
+            greenlet.settrace(self._previous_trace)
+            self._previous_trace = None
+            self._tracing = False
+
+    def _on_switch(self, event, args):
+        if event in ("switch", "throw"):
+            origin, target = args
+            greenlets = self._greenlets
+            if greenlets is not None:
+                greenlets.add(target)
+            active = self._green_request
+            if active is not None:
+                glet, profile = active
+                if origin is glet:
+                    profile.disable()
+                elif target is glet:
+                    try:
+                        profile.enable()
+                    except ValueError:      # another profiler took over meanwhile
+                        pass
+        if self._previous_trace is not None:
+            self._previous_trace(event, args)
+
+    # ───── per-request cProfile ─────
+    def install(self, app):
+        """Register the request hooks; with no route set they cost one attribute check."""
+        from flask import g, request
+
+        @app.before_request
+        def _profile_start():
+            if self.request_route and self.should_profile(request):
+                profile = self.begin_request()
+                if profile:
+                    g.request_profile = (profile, time.perf_counter())
+
+        @app.after_request
+        def _profile_finish(response):
+            active = g.pop('request_profile', None)
+            if active:
+                response.headers['X-Profile-Id'] = self.end_request(active[0], request, active[1])
+            return response
+
+        @app.teardown_request
+        def _profile_abort(exc):
+            # after_request does not run for unhandled exceptions: release the profiler here
+            active = g.pop('request_profile', None)
+            if active:
+                self.end_request(active[0], request, active[1])
+
+    def set_request_route(self, route):
+        """Profile requests to this URL rule that send "X-Profile: 1" (None turns it off)."""
+        self.request_route = route or None
+
+    def should_profile(self, request) -> bool:
+        route = self.request_route
+        return bool(route and request.url_rule is not None and request.url_rule.rule == route
+                    and request.headers.get(PROFILE_HEADER) == "1")
+
+    def begin_request(self):
+        """A started cProfile.Profile, or None when another request holds the profiler."""
+        if not self._request_lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:          # another profiler (debugger, coverage) is active
+            self._request_lock.release()
+            return None
+        if patched():
+            import greenlet
+            self._green_request = (greenlet.getcurrent(), profile)
+            self._update_switch_trace()
+        return profile
+
+    def end_request(self, profile, request, started) -> str:
+        """Stop `profile`, keep the result and return its id."""
+        try:
+            profile.disable()
+            if self._green_request is not None:
+                self._green_request = None
+                self._update_switch_trace()
+        finally:
+            self._request_lock.release()
+        profile.create_stats()
+        profile_id = uuid.uuid4().hex[:12]
+        entry = {
+            "id": profile_id,
+            "route": request.url_rule.rule if request.url_rule else None,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "seconds": round(time.perf_counter() - started, 4),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "stats": profile.stats,
+        }
+        with self.lock:
+            self._requests[profile_id] = entry
+            while len(self._requests) > int(self.config['PROFILER_KEEP_REQUESTS']):
+                self._requests.popitem(last=False)
+        return profile_id
+
+    def request_profiles(self) -> list:
+        with self.lock:
+            return [{k: v for k, v in entry.items() if k != "stats"} for entry in reversed(self._requests.values())]
+
+    def request_profile(self, profile_id, fmt="text", sort="cumulative", limit=60):
+        """pstats text (fmt='text') or the marshalled .prof bytes (fmt='prof'); None if unknown."""
+        with self.lock:
+            entry = self._requests.get(profile_id)
+        if not entry:
+            return None
+        if fmt == "prof":
+            return marshal.dumps(entry["stats"])
+        stream = io.StringIO()
+        stats = pstats.Stats(_StatsSource(entry["stats"]), stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        header = f"{entry['method']} {entry['path']} ({entry['seconds']}s, {entry['created']})\n"
+        return header + stream.getvalue()
+
+
+class _StatsSource:
+    """pstats.Stats accepts any object with create_stats() and a stats dict."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _stack(frame) -> tuple:
+    """Outermost → innermost 'function (file:line)' labels of a frame."""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+# ───── 전역 인스턴스 ─────
+profiler = Profiler()
@@ -0,0 +1,220 @@
+# recovery.py
+"""
+Startup recovery for tasks left 'in_progress' by a crash or power loss.
+
+claim_next_task() claims nothing while any task is in progress, so a row
+orphaned by a crash used to stall the warehouse until someone edited the
+database by hand. Before the worker starts, every in_progress task is
+resolved:
+
+  1. inventory reconciliation — the worker updates current_inventory before
+     it marks a task done, so a crash in between leaves the move visible:
+       IN   slot holds the task's product      → 'reconciled_done'
+       OUT  slot is empty                      → 'reconciled_done'
+       IN   slot holds a different product     → failed_inventory_conflict
+     Reconciled tasks get the normal completion bookkeeping (history,
+     activity log, rollups) without touching the inventory again.
+  2. leg in flight — the worker records which serial leg it is sending
+     (work_tasks.leg_in_flight) and clears it when the leg's done/fin
+     arrives. A crash in between leaves the tray position unknown, so the
+     task fails as failed_unconfirmed (like a timeout_after_echo) instead of
+     sending that leg again.
+  3. hardware check — the M unit and the task's rack must answer WHO
+     (SerialManager.probe); otherwise the task fails with
+     failed_device_unavailable instead of being retried blind.
+  4. policy — RECOVERY_POLICY 'retry' puts the task back to 'pending' (it
+     keeps its priority and place, and legs_done, so serial legs that
+     finished before the crash are not repeated) at most RECOVERY_MAX_RETRIES
+     times, so a task that keeps crashing the system is not retried forever;
+     'fail' marks it failed_interrupted right away.
+
+Only a task whose next leg was never sent reaches step 4: the retry resumes
+at legs[legs_done:] with every earlier leg confirmed. Racks are reset by
+app.py before recovery runs. Every decision is written to task_recovery_log.
+"""
+
+import datetime, json, logging, sqlite3
+from flask import current_app
+from . import db
+from .serial_io import serial_mgr
+from .task_queue import complete_task, scheduler_state, UNCONFIRMED_STATUS
+from .dashboard_state import notify_tasks_changed
+
+MAIN_EQUIPMENT_ID = "M"
+
+DEFAULTS = {
+    'RECOVERY_POLICY': 'retry',      # 'retry' / 'fail' for tasks the inventory cannot settle
+    'RECOVERY_MAX_RETRIES': 1,       # recovery retries per task before it is failed
+}
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def _logger():
+    return current_app.logger if current_app else logging.getLogger(__name__)
+
+
+def recover_stale_tasks(config=None) -> list:
+    """
+    Resolve every in_progress task (call once at startup, before the worker).
+
+    Returns:
+        list of decisions {task_id, decision, new_status, reason, devices}
+    """
+    settings = dict(DEFAULTS)
+    for key in DEFAULTS:
+        if config and config.get(key) is not None:
+            settings[key] = config.get(key)
+    logger = _logger()
+
+    conn = sqlite3.connect(db.DB_NAME, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        tasks = [dict(row) for row in conn.execute(
+            "SELECT * FROM work_tasks WHERE status = 'in_progress' ORDER BY start_time, id"
+        ).fetchall()]
+    finally:
+        conn.close()
+    if not tasks:
+        return []
+    logger.warning(f"[Recovery] {len(tasks)} task(s) left in_progress by the previous run")
+
+    probes = {}     # device → answered WHO (probed once per device)
+
+    def device_status(rack):
+        if not serial_mgr.enabled:
+            return {}
+        for device in (MAIN_EQUIPMENT_ID, rack):
+            if device not in probes:
+                probes[device] = serial_mgr.probe(device)
+        return {device: probes[device] for device in (MAIN_EQUIPMENT_ID, rack)}
+
+    decisions = []
+    for task in tasks:
+        try:
+            decision = _decide(task, settings, device_status)
+            _apply(task, decision)
+        except Exception as e:
+            logger.error(f"[Recovery] Task {task['id']}: recovery failed: {e}", exc_info=True)
+            decision = {"decision": "failed", "new_status": "failed_exception", "reason": str(e), "devices": {}}
+            _set_status(task['id'], "failed_exception")
+        _log_decision(task, decision)
+        decisions.append({"task_id": task['id'], **decision})
+        logger.warning(f"[Recovery] Task {task['id']} ({task['movement']} {task['rack']}-{task['slot']}): "
+                       f"{decision['decision']} → {decision['new_status']} ({decision['reason']})")
+
+    scheduler_state.resync()
+    notify_tasks_changed()
+    return decisions
+
+
+def _decide(task, settings, device_status) -> dict:
+    rack = str(task['rack']).upper()
+    slot = int(task['slot'])
+    movement = str(task['movement']).upper()
+
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        row = conn.execute(
+            "SELECT product_code, last_update FROM current_inventory WHERE rack = ? AND slot = ?", (rack, slot)
+        ).fetchone()
+        retries = conn.execute(
+            "SELECT COUNT(*) FROM task_recovery_log WHERE task_id = ? AND decision = 'retry'", (task['id'],)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+    # 1. The inventory already shows the move: the crash hit after update_inventory_on_done
+    if movement == 'IN' and row and row[0] == task['product_code']:
+        return {"decision": "reconciled_done", "new_status": "done", "devices": {},
+                "reason": "slot already holds the product", "end_time": row[1]}
+    if movement == 'OUT' and not row:
+        return {"decision": "reconciled_done", "new_status": "done", "devices": {},
+                "reason": "slot already empty", "end_time": task['start_time']}
+    if movement == 'IN' and row:
+        return {"decision": "failed", "new_status": "failed_inventory_conflict", "devices": {},
+                "reason": f"slot holds {row[0]}, expected empty"}
+
+    # 2. A leg was sent and never confirmed: the device may have moved, do not send it again
+    if task.get('leg_in_flight') is not None:
+        return {"decision": "failed", "new_status": UNCONFIRMED_STATUS, "devices": {},
+                "reason": f"serial leg {task['leg_in_flight']} was in flight at the crash; tray position unknown"}
+
+    # 3. Hardware must answer before the task is run again
+    devices = device_status(rack)
+    missing = [device for device, ok in devices.items() if not ok]
+    if missing:
+        return {"decision": "failed", "new_status": "failed_device_unavailable", "devices": devices,
+                "reason": f"no WHO reply from {', '.join(missing)}"}
+
+    # 4. Policy
+    if settings['RECOVERY_POLICY'] != 'retry':
+        return {"decision": "failed", "new_status": "failed_interrupted", "devices": devices,
+                "reason": "RECOVERY_POLICY=fail"}
+    if retries >= int(settings['RECOVERY_MAX_RETRIES']):
+        return {"decision": "failed", "new_status": "failed_interrupted", "devices": devices,
+                "reason": f"already retried {retries} time(s) after a restart"}
+    return {"decision": "retry", "new_status": "pending", "devices": devices,
+            "reason": "operation not reflected in inventory; devices ready"}
+
+
+def _apply(task, decision):
+    # IN: the inventory row's last_update is when the move finished; OUT leaves no
+    # trace, so the interrupted run's start time stands in
+    end_time = decision.pop('end_time', None)
+    if decision['decision'] == 'reconciled_done':
+        complete_task(task, task['start_time'], end_time or _now(), update_inventory=False)
+    elif decision['decision'] == 'retry':
+        conn = sqlite3.connect(db.DB_NAME, timeout=10)
+        try:
+            conn.execute("UPDATE work_tasks SET status = 'pending', start_time = NULL, not_before = NULL, leg_in_flight = NULL, updated_at = ? WHERE id = ?",
+                         (_now(), task['id']))
+            conn.commit()
+        finally:
+            conn.close()
+    else:
+        _set_status(task['id'], decision['new_status'])
+
+
+def _set_status(task_id, status):
+    conn = sqlite3.connect(db.DB_NAME, timeout=10)
+    try:
+        now = _now()
+        conn.execute("UPDATE work_tasks SET status = ?, updated_at = ?, end_time = ? WHERE id = ?",
+                     (status, now, now, task_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _log_decision(task, decision):
+    conn = sqlite3.connect(db.DB_NAME, timeout=10)
+    try:
+        conn.execute("""
+            INSERT INTO task_recovery_log
+            (task_id, decision, new_status, reason, devices, rack, slot, movement, task_started, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (task['id'], decision['decision'], decision['new_status'], decision['reason'],
+              json.dumps(decision.get('devices') or {}), task['rack'], task['slot'], task['movement'],
+              task['start_time'], _now()))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_recovery_log(limit=100) -> list:
+    """Most recent recovery decisions, newest first."""
+    conn = sqlite3.connect(db.DB_NAME)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute("SELECT * FROM task_recovery_log ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    finally:
+        conn.close()
+    entries = []
+    for row in rows:
+        entry = dict(row)
+        entry['devices'] = json.loads(entry['devices']) if entry['devices'] else {}
+        entries.append(entry)
+    return entries
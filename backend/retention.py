@@ -0,0 +1,207 @@
+# retention.py
+"""
+Background retention for product_logs and camera_batch_history.
+
+Login used to run `DELETE FROM product_logs` inside its own transaction on
+every fifth login, which made that login slow and held the write lock for
+everyone else, and camera_batch_history grew forever next to the hot task
+tables. Old rows are now moved to the archive (archive.py) by a background
+job:
+
+  - only rows older than PRODUCT_LOG_RETENTION_DAYS (product_logs) /
+    CAMERA_HISTORY_ARCHIVE_DAYS (camera_batch_history) are touched
+  - each chunk (RETENTION_CHUNK_SIZE rows, oldest first) is written as an
+    archive segment and deleted in one short transaction; for product_logs
+    the latest_slot_movements rows that point at it go in the same
+    transaction
+  - a run stops after RETENTION_MAX_RUN_SECONDS and continues on the next
+    schedule, with RETENTION_CHUNK_PAUSE_S between chunks so other writers
+    get the lock
+  - progress of the current/last run is available from status()
+
+The job runs every RETENTION_INTERVAL_S seconds; request_run() (admin API,
+login counter) starts a run early. The expiry count and each chunk run through
+async_mode.offload() (an OS thread under eventlet), so a COUNT(*) over millions
+of rows or a chunk's segment write never holds up the green threads.
+"""
+
+import datetime, logging, sqlite3, threading, time
+from . import db, archive
+from .async_mode import offload, connect_for_offload
+from .dashboard_state import notify_history_changed
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'PRODUCT_LOG_RETENTION_DAYS': 30,
+    'CAMERA_HISTORY_ARCHIVE_DAYS': 90,
+    'RETENTION_CHUNK_SIZE': 500,
+    'RETENTION_MAX_RUN_SECONDS': 5.0,
+    'RETENTION_CHUNK_PAUSE_S': 0.05,
+    'RETENTION_INTERVAL_S': 3600,
+}
+
+# table → config key of its retention window (days), processed in this order
+POLICIES = (
+    ("product_logs", 'PRODUCT_LOG_RETENTION_DAYS'),
+    ("camera_batch_history", 'CAMERA_HISTORY_ARCHIVE_DAYS'),
+)
+
+
+class RetentionJob:
+    def __init__(self):
+        self.config = dict(DEFAULTS)
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self._thread = None
+        self._status = {
+            "running": False,
+            "last_started": None,
+            "last_finished": None,
+            "archived": 0,          # rows archived in the current/last run
+            "chunks": 0,
+            "tables": {},           # table → {cutoff, archived, remaining} of the current/last run
+            "completed": None,      # False when the run stopped at the time budget
+            "last_error": None,
+            "total_archived": 0,    # since process start
+        }
+
+    # ───── lifecycle ─────
+    def configure(self, config):
+        for key in DEFAULTS:
+            if config.get(key) is not None:
+                self.config[key] = config.get(key)
+
+    def start(self, config=None):
+        """Start the scheduler thread (idempotent)."""
+        if config is not None:
+            self.configure(config)
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="retention")
+        self._thread.start()
+
+    def request_run(self):
+        """Run as soon as possible instead of waiting for the next interval."""
+        self.wakeup.set()
+
+    def _loop(self):
+        while True:
+            self.wakeup.wait(timeout=float(self.config['RETENTION_INTERVAL_S']))
+            self.wakeup.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}", exc_info=True)
+
+    def status(self) -> dict:
+        with self.lock:
+            status = dict(self._status)
+            status["tables"] = {table: dict(t) for table, t in self._status["tables"].items()}
+        for table, days_key in POLICIES:
+            status["tables"].setdefault(table, {})["retention_days"] = self.config[days_key]
+        return status
+
+    def _update(self, **fields):
+        with self.lock:
+            self._status.update(fields)
+
+    # ───── one run ─────
+    def cutoff(self, days_key) -> str:
+        days = float(self.config[days_key])
+        return (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat(timespec="seconds")
+
+    def run_once(self) -> dict:
+        """Archive expired rows of every table until done or out of time. Returns status()."""
+        with self.lock:
+            if self._status["running"]:
+                return dict(self._status)
+            self._status.update(running=True, archived=0, chunks=0, tables={}, completed=None, last_error=None,
+                                last_started=datetime.datetime.now().isoformat(timespec="seconds"))
+        deadline = time.monotonic() + float(self.config['RETENTION_MAX_RUN_SECONDS'])
+        chunk_size = int(self.config['RETENTION_CHUNK_SIZE'])
+        completed = True
+        archived_total = 0
+        try:
+            for table, days_key in POLICIES:
+                cutoff = self.cutoff(days_key)
+                progress = {"cutoff": cutoff, "archived": 0,
+                            "remaining": offload(self._count_expired, table, cutoff)}
+                with self.lock:
+                    self._status["tables"][table] = progress
+                while progress["remaining"]:
+                    if time.monotonic() >= deadline:
+                        completed = False
+                        break
+                    moved = offload(self._archive_chunk, table, cutoff, chunk_size)
+                    if moved == 0:
+                        break
+                    archived_total += moved
+                    with self.lock:
+                        progress["archived"] += moved
+                        progress["remaining"] = max(0, progress["remaining"] - moved)
+                        self._status["chunks"] += 1
+                        self._status["archived"] += moved
+                        self._status["total_archived"] += moved
+                    time.sleep(float(self.config['RETENTION_CHUNK_PAUSE_S']))
+                if not completed:
+                    break
+        except Exception as e:
+            completed = False
+            self._update(last_error=str(e))
+            raise
+        finally:
+            self._update(running=False, completed=completed,
+                         last_finished=datetime.datetime.now().isoformat(timespec="seconds"))
+            if archived_total:
+                logger.info(f"Retention: archived {archived_total} rows")
+                notify_history_changed()
+        if not completed:
+            self.request_run()   # more to do: continue on the next loop iteration
+        return self.status()
+
+    # _count_expired / _archive_chunk run through offload(): own connection, no locks or logging
+    def _count_expired(self, table, cutoff) -> int:
+        time_column = archive.ARCHIVED_TABLES[table]
+        conn = connect_for_offload(db.DB_NAME)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {time_column} < ?", (cutoff,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def _archive_chunk(self, table, cutoff, chunk_size) -> int:
+        """Move up to chunk_size oldest expired rows of `table` into one archive segment. Returns rows moved."""
+        time_column = archive.ARCHIVED_TABLES[table]
+        conn = connect_for_offload(db.DB_NAME, timeout=10)
+        conn.row_factory = sqlite3.Row
+        segment_path = None
+        try:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT * FROM {table}
+                WHERE {time_column} < ?
+                ORDER BY {time_column}, id
+                LIMIT ?
+            """, (cutoff, chunk_size))
+            rows = [dict(row) for row in cur.fetchall()]
+            if not rows:
+                return 0
+            segment_path = archive.write_segment(cur, table, rows)
+            ids = [row['id'] for row in rows]
+            placeholders = ",".join("?" * len(ids))
+            if table == "product_logs":
+                cur.execute(f"DELETE FROM latest_slot_movements WHERE log_id IN ({placeholders})", ids)
+            cur.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+            conn.commit()
+            return len(ids)
+        except Exception:
+            conn.rollback()
+            if segment_path:
+                archive.discard_segment(segment_path)
+            raise
+        finally:
+            conn.close()
+
+
+# ───── 전역 인스턴스 ─────
+retention_job = RetentionJob()
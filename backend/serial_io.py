@@ -1,6 +1,10 @@
 # serial_io.py
-import serial, glob, time, threading, sys, datetime
-from flask import current_app
+import serial, glob, time, threading, sys, datetime, os, logging
+
+try:
+    from .metrics import SERIAL_COMMANDS, SERIAL_DONE, SERIAL_ECHO, SERIAL_ECHO_RETRIES
+except ImportError:
+    from metrics import SERIAL_COMMANDS, SERIAL_DONE, SERIAL_ECHO, SERIAL_ECHO_RETRIES
 
 BAUD = 19200
 TIMEOUT = 120 # Timeout for waiting for 'done'
@@ -14,6 +18,8 @@ OPTIONAL_MODULE_ID = "I"  # Optional module responds with "X" to WHO command
 DEFAULT_MAX_ECHO_ATTEMPTS = 6    # Default number of attempts (1 initial + 5 retries) to get command echo
 RESET_COMMAND_MAX_ECHO_ATTEMPTS = 15 # More attempts for the critical reset command
 
+logger = logging.getLogger(__name__)
+
 class SerialManager:
     def __init__(self):
         self.lock  = threading.Lock()
@@ -22,39 +28,44 @@ class SerialManager:
         # Initial assumption, might be re-evaluated by app
         self.enabled = True 
         # self._discover_all() # Don't call discover here, let app trigger it or re-check
-        print("INFO: SerialManager initialized. Discovery pending app configuration.")
+        logger.info("SerialManager initialized. Discovery pending app configuration.")
 
     def configure_and_discover(self, app_config):
         """Called by the main app to configure based on app settings and run discovery if enabled."""
         self.enabled = app_config.get('SERIAL_COMMUNICATION_ENABLED', True)
         
         if self.enabled:
-            print("INFO: Serial communication ENABLED by configuration. Starting discovery...")
+            logger.info("Serial communication ENABLED by configuration. Starting discovery...")
             self._discover_all()
         else:
             self.ports = {} # Ensure ports are empty if disabled
-            print("INFO: Serial communication is DISABLED by configuration. Discovery skipped.")
+            logger.info("Serial communication is DISABLED by configuration. Discovery skipped.")
 
     # ──────────────────────────────
     def _discover_all(self):
         # This method only runs if self.enabled was True during __init__
         platform = sys.platform
         
-        if platform.startswith("linux"):
+        # INU_SERIAL_PORTS=/dev/pts/5,/dev/pts/7 replaces the platform scan
+        # (e.g. the PTYs of hw_simulator.py)
+        override = os.environ.get("INU_SERIAL_PORTS", "").strip()
+        if override:
+            candidates = [port.strip() for port in override.split(",") if port.strip()]
+        elif platform.startswith("linux"):
             candidates = glob.glob("/dev/ttyUSB*") + glob.glob("/dev/ttyACM*")
         elif platform.startswith("darwin"):  # macOS
             candidates = glob.glob("/dev/tty.usbserial*") + glob.glob("/dev/tty.usbmodem*")
         elif platform.startswith("win"):
             candidates = [f"COM{i}" for i in range(1, 21)]
         else:
-            print(f"⚠️ Unknown platform: {platform}. No serial discovery.")
+            logger.warning(f"Unknown platform: {platform}. No serial discovery.")
             return
 
         if not candidates:
-            print("⚠️ No serial ports found.")
+            logger.warning("No serial ports found.")
             return
 
-        print(f"INFO: Scanning ports: {candidates}")
+        logger.info(f"Scanning ports: {candidates}")
 
         for port in candidates:
             ser = None 
@@ -72,36 +83,36 @@ class SerialManager:
                     ser.timeout = DISCOVERY_TIMEOUT # Set short timeout for this WHO attempt's readline
                     ser.reset_input_buffer() # Clear buffer before each attempt
                     
-                    print(f"INFO: Port {port}: WHO Attempt {attempt}/3. Sending WHO command.")
+                    logger.info(f"Port {port}: WHO Attempt {attempt}/3. Sending WHO command.")
                     ser.write(WHO_CMD)
                     time.sleep(0.05) # Small delay to ensure command is sent and Arduino has a moment
                     
-                    print(f"INFO: Port {port}: WHO Attempt {attempt}/3. Listening for WHO reply (timeout: {DISCOVERY_TIMEOUT}s).")
+                    logger.info(f"Port {port}: WHO Attempt {attempt}/3. Listening for WHO reply (timeout: {DISCOVERY_TIMEOUT}s).")
                     reply_bytes = ser.readline()
-                    print(f"DEBUG: Port {port}: WHO Attempt {attempt}/3. Raw reply_bytes: {reply_bytes}")
+                    logger.debug(f"Port {port}: WHO Attempt {attempt}/3. Raw reply_bytes: {reply_bytes}")
 
                     if reply_bytes:
                         decoded_reply = reply_bytes.decode("utf-8", "ignore").strip().upper()
                         if decoded_reply in RACKS:
                             if decoded_reply not in self.ports:
                                 found_rack_id = decoded_reply
-                                print(f"INFO: Port {port}: WHO Attempt {attempt}/3 successful. Received new rack ID '{found_rack_id}'.")
+                                logger.info(f"Port {port}: WHO Attempt {attempt}/3 successful. Received new rack ID '{found_rack_id}'.")
                                 break # Successful discovery for this port, exit attempt loop
                             else:
-                                print(f"⚠️ Port {port}: WHO Attempt {attempt}/3: Rack '{decoded_reply}' already discovered. This port will be closed.")
+                                logger.warning(f"Port {port}: WHO Attempt {attempt}/3: Rack '{decoded_reply}' already discovered. This port will be closed.")
                                 found_rack_id = None # Explicitly ensure this port isn't re-used for a duplicate rack
                                 break # Stop attempts for this port, it's a duplicate
                         elif decoded_reply == OPTIONAL_MODULE_ID:
-                            print(f"INFO: Port {port}: WHO Attempt {attempt}/3: Optional module detected.")
+                            logger.info(f"Port {port}: WHO Attempt {attempt}/3: Optional module detected.")
                             found_rack_id = decoded_reply
                             break
                         else:
-                            print(f"⚠️ Port {port}: WHO Attempt {attempt}/3: Received unknown reply '{decoded_reply}'.")
+                            logger.warning(f"Port {port}: WHO Attempt {attempt}/3: Received unknown reply '{decoded_reply}'.")
                     else:
-                        print(f"⚠️ Port {port}: WHO Attempt {attempt}/3: No reply to WHO command (timeout).")
+                        logger.warning(f"Port {port}: WHO Attempt {attempt}/3: No reply to WHO command (timeout).")
 
                     if not found_rack_id and attempt < 3:
-                        print(f"INFO: Port {port}: WHO Attempt {attempt}/3 failed. Pausing before next attempt.")
+                        logger.info(f"Port {port}: WHO Attempt {attempt}/3 failed. Pausing before next attempt.")
                         time.sleep(0.5) # Pause before next full send/listen attempt
                     elif found_rack_id and decoded_reply in self.ports: # Broke loop because it's a duplicate
                         pass # No further action needed here for duplicates, will be handled by found_rack_id being None for adding
@@ -111,60 +122,67 @@ class SerialManager:
 
                 if found_rack_id: # A valid, non-duplicate rack ID was found
                     self.ports[found_rack_id] = {"ser": ser, "mutex": threading.Lock()}
-                    print(f"🔌 Rack {found_rack_id} → {port}")
+                    logger.info(f"🔌 Rack {found_rack_id} → {port}")
                 else:
                     # If found_rack_id is still None, all attempts failed or it was a duplicate of an existing rack
-                    print(f"INFO: Port {port}: Did not identify a valid new rack after 3 attempts or rack already mapped. Closing port.")
+                    logger.info(f"Port {port}: Did not identify a valid new rack after 3 attempts or rack already mapped. Closing port.")
                     if ser and ser.is_open:
                         ser.close()
 
             except serial.SerialException as se:
-                print(f"⚠️ {port}: Serial error during discovery: {se}")
+                logger.warning(f"{port}: Serial error during discovery: {se}")
                 if ser and ser.is_open:
                     ser.close()
             except Exception as e:
-                print(f"⚠️ {port}: Unexpected error during discovery: {e}")
+                logger.warning(f"{port}: Unexpected error during discovery: {e}")
                 if ser and ser.is_open:
                     ser.close()
 
         missing = RACKS - self.ports.keys()
         if missing:
-            print(f"⚠️ Missing racks: {', '.join(missing)}")
+            logger.warning(f"Missing racks: {', '.join(missing)}")
 
     # ──────────────────────────────
     def send(self, rack:str, code:str, wait_done=True, done_token=b"done", custom_max_echo_attempts: int = None):
-        rack = rack.upper()
+        result = self._send(rack.upper(), code, wait_done, done_token, custom_max_echo_attempts)
+        SERIAL_COMMANDS.labels(rack.upper(), result["status"]).inc()
+        return result
+
+    def _send(self, rack:str, code:str, wait_done, done_token, custom_max_echo_attempts):
         if rack not in self.ports:
             raise RuntimeError(f"rack '{rack}' not mapped")
         entry = self.ports[rack]
         ser, mutex = entry["ser"], entry["mutex"]
 
-        app_logger = None
-        try:
-            if current_app:
-                app_logger = current_app.logger
-        except RuntimeError:
-            app_logger = None 
+        # %-style arguments: nothing is formatted unless the level is enabled
+        # (send() runs on the worker thread, once per serial read for up to TIMEOUT)
+        log_prefix = "SEND rack '%s', code '%s'"
 
-        log_prefix = f"SEND rack '{rack}', code '{code}'"
-        
         active_max_echo_attempts = custom_max_echo_attempts if custom_max_echo_attempts is not None else DEFAULT_MAX_ECHO_ATTEMPTS
         echo_received_correctly = False
         
         # Initialize timing variables
         command_sent_time = None
         done_received_time = None
+        # Monotonic marks for task_phases.py: first write → echo (retries included) → done
+        timing = {"echo_attempts": 0, "command_sent_monotonic": None,
+                  "echo_received_monotonic": None, "done_received_monotonic": None}
 
         with mutex:
             for attempt in range(1, active_max_echo_attempts + 1):
+                if attempt > 1:
+                    SERIAL_ECHO_RETRIES.labels(rack).inc()
                 ser.reset_input_buffer()
                 
                 command_to_send = f"{code}\n".encode()
                 ser.write(command_to_send)
                 command_sent_time = datetime.datetime.now().isoformat(timespec="microseconds")
+                timing["echo_attempts"] = attempt
+                if attempt == 1:
+                    timing["command_sent_monotonic"] = time.monotonic()
 
-                log_func = app_logger.debug if app_logger and hasattr(app_logger, 'debug') else print
-                log_func(f"{log_prefix} (Echo Attempt {attempt}/{active_max_echo_attempts}): Command sent. Waiting for echo...")
+                logger.debug(log_prefix + " (Echo Attempt %d/%d): Command sent. Waiting for echo...",
+                             rack, code, attempt, active_max_echo_attempts)
 
                 # 1. Wait for echo
                 echo_start_time = time.time()
@@ -180,15 +198,16 @@ class SerialManager:
                     time.sleep(0.05)
                 
                 if echo_received_correctly:
-                    log_func(f"{log_prefix} (Echo Attempt {attempt}): Correct echo '{code}' received.")
+                    timing["echo_received_monotonic"] = time.monotonic()
+                    SERIAL_ECHO.labels(rack).observe(time.time() - echo_start_time)
+                    logger.debug(log_prefix + " (Echo Attempt %d): Correct echo received.", rack, code, attempt)
                     break  # Exit the main retry loop on success
                 else:
-                    warn_func = app_logger.warning if app_logger and hasattr(app_logger, 'warning') else print
-                    warn_func(f"{log_prefix} (Echo Attempt {attempt}/{active_max_echo_attempts}): Failed to receive correct echo.")
+                    logger.warning(log_prefix + " (Echo Attempt %d/%d): Failed to receive correct echo.",
+                                   rack, code, attempt, active_max_echo_attempts)
                     if attempt < active_max_echo_attempts:
                         time.sleep(0.5) # Pause before retrying
-                        info_func = app_logger.info if app_logger and hasattr(app_logger, 'info') else print
-                        info_func(f"{log_prefix}: Retrying command send (next attempt: {attempt + 1})...")
+                        logger.info(log_prefix + ": Retrying command send (next attempt: %d)...", rack, code, attempt + 1)
                     # Continue to next attempt in the for loop...
 
             # End of echo attempt loop
@@ -198,57 +217,53 @@ class SerialManager:
                 return {
                     "status": "echo_error_max_retries",
                     "command_sent_time": command_sent_time,
-                    "done_received_time": None
-                } 
+                    "done_received_time": None,
+                    **timing
+                }
 
             # If echo was successful, and we don't need to wait for "done", return status "sent_echo_confirmed"
             if not wait_done:
                 return {
                     "status": "sent_echo_confirmed",
                     "command_sent_time": command_sent_time,
-                    "done_received_time": None
+                    "done_received_time": None,
+                    **timing
                 }
 
             # 2. Wait for "done" token (only if echo was successful)
             start_done_time = time.time()
-            done_buf = bytearray() 
+            # Keep what arrived behind the echo in the same read: a fast device
+            # (or hw_simulator.py) can send its done token right after the echo
+            echo_end = echo_buf.find(code.encode()) + len(code.encode())
+            done_buf = bytearray(echo_buf[echo_end:])
             
-            if app_logger:
-                app_logger.debug(f"{log_prefix}: Echo confirmed. Waiting for '{done_token}'")
-            else:
-                print(f"INFO: {log_prefix}: Echo confirmed. Waiting for '{done_token}'")
+            logger.debug(log_prefix + ": Echo confirmed. Waiting for %r", rack, code, done_token)
 
             while time.time() - start_done_time < TIMEOUT: 
                 if ser.in_waiting:
-                    read_data = ser.read(ser.in_waiting)
-                    done_buf.extend(read_data)
-                    if app_logger:
-                        app_logger.debug(f"{log_prefix}: Done read data: {read_data}, Current done_buf: {done_buf}")
-                    else:
-                        print(f"DEBUG: {log_prefix}: Done read data: {read_data}, Current done_buf: {done_buf}")
-                    
-                    if done_token in done_buf.lower():
-                        # Record exact time when "done" signal was received
-                        done_received_time = datetime.datetime.now().isoformat(timespec="microseconds")
-                        if app_logger:
-                            app_logger.debug(f"{log_prefix}: Found '{done_token}' in done_buf at {done_received_time}.")
-                        else:
-                            print(f"DEBUG: {log_prefix}: Found '{done_token}' in done_buf at {done_received_time}.")
-                        return {
-                            "status": "done",
-                            "command_sent_time": command_sent_time,
-                            "done_received_time": done_received_time
-                        }
+                    done_buf.extend(ser.read(ser.in_waiting))
+
+                if done_token in done_buf.lower():
+                    timing["done_received_monotonic"] = time.monotonic()
+                    SERIAL_DONE.labels(rack).observe(time.time() - start_done_time)
+                    # Record exact time when "done" signal was received
+                    done_received_time = datetime.datetime.now().isoformat(timespec="microseconds")
+                    logger.debug(log_prefix + ": Found %r at %s.", rack, code, done_token, done_received_time)
+                    return {
+                        "status": "done",
+                        "command_sent_time": command_sent_time,
+                        "done_received_time": done_received_time,
+                        **timing
+                    }
                 time.sleep(0.05)
             
-            if app_logger:
-                app_logger.warning(f"{log_prefix}: Timeout waiting for '{done_token}' after echo. Final done_buf: {done_buf}")
-            else:
-                print(f"WARNING: {log_prefix}: Timeout waiting for '{done_token}' after echo. Final done_buf: {done_buf}")
+            logger.warning(log_prefix + ": Timeout waiting for %r after echo. Final done_buf: %r",
+                           rack, code, done_token, bytes(done_buf[-256:]))
             return {
                 "status": "timeout_after_echo",
                 "command_sent_time": command_sent_time,
-                "done_received_time": None
+                "done_received_time": None,
+                **timing
             }
 
     def _get_rack_logical_name(self, serial_instance, port_name):
@@ -323,17 +338,17 @@ class SerialManager:
 
     def reset_all_racks(self, reset_cmd_code="99", done_token_reset=b"done"):
         """Sends a reset command to all connected and discovered racks with increased echo retries.
-           Uses print for logging as it runs during startup, potentially outside Flask app context.
+           Logs through the module logger, since it runs during startup, potentially outside Flask app context.
         """
         if not self.enabled:
-            print("INFO: SerialManager.reset_all_racks called but serial is DISABLED. Skipping reset.")
+            logger.info("SerialManager.reset_all_racks called but serial is DISABLED. Skipping reset.")
             return
 
         if not self.ports:
-            print("INFO: SerialManager.reset_all_racks called but no racks are currently discovered/connected. Skipping reset.")
+            logger.info("SerialManager.reset_all_racks called but no racks are currently discovered/connected. Skipping reset.")
             return
 
-        print(f"INFO: Attempting to reset all connected racks with command '{reset_cmd_code}' (echo attempts: {RESET_COMMAND_MAX_ECHO_ATTEMPTS})...")
+        logger.info(f"Attempting to reset all connected racks with command '{reset_cmd_code}' (echo attempts: {RESET_COMMAND_MAX_ECHO_ATTEMPTS})...")
         
         main_equipment_id = "M" # Define M equipment ID
         main_reset_done_token = b"fin"
@@ -341,15 +356,15 @@ class SerialManager:
         for rack_id in self.ports.keys():
             # Skip optional module
             if rack_id == OPTIONAL_MODULE_ID:
-                print(f"INFO: Skipping reset for optional module (ID: {OPTIONAL_MODULE_ID})")
+                logger.info(f"Skipping reset for optional module (ID: {OPTIONAL_MODULE_ID})")
                 continue
                 
-            print(f"INFO: Rack {rack_id}: Sending reset command '{reset_cmd_code}'...")
+            logger.info(f"Rack {rack_id}: Sending reset command '{reset_cmd_code}'...")
             
             current_done_token = done_token_reset # Default for A, B, C
             if rack_id == main_equipment_id:
                 current_done_token = main_reset_done_token # Override for M
-                print(f"INFO: Rack {rack_id} is Main equipment. Using '{main_reset_done_token.decode()}' as done token for reset.")
+                logger.info(f"Rack {rack_id} is Main equipment. Using '{main_reset_done_token.decode()}' as done token for reset.")
 
             try:
                 result = self.send(
@@ -362,68 +377,71 @@ class SerialManager:
                 status = result.get("status")
 
                 if status == "done": # "done" is the general success status from send() method
-                    print(f"SUCCESS: Rack {rack_id}: Reset command '{reset_cmd_code}' COMPLETED. Arduino responded '{current_done_token.decode(errors='ignore')}'.")
+                    logger.info(f"Rack {rack_id}: Reset command '{reset_cmd_code}' COMPLETED. Arduino responded '{current_done_token.decode(errors='ignore')}'.")
                 elif status == "echo_error_max_retries":
-                    print(f"ERROR: Rack {rack_id}: Failed to get echo for reset command '{reset_cmd_code}' after {RESET_COMMAND_MAX_ECHO_ATTEMPTS} attempts.")
+                    logger.error(f"Rack {rack_id}: Failed to get echo for reset command '{reset_cmd_code}' after {RESET_COMMAND_MAX_ECHO_ATTEMPTS} attempts.")
                 elif status == "timeout_after_echo":
-                    print(f"ERROR: Rack {rack_id}: Reset command '{reset_cmd_code}' echo OK, but TIMEOUT waiting for '{current_done_token.decode(errors='ignore')}'.")
+                    logger.error(f"Rack {rack_id}: Reset command '{reset_cmd_code}' echo OK, but TIMEOUT waiting for '{current_done_token.decode(errors='ignore')}'.")
                 else: 
-                    print(f"WARNING: Rack {rack_id}: Reset command '{reset_cmd_code}' resulted in unexpected status: '{status}'.")
+                    logger.warning(f"Rack {rack_id}: Reset command '{reset_cmd_code}' resulted in unexpected status: '{status}'.")
             except RuntimeError as re:
-                print(f"ERROR: Rack {rack_id}: Runtime error during reset: {re} - rack might be disconnected.")
+                logger.error(f"Rack {rack_id}: Runtime error during reset: {re} - rack might be disconnected.")
             except Exception as e:
-                print(f"ERROR: Rack {rack_id}: Exception during reset command '{reset_cmd_code}': {e}")
-        print("INFO: Finished attempting to reset all connected racks.")
+                logger.error(f"Rack {rack_id}: Exception during reset command '{reset_cmd_code}': {e}")
+        logger.info("Finished attempting to reset all connected racks.")
 
-    def check_optional_module_health(self):
-        """Check if optional module is responding to WHO command.
-        Returns True if module responds with 'X', False otherwise.
-        Sends WHO command multiple times with retries like other equipment.
+    def probe(self, device_id: str, attempts: int = 3) -> bool:
+        """Check that a mapped device answers WHO with its own ID (retries like discovery).
+        Returns False if serial is disabled, the device is not mapped or it does not answer.
         """
-        if not self.enabled:
+        device_id = device_id.upper()
+        if not self.enabled or device_id not in self.ports:
             return False
-            
-        if OPTIONAL_MODULE_ID not in self.ports:
-            return False
-            
+
         try:
-            entry = self.ports[OPTIONAL_MODULE_ID]
+            entry = self.ports[device_id]
             ser, mutex = entry["ser"], entry["mutex"]
-            
+
             with mutex:
-                # Try multiple times like in discovery
-                for attempt in range(1, 4):  # Try up to 3 times
-                    ser.reset_input_buffer()  # Clear buffer before each attempt
-                    ser.timeout = DISCOVERY_TIMEOUT  # Use short timeout for WHO
-                    
-                    print(f"INFO: Optional module health check attempt {attempt}/3. Sending WHO command.")
-                    ser.write(WHO_CMD)
-                    time.sleep(0.05)  # Small delay to ensure command is sent
-                    
-                    print(f"INFO: Optional module health check attempt {attempt}/3. Listening for WHO reply (timeout: {DISCOVERY_TIMEOUT}s).")
-                    reply_bytes = ser.readline()
-                    print(f"DEBUG: Optional module health check attempt {attempt}/3. Raw reply_bytes: {reply_bytes}")
-                    
-                    if reply_bytes:
-                        decoded_reply = reply_bytes.decode("utf-8", "ignore").strip().upper()
-                        if decoded_reply == OPTIONAL_MODULE_ID:
-                            print(f"INFO: Optional module health check attempt {attempt}/3 successful. Received '{decoded_reply}'.")
-                            return True
+                original_timeout = ser.timeout
+                try:
+                    for attempt in range(1, attempts + 1):
+                        ser.reset_input_buffer()  # Clear buffer before each attempt
+                        ser.timeout = DISCOVERY_TIMEOUT  # Use short timeout for WHO
+
+                        logger.info(f"Probe {device_id} attempt {attempt}/{attempts}. Sending WHO command.")
+                        ser.write(WHO_CMD)
+                        time.sleep(0.05)  # Small delay to ensure command is sent
+
+                        reply_bytes = ser.readline()
+                        logger.debug(f"Probe {device_id} attempt {attempt}/{attempts}. Raw reply_bytes: {reply_bytes}")
+
+                        if reply_bytes:
+                            decoded_reply = reply_bytes.decode("utf-8", "ignore").strip().upper()
+                            if decoded_reply == device_id:
+                                return True
+                            logger.warning(f"Probe {device_id} attempt {attempt}/{attempts}: Received unexpected reply '{decoded_reply}'.")
                         else:
-                            print(f"⚠️ Optional module health check attempt {attempt}/3: Received unexpected reply '{decoded_reply}'.")
-                    else:
-                        print(f"⚠️ Optional module health check attempt {attempt}/3: No reply to WHO command (timeout).")
-                    
-                    if attempt < 3:
-                        print(f"INFO: Optional module health check attempt {attempt}/3 failed. Pausing before next attempt.")
-                        time.sleep(0.5)  # Pause before next attempt
-                
-                print(f"ERROR: Optional module health check failed after 3 attempts.")
+                            logger.warning(f"Probe {device_id} attempt {attempt}/{attempts}: No reply to WHO command (timeout).")
+
+                        if attempt < attempts:
+                            time.sleep(0.5)  # Pause before next attempt
+                finally:
+                    ser.timeout = original_timeout
+
+                logger.error(f"Probe {device_id} failed after {attempts} attempts.")
                 return False
-                
+
         except Exception as e:
-            print(f"ERROR: Optional module health check failed: {e}")
+            logger.error(f"Probe {device_id} failed: {e}")
             return False
+
+    def check_optional_module_health(self):
+        """Check if optional module is responding to WHO command.
+        Returns True if module responds with 'X', False otherwise.
+        Sends WHO command multiple times with retries like other equipment.
+        """
+        return self.probe(OPTIONAL_MODULE_ID)
     
     def activate_optional_module(self):
         """Send activation command '1' to optional module.
@@ -439,7 +457,7 @@ class SerialManager:
             result = self.send(OPTIONAL_MODULE_ID, "1", wait_done=False)
             return result.get("status") == "sent_echo_confirmed"
         except Exception as e:
-            print(f"ERROR: Optional module activation failed: {e}")
+            logger.error(f"Optional module activation failed: {e}")
             return False
     
     def is_optional_module_connected(self):
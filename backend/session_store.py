@@ -0,0 +1,197 @@
+# session_store.py
+"""
+Login sessions shared by every backend process.
+
+The single-active-session policy used to live in the module global
+auth.current_active_session: it was lost on restart (token_required then
+adopted whichever token showed up first) and each worker process had its own
+copy. Sessions now live in a store:
+
+  SQLiteSessionStore  sessions.db next to the main database (WAL, mmap).
+                      One connection per process behind a lock (a
+                      per-thread connection meant a new connection and its
+                      PRAGMAs for every request thread / greenlet). Rows
+                      already read are served from memory until
+                      PRAGMA data_version reports a commit by another
+                      connection (another process), so a lookup is
+                      usually one cheap pragma. create() replaces all
+                      sessions in one BEGIN IMMEDIATE transaction, so two
+                      processes cannot both end up with an active login.
+  MemorySessionStore  dict for a single process (development).
+
+Expired rows are swept on every login and at most every SWEEP_INTERVAL
+seconds on lookups.
+"""
+
+import datetime, os, sqlite3, threading, time, uuid, logging
+from . import db
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = 12 * 3600      # same lifetime as the JWT
+SWEEP_INTERVAL = 60
+LOOKUP_CACHE_MAX_ENTRIES = 256
+
+
+def _session(session_id, user_id, username, login_time, expires_at):
+    return {
+        'session_id': session_id,
+        'user_id': user_id,
+        'username': username,
+        'login_time': datetime.datetime.fromisoformat(login_time) if isinstance(login_time, str) else login_time,
+        'expires_at': expires_at,
+    }
+
+
+class MemorySessionStore:
+    """Single-process store (sessions are lost on restart)."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, user_id, username, ttl=SESSION_TTL_SECONDS):
+        """Start a new session and end every other one. Returns (session, replaced sessions)."""
+        session = _session(str(uuid.uuid4()), user_id, username, datetime.datetime.utcnow(), time.time() + ttl)
+        with self._lock:
+            now = time.time()
+            replaced = [s for s in self._sessions.values() if s['expires_at'] > now]
+            self._sessions = {session['session_id']: session}
+        return dict(session), replaced
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session and session['expires_at'] <= time.time():
+                del self._sessions[session_id]
+                session = None
+            return dict(session) if session else None
+
+    def current(self):
+        with self._lock:
+            now = time.time()
+            live = [s for s in self._sessions.values() if s['expires_at'] > now]
+        return dict(max(live, key=lambda s: s['login_time'])) if live else None
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def sweep(self):
+        with self._lock:
+            now = time.time()
+            expired = [sid for sid, s in self._sessions.items() if s['expires_at'] <= now]
+            for sid in expired:
+                del self._sessions[sid]
+            return len(expired)
+
+
+class SQLiteSessionStore:
+    """Process-shared store in its own SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        # autocommit; explicit BEGIN below. Shared by all threads, always used under self._lock
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA mmap_size=1048576")
+        self._rows = {}             # session_id → row (or None) read at data version _rows_version
+        self._rows_version = None
+        conn = self._conn
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id  TEXT PRIMARY KEY,
+                user_id     INTEGER NOT NULL,
+                username    TEXT NOT NULL,
+                login_time  TEXT NOT NULL,      -- UTC ISO timestamp
+                expires_at  REAL NOT NULL       -- epoch seconds
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+
+    def _forget_rows(self):
+        """Drop the lookup cache after a write on our own connection (data_version only counts others)."""
+        self._rows.clear()
+        self._rows_version = None
+
+    def create(self, user_id, username, ttl=SESSION_TTL_SECONDS):
+        """Start a new session and end every other one. Returns (session, replaced sessions)."""
+        session = _session(str(uuid.uuid4()), user_id, username, datetime.datetime.utcnow(), time.time() + ttl)
+        with self._lock:
+            conn = self._conn
+            self._forget_rows()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT session_id, user_id, username, login_time, expires_at FROM sessions WHERE expires_at > ?",
+                    (time.time(),)
+                ).fetchall()
+                conn.execute("DELETE FROM sessions")
+                conn.execute(
+                    "INSERT INTO sessions (session_id, user_id, username, login_time, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (session['session_id'], user_id, username, session['login_time'].isoformat(), session['expires_at'])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return session, [_session(*row) for row in rows]
+
+    def get(self, session_id):
+        now = time.time()
+        if now >= self._next_sweep:
+            self.sweep()
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._rows_version or len(self._rows) >= LOOKUP_CACHE_MAX_ENTRIES:
+                self._rows.clear()
+                self._rows_version = version
+            if session_id in self._rows:
+                row = self._rows[session_id]
+            else:
+                row = self._conn.execute(
+                    "SELECT session_id, user_id, username, login_time, expires_at FROM sessions WHERE session_id = ?",
+                    (session_id,)
+                ).fetchone()
+                self._rows[session_id] = row
+        return _session(*row) if row and row[4] > now else None
+
+    def current(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, user_id, username, login_time, expires_at FROM sessions WHERE expires_at > ? ORDER BY login_time DESC LIMIT 1",
+                (time.time(),)
+            ).fetchone()
+        return _session(*row) if row else None
+
+    def delete(self, session_id):
+        with self._lock:
+            self._forget_rows()
+            return self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def sweep(self):
+        self._next_sweep = time.time() + SWEEP_INTERVAL
+        with self._lock:
+            self._forget_rows()
+            removed = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+        if removed:
+            logger.info(f"Swept {removed} expired session(s)")
+        return removed
+
+
+def default_session_db_path():
+    return os.path.join(os.path.dirname(db.DB_NAME), "sessions.db")
+
+
+def create_session_store(config=None):
+    """Build the store selected by app.config['SESSION_STORE'] ('sqlite' or 'memory')."""
+    config = config or {}
+    backend = config.get('SESSION_STORE', 'sqlite')
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'sqlite':
+        return SQLiteSessionStore(config.get('SESSION_DB_PATH') or default_session_db_path())
+    raise ValueError(f"Unknown SESSION_STORE: {backend}")
@@ -0,0 +1,143 @@
+# task_phases.py
+"""
+Where a task's seconds go.
+
+The worker starts a PhaseTimer when it claims a task and passes it along:
+each serial leg adds its send / echo / done times (monotonic, from
+SerialManager.send), complete_task() marks the inventory update and the
+history writes, and finish_attempt() stores one task_phases row per worker
+run in the same transaction as its task_attempts row. Times are stored as
+seconds after the claim on the monotonic clock, so wall-clock jumps (NTP
+on the Pi) cannot distort them.
+
+get_phase_summary() turns the rows into per-phase percentiles by rack, slot
+and movement (GET /api/analytics/phases).
+"""
+
+import sqlite3, time, datetime as dt
+from .db import DB_NAME
+from .percentiles import percentile
+
+GROUP_COLUMNS = ("rack", "slot", "movement_type")
+PERCENTILES = (50, 90, 95, 99)
+LEG_KINDS = ("m", "rack")
+
+# phase → SQL expression over the stored offsets (NULL when the phase did not happen)
+PHASES = {
+    "claim":           "claim_s",
+    "to_first_send":   "CASE WHEN movement_type = 'IN' THEN m_send_s ELSE rack_send_s END",
+    "m_echo":          "m_echo_s - m_send_s",
+    "m_mechanical":    "m_done_s - m_echo_s",
+    "rack_echo":       "rack_echo_s - rack_send_s",
+    "rack_mechanical": "rack_done_s - rack_echo_s",
+    "between_legs":    "CASE WHEN movement_type = 'IN' THEN rack_send_s - m_done_s ELSE m_send_s - rack_done_s END",
+    "inventory":       "inventory_s - MAX(COALESCE(m_done_s, 0), COALESCE(rack_done_s, 0))",
+    "history":         "history_s - inventory_s",
+    "finish":          "finished_s - history_s",
+    "total":           "finished_s",
+}
+
+
+class PhaseTimer:
+    """Monotonic phase marks of one worker run, relative to the moment the task was claimed."""
+
+    def __init__(self, claim_started: float, claimed: float = None):
+        self.claimed = claimed if claimed is not None else time.monotonic()
+        self.claim_s = self.claimed - claim_started
+        self.marks = {}
+        self.echo_attempts = {}
+
+    def offset(self, monotonic_time=None):
+        if monotonic_time is None:
+            monotonic_time = time.monotonic()
+        return round(monotonic_time - self.claimed, 4)
+
+    def mark(self, name: str):
+        self.marks[name] = self.offset()
+
+    def leg(self, kind: str, result: dict):
+        """Record a SerialManager.send result for the 'm' or 'rack' leg."""
+        for phase, key in (("send", "command_sent_monotonic"), ("echo", "echo_received_monotonic"),
+                           ("done", "done_received_monotonic")):
+            if result.get(key) is not None:
+                self.marks[f"{kind}_{phase}"] = self.offset(result[key])
+        if result.get("echo_attempts"):
+            self.echo_attempts[kind] = result["echo_attempts"]
+
+
+def record_phases(conn, task: dict, attempt: int, outcome: str, claimed_at: str, timer: PhaseTimer):
+    """Insert the task_phases row of one run (caller commits)."""
+    marks = timer.marks
+    conn.execute("""
+        INSERT INTO task_phases
+        (task_id, attempt, rack, slot, movement_type, outcome, claimed_at, claim_s,
+         m_send_s, m_echo_s, m_done_s, m_echo_attempts,
+         rack_send_s, rack_echo_s, rack_done_s, rack_echo_attempts,
+         inventory_s, history_s, finished_s)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (task['id'], attempt, str(task['rack']).upper(), int(task['slot']), str(task['movement']).upper(),
+          outcome, claimed_at, round(timer.claim_s, 4),
+          marks.get("m_send"), marks.get("m_echo"), marks.get("m_done"), timer.echo_attempts.get("m"),
+          marks.get("rack_send"), marks.get("rack_echo"), marks.get("rack_done"), timer.echo_attempts.get("rack"),
+          marks.get("inventory"), marks.get("history"), timer.offset()))
+
+
+def _stats(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    stats = {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 3)}
+    for pct in PERCENTILES:
+        stats[f"p{pct}"] = round(percentile(ordered, pct), 3)
+    stats["max"] = round(ordered[-1], 3)
+    return stats
+
+
+def get_phase_summary(date_from: dt.datetime, date_to: dt.datetime, group_by=("rack", "movement_type"),
+                      rack=None, slot=None, movement=None, outcome="done"):
+    """
+    Per-phase duration percentiles (seconds) of the runs claimed in [date_from, date_to).
+
+    Args:
+        group_by: any subset of ('rack', 'slot', 'movement_type')
+        outcome: 'done', 'retry', 'failed' or None for every run
+    """
+    group_by = [c for c in GROUP_COLUMNS if c in set(group_by or ())]
+    where = ["claimed_at >= ?", "claimed_at < ?"]
+    params = [date_from.isoformat(timespec="seconds"), date_to.isoformat(timespec="seconds")]
+    if rack:
+        where.append("rack = ?"); params.append(rack.upper())
+    if slot is not None:
+        where.append("slot = ?"); params.append(int(slot))
+    if movement:
+        where.append("movement_type = ?"); params.append(movement.upper())
+    if outcome:
+        where.append("outcome = ?"); params.append(outcome)
+
+    select = group_by + [f"{expr} AS {name}" for name, expr in PHASES.items()] + \
+        ["COALESCE(m_echo_attempts, 1) + COALESCE(rack_echo_attempts, 1) - 2 AS echo_retries"]
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {', '.join(select)} FROM task_phases WHERE {' AND '.join(where)}", params)
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[:len(group_by)]), []).append(row[len(group_by):])
+
+    result = []
+    for key in sorted(groups, key=lambda k: tuple(str(v) for v in k)):
+        runs = groups[key]
+        entry = dict(zip(group_by, key))
+        entry["runs"] = len(runs)
+        entry["phases"] = {
+            name: _stats([run[i] for run in runs if run[i] is not None])
+            for i, name in enumerate(PHASES)
+        }
+        retries = [run[-1] for run in runs]
+        entry["echo_retries"] = {"total": sum(retries), "mean": round(sum(retries) / len(retries), 3)}
+        result.append(entry)
+    return result
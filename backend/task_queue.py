@@ -1,5 +1,6 @@
 # task_queue.py  ─────────────────────────────────────────────
 import queue, threading, time, logging, sqlite3, datetime
+from collections import deque
 from typing import Optional
 # Use DEFAULT_MAX_ECHO_ATTEMPTS from serial_io for regular commands
 from .serial_io import serial_mgr, DEFAULT_MAX_ECHO_ATTEMPTS
@@ -8,6 +9,13 @@ from .inventory_updater import update_inventory_on_done
 from .db import DB_NAME
 from .error_messages import get_error_message
 from .camera_history import store_camera_batch
+from .analytics import record_completed_task
+from .activity_log import record_completed_movement
+from .pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE
+from .dashboard_state import notify_tasks_changed, notify_history_changed, get_dashboard_summary
+from .metrics import TASK_EXECUTION, TASK_QUEUE_WAIT
+from .task_phases import PhaseTimer, record_phases
+from .percentiles import percentile
 
 io = None                           # SocketIO 인스턴스 홀더
 app_instance = None                 # Flask app instance holder
@@ -21,8 +29,184 @@ def set_socketio(sock):             # app.py 가 주입
 def set_app(app):                   # Store Flask app instance
     global app_instance; app_instance = app
 
+# --- Priorities ---
+# Higher level is claimed first; within a level, oldest first.
+PRIORITY_LEVELS = {"low": 0, "normal": 1, "high": 2, "urgent": 3}
+PRIORITY_NAMES = {level: name for name, level in PRIORITY_LEVELS.items()}
+DEFAULT_PRIORITY = PRIORITY_LEVELS["normal"]
+URGENT_PRIORITY = PRIORITY_LEVELS["urgent"]
+
+# Aging: a pending task gains one level per TASK_AGING_S seconds of waiting, up to
+# TASK_AGING_MAX_PRIORITY (aged tasks never overtake urgent ones). 0 disables aging.
+TASK_AGING_S = 600
+TASK_AGING_INTERVAL_S = 30
+TASK_AGING_MAX_PRIORITY = PRIORITY_LEVELS["high"]
+_next_aging = 0.0
+
+QUEUE_WAIT_SAMPLES = 256     # recent queue waits kept per priority for percentiles
+
+# --- Retry Policy ---
+# Only a leg that never got its echo (echo_error_max_retries) is retried with
+# exponential backoff: the device did not receive the command, so nothing moved.
+# After an echo without done/fin (timeout_after_echo) the device may already have
+# moved, and the protocol cannot ask where the tray is, so re-sending the command
+# could store into an occupied slot. Such a task fails as 'failed_unconfirmed'
+# for an operator to check the rack. Everything else (bad rack, unknown
+# movement, unmapped device, exceptions) fails for good as well.
+RETRYABLE_STATUSES = {'failed_m_comm', 'failed_rack_comm', 'failed_rack_echo', 'failed_m_echo'}
+RETRYABLE_SERIAL_STATUSES = {'echo_error_max_retries'}
+UNCONFIRMED_SERIAL_STATUSES = {'timeout_after_echo'}
+UNCONFIRMED_STATUS = 'failed_unconfirmed'
+TASK_MAX_ATTEMPTS = 4        # runs per task including the first
+TASK_RETRY_BASE_S = 2.0      # backoff before the 2nd run; doubles per run
+TASK_RETRY_MAX_S = 60.0
+
+def configure(config):
+    """Apply TASK_AGING_* / TASK_RETRY_* from app.config (call once at startup)."""
+    global TASK_AGING_S, TASK_AGING_INTERVAL_S, TASK_AGING_MAX_PRIORITY
+    global TASK_MAX_ATTEMPTS, TASK_RETRY_BASE_S, TASK_RETRY_MAX_S
+    TASK_AGING_S = float(config.get('TASK_AGING_S', TASK_AGING_S))
+    TASK_AGING_INTERVAL_S = float(config.get('TASK_AGING_INTERVAL_S', TASK_AGING_INTERVAL_S))
+    TASK_AGING_MAX_PRIORITY = parse_priority(config.get('TASK_AGING_MAX_PRIORITY', TASK_AGING_MAX_PRIORITY))
+    TASK_MAX_ATTEMPTS = int(config.get('TASK_MAX_ATTEMPTS', TASK_MAX_ATTEMPTS))
+    TASK_RETRY_BASE_S = float(config.get('TASK_RETRY_BASE_S', TASK_RETRY_BASE_S))
+    TASK_RETRY_MAX_S = float(config.get('TASK_RETRY_MAX_S', TASK_RETRY_MAX_S))
+
+def is_retryable(status: str, serial_status: str = None) -> bool:
+    """Whether a failed run may be requeued (transient link failure)."""
+    return status in RETRYABLE_STATUSES and (serial_status is None or serial_status in RETRYABLE_SERIAL_STATUSES)
+
+def retry_delay(attempt: int) -> float:
+    """Backoff in seconds after failed run number `attempt` (1-based), capped at TASK_RETRY_MAX_S."""
+    return min(TASK_RETRY_MAX_S, TASK_RETRY_BASE_S * 2 ** (attempt - 1))
+
+def parse_priority(value) -> int:
+    """'urgent' / 3 / '3' → 3; None → DEFAULT_PRIORITY. Raises ValueError for anything else."""
+    if value is None or value == "":
+        return DEFAULT_PRIORITY
+    if isinstance(value, str) and value.lower() in PRIORITY_LEVELS:
+        return PRIORITY_LEVELS[value.lower()]
+    try:
+        level = int(value)
+    except (TypeError, ValueError):
+        level = None
+    if level not in PRIORITY_NAMES:
+        raise ValueError(get_error_message("invalid_priority", priority=value))
+    return level
+
+# --- Scheduler State ---
+class SchedulerState:
+    """
+    In-memory queue state for admission control (system_busy, /api/system-state).
+
+    The code paths that commit work_tasks changes report them here right after
+    the commit (tasks_added / task_claimed / task_finished / tasks_removed), so
+    reading the state needs no database access. resync() recounts from the
+    database at startup and when the worker notices the counts drifted (e.g.
+    tasks written by another process).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.in_progress = 0
+        self.last_completion = None       # time.monotonic() of the last finished task
+        self.last_completion_at = None    # wall-clock ISO timestamp of the same
+        self.synced_at = None
+        # requested priority → recent created_at → claim waits (seconds)
+        self.queue_waits = {level: deque(maxlen=QUEUE_WAIT_SAMPLES) for level in PRIORITY_NAMES}
+
+    def tasks_added(self, count=1):
+        with self.lock:
+            self.pending += count
+
+    def task_claimed(self, priority=None, wait_s=None):
+        with self.lock:
+            self.pending = max(0, self.pending - 1)
+            self.in_progress += 1
+            if priority in self.queue_waits and wait_s is not None:
+                self.queue_waits[priority].append(max(0.0, wait_s))
+
+    def task_finished(self):
+        with self.lock:
+            self.in_progress = max(0, self.in_progress - 1)
+            self.last_completion = time.monotonic()
+            self.last_completion_at = datetime.datetime.now().isoformat(timespec="seconds")
+
+    def task_requeued(self):
+        """A claimed task went back to pending (retry backoff)."""
+        with self.lock:
+            self.in_progress = max(0, self.in_progress - 1)
+            self.pending += 1
+
+    def tasks_removed(self, count):
+        with self.lock:
+            self.pending = max(0, self.pending - count)
+
+    def resync(self):
+        """Recount pending/in_progress (and the last completion after a restart) from the database."""
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT status, COUNT(*) FROM work_tasks
+                WHERE status IN ('pending', 'in_progress')
+                GROUP BY status
+            """)
+            counts = dict(cur.fetchall())
+            last_done = None
+            if self.last_completion is None:
+                cur.execute("SELECT MAX(updated_at) FROM work_tasks WHERE status = 'done'")
+                last_done = cur.fetchone()[0]
+        finally:
+            conn.close()
+        with self.lock:
+            self.pending = counts.get('pending', 0)
+            self.in_progress = counts.get('in_progress', 0)
+            self.synced_at = datetime.datetime.now().isoformat(timespec="seconds")
+            if last_done and self.last_completion is None:
+                age = (datetime.datetime.now() - datetime.datetime.fromisoformat(str(last_done).split(".")[0])).total_seconds()
+                self.last_completion = time.monotonic() - max(0.0, age)
+                self.last_completion_at = last_done
+
+    def busy(self, min_idle_seconds=1) -> bool:
+        with self.lock:
+            if self.pending or self.in_progress:
+                return True
+            return (self.last_completion is not None
+                    and time.monotonic() - self.last_completion < min_idle_seconds)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            idle_for = None if self.last_completion is None else round(time.monotonic() - self.last_completion, 3)
+            return {
+                "pending": self.pending,
+                "in_progress": self.in_progress,
+                "outstanding": self.pending + self.in_progress,
+                "last_completion_at": self.last_completion_at,
+                "seconds_since_last_completion": idle_for,
+                "synced_at": self.synced_at,
+            }
+
+    def queue_wait_stats(self) -> dict:
+        """Queue wait (created → claimed) per requested priority over the recent claims."""
+        with self.lock:
+            samples = {PRIORITY_NAMES[level]: list(waits) for level, waits in self.queue_waits.items()}
+        return {
+            name: {
+                "claimed": len(waits),
+                "p50_s": percentile(waits, 50),
+                "p95_s": percentile(waits, 95),
+                "max_s": max(waits, default=None),
+            }
+            for name, waits in samples.items()
+        }
+
+
+scheduler_state = SchedulerState()
+
 # --- DB Task Management ---
-def enqueue_work_task(task, user_info, conn=None, cur=None):
+def enqueue_work_task(task, user_info, conn=None, cur=None, priority=DEFAULT_PRIORITY):
     now = datetime.datetime.now().isoformat(timespec="seconds")
     
     own_connection = False
@@ -37,8 +221,8 @@ def enqueue_work_task(task, user_info, conn=None, cur=None):
         cur.execute("""
             INSERT INTO work_tasks
             (rack, slot, product_code, product_name, movement, quantity, cargo_owner, status, 
-             created_at, updated_at, start_time, end_time, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?, NULL, NULL, ?)
+             created_at, updated_at, start_time, end_time, created_by, priority, requested_priority)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?, NULL, NULL, ?, ?, ?)
         """, (
             task['rack'].upper(),
             int(task['slot']),
@@ -48,14 +232,17 @@ def enqueue_work_task(task, user_info, conn=None, cur=None):
             int(task['quantity']),
             task.get('cargo_owner', ''),
             now, now,
-            user_info['id']
+            user_info['id'],
+            priority, priority
         ))
         new_task_id = cur.lastrowid
         if own_connection:
             conn.commit()
+            scheduler_state.tasks_added(1)
+            notify_tasks_changed()
         
         logger = current_app.logger if current_app else logging.getLogger(__name__)
-        logger.info(f"[enqueue_work_task] Task enqueued with ID: {new_task_id}. Attempting to emit.")
+        logger.info("[enqueue_work_task] Task enqueued with ID: %s. Attempting to emit.", new_task_id)
 
         if io and new_task_id:
             io.emit("task_status_changed", {
@@ -65,9 +252,10 @@ def enqueue_work_task(task, user_info, conn=None, cur=None):
                 "rack": task['rack'].upper(), 
                 "slot": int(task['slot']), 
                 "movement": task['movement'].upper(),
+                "priority": PRIORITY_NAMES.get(priority, priority),
                 "created_by": user_info['username']  # Include username in the event
             })
-            logger.info(f"[enqueue_work_task] Emitted task_status_changed for new task ID: {new_task_id} (pending, no batch_id yet)")
+            logger.info("[enqueue_work_task] Emitted task_status_changed for new task ID: %s (pending, no batch_id yet)", new_task_id)
 
     finally:
         if own_connection:
@@ -95,53 +283,92 @@ def set_task_status(task_id: int, status: str, conn=None):
         
         if own_connection:
             conn.commit()
+            if status != 'in_progress':
+                scheduler_state.task_finished()
+            notify_tasks_changed()
 
         # Fetch details for the event
         task_details = get_task_by_id(task_id)
         if io and task_details:
             io.emit("task_status_changed", task_details)
             logger = current_app.logger if current_app else logging.getLogger(__name__)
-            logger.info(f"Emitted task_status_changed for task {task_id} with status {status}")
+            logger.info("Emitted task_status_changed for task %s with status %s", task_id, status)
 
     finally:
         if own_connection:
             conn.close()
 
+def age_pending_tasks(conn) -> int:
+    """
+    Raise the priority of pending tasks by one level per TASK_AGING_S seconds
+    waited (capped at TASK_AGING_MAX_PRIORITY). Returns the number of rows promoted.
+    """
+    if TASK_AGING_S <= 0:
+        return 0
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    aged = """MIN(?, requested_priority + CAST((julianday(?) - julianday(created_at)) * 86400 / ? AS INTEGER))"""
+    cur = conn.execute(f"""
+        UPDATE work_tasks SET priority = {aged}
+        WHERE status = 'pending' AND priority < ? AND {aged} > priority
+    """, (TASK_AGING_MAX_PRIORITY, now, TASK_AGING_S, TASK_AGING_MAX_PRIORITY,
+          TASK_AGING_MAX_PRIORITY, now, TASK_AGING_S))
+    return cur.rowcount
+
 def claim_next_task():
     """
     Atomically fetches the next pending task and sets its status to 'in_progress'.
     This prevents multiple workers from picking up tasks simultaneously.
+
+    The next task is the highest-priority, oldest pending one, walked in order on
+    idx_work_tasks_claim; nothing is claimed while a task is in progress.
+    Tasks in retry backoff (not_before in the future) are skipped, and so are later
+    tasks on the same slot, so a retry never lets work on its slot run out of order.
+    That per-candidate slot check is one probe of idx_work_tasks_slot_backoff, so a
+    claim costs the candidates skipped, not a scan of every pending task.
+    Every TASK_AGING_INTERVAL_S the priorities of waiting tasks are aged first.
     """
+    global _next_aging
     with task_lock:
         conn = sqlite3.connect(DB_NAME, timeout=10)
         cur = conn.cursor()
         try:
-            # First, check if any task is already in progress
-            cur.execute("SELECT COUNT(*) FROM work_tasks WHERE status = 'in_progress'")
-            in_progress_count = cur.fetchone()[0]
-            if in_progress_count > 0:
-                return None  # A task is already running
+            if time.monotonic() >= _next_aging:
+                _next_aging = time.monotonic() + TASK_AGING_INTERVAL_S
+                promoted = age_pending_tasks(conn)
+                if promoted:
+                    conn.commit()
+                    logger = current_app.logger if current_app else logging.getLogger(__name__)
+                    logger.info(f"[claim_next_task] Aging promoted {promoted} pending task(s)")
 
-            # If no tasks are in progress, get the next pending one
             # MUST fetch all columns needed by update_inventory_on_done
+            now = datetime.datetime.now().isoformat(timespec="seconds")
             cur.execute("""
                 SELECT 
                     id, rack, slot, movement, product_code, 
-                    product_name, quantity, cargo_owner
-                FROM work_tasks
+                    product_name, quantity, cargo_owner, created_at, requested_priority,
+                    attempts, legs_done
+                FROM work_tasks wt
                 WHERE status = 'pending'
-                ORDER BY created_at ASC
+                  AND (not_before IS NULL OR not_before <= ?)
+                  AND NOT EXISTS (SELECT 1 FROM work_tasks WHERE status = 'in_progress')
+                  AND NOT EXISTS (
+                      SELECT 1 FROM work_tasks b
+                      WHERE b.status = 'pending' AND b.not_before > ?
+                        AND b.rack = wt.rack AND b.slot = wt.slot AND b.id < wt.id)
+                ORDER BY priority DESC, created_at ASC, id ASC
                 LIMIT 1
-            """)
+            """, (now, now))
             task_row = cur.fetchone()
 
             if task_row:
                 # Get column names BEFORE the UPDATE query resets the cursor's description
                 columns = [desc[0] for desc in cur.description]
-                task_id = task_row[0]
+                task = dict(zip(columns, task_row))
+                task_id = task['id']
                 
                 # Get current time for both updated_at and start_time
-                now = datetime.datetime.now().isoformat(timespec="seconds")
+                claimed_at = datetime.datetime.now()
+                now = claimed_at.isoformat(timespec="seconds")
                 
                 # Immediately claim it by setting status to in_progress AND setting start_time
                 cur.execute("""
@@ -150,12 +377,19 @@ def claim_next_task():
                     WHERE id = ?
                 """, ('in_progress', now, now, task_id))
                 conn.commit()
-                
-                # Create a full task dictionary from the row
-                task = dict(zip(columns, task_row))
+                wait_s = None
+                if not task['attempts']:   # queue wait of the first run only
+                    try:
+                        wait_s = (claimed_at - datetime.datetime.fromisoformat(task['created_at'])).total_seconds()
+                    except (TypeError, ValueError):
+                        pass
+                scheduler_state.task_claimed(task['requested_priority'], wait_s)
+                if wait_s is not None:
+                    TASK_QUEUE_WAIT.labels(PRIORITY_NAMES.get(task['requested_priority'], "unknown")).observe(max(0.0, wait_s))
+                notify_tasks_changed()
                 return task
             else:
-                return None # No pending tasks
+                return None # No pending tasks (or a task is already running)
         finally:
             conn.close()
 
@@ -192,6 +426,153 @@ def get_task_with_meta(task_id: int) -> Optional[dict]:
         return dict(zip(columns, row))
     return None
 
+# --- Task Completion ---
+def complete_task(task: dict, operation_start_time, operation_end_time, update_inventory=True, phases=None):
+    """
+    Bookkeeping after a task's physical operation finished: inventory, status
+    'done', activity log, camera batch history and analytics rollups.
+    Used by the worker and by startup recovery (recovery.py), which passes
+    update_inventory=False when the inventory already reflects the move.
+    The worker passes its PhaseTimer to mark the inventory and history phases.
+    """
+    logger = current_app.logger if current_app else logging.getLogger(__name__)
+    task_id = task['id']
+    if update_inventory:
+        # Update inventory first
+        update_inventory_on_done(task)
+    if phases:
+        phases.mark("inventory")
+    # Then mark task as done
+    set_task_status(task_id, 'done')
+
+    # Get task details for history
+    task_details = get_task_with_meta(task_id)
+    if task_details:
+        record_completed_movement(task_details)
+        # Record in camera batch history
+        history_data = {
+            'batch_id': task_details.get('batch_id'),
+            'rack': task_details['rack'],
+            'slot': task_details['slot'],
+            'movement': task_details['movement'],
+            'start_time': operation_start_time.isoformat() if isinstance(operation_start_time, datetime.datetime) else operation_start_time,
+            'end_time': operation_end_time.isoformat() if isinstance(operation_end_time, datetime.datetime) else operation_end_time,
+            'product_code': task_details['product_code'],
+            'product_name': task_details['product_name'],
+            'quantity': task_details['quantity'],
+            'cargo_owner': task_details['cargo_owner'],
+            'created_by': task_details['created_by'],
+            'created_by_username': task_details.get('created_by_username') or 'Unknown',
+            'status': 'done',
+            'created_at': task_details['created_at'],
+            'updated_at': task_details['updated_at']
+        }
+        store_camera_batch(history_data)
+        record_completed_task(history_data)
+        notify_history_changed()
+        if phases:
+            phases.mark("history")
+        logger.info(f"[complete_task] Task {task_id} recorded in camera batch history.")
+
+def record_leg_started(task_id: int, leg: int):
+    """
+    Mark leg number `leg` (0-based) as in flight before its command is sent. If
+    the process dies before record_leg_done(), recovery.py cannot know whether
+    the device moved and must not send the leg again.
+    """
+    conn = sqlite3.connect(DB_NAME, timeout=10)
+    try:
+        conn.execute("UPDATE work_tasks SET leg_in_flight = ? WHERE id = ?", (leg, task_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def record_leg_done(task_id: int, legs_done: int):
+    """Persist serial leg progress so a retry (or crash recovery) resumes after the finished legs."""
+    conn = sqlite3.connect(DB_NAME, timeout=10)
+    try:
+        conn.execute("UPDATE work_tasks SET legs_done = ?, leg_in_flight = NULL WHERE id = ?", (legs_done, task_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def finish_attempt(task: dict, status: str, started_at: str, serial_status: str = None,
+                   device: str = None, legs_done: int = 0, phases: PhaseTimer = None) -> str:
+    """
+    Record one worker run of `task` in task_attempts (and its task_phases row
+    when the worker passes `phases`) and apply the retry policy.
+    A successful run ('done') must already be completed with complete_task().
+    A retryable failure goes back to 'pending' with not_before = now + backoff,
+    keeping its priority, place and legs_done; otherwise the failure status is final.
+
+    Returns:
+        'done', 'retry' or 'failed'
+    """
+    logger = current_app.logger if current_app else logging.getLogger(__name__)
+    task_id = task['id']
+    attempt = int(task.get('attempts') or 0) + 1
+    now = datetime.datetime.now()
+    retry_at = None
+
+    if status == 'done':
+        outcome = 'done'
+    elif is_retryable(status, serial_status) and attempt < TASK_MAX_ATTEMPTS:
+        outcome = 'retry'
+        retry_at = (now + datetime.timedelta(seconds=retry_delay(attempt))).isoformat(timespec="seconds")
+    else:
+        outcome = 'failed'
+
+    conn = sqlite3.connect(DB_NAME, timeout=10)
+    try:
+        conn.execute("""
+            INSERT INTO task_attempts
+            (task_id, attempt, started_at, finished_at, outcome, status, serial_status, device, legs_done, retry_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (task_id, attempt, started_at, now.isoformat(timespec="seconds"), outcome, status,
+              serial_status, device, legs_done, retry_at))
+        if phases:
+            record_phases(conn, task, attempt, outcome, started_at, phases)
+        if outcome == 'retry':
+            conn.execute("""
+                UPDATE work_tasks
+                SET status = 'pending', attempts = ?, legs_done = ?, leg_in_flight = NULL, not_before = ?,
+                    last_error = ?, updated_at = ?, start_time = NULL
+                WHERE id = ?
+            """, (attempt, legs_done, retry_at, status, now.isoformat(timespec="seconds"), task_id))
+        elif outcome == 'failed':
+            conn.execute("UPDATE work_tasks SET attempts = ?, last_error = ?, leg_in_flight = NULL WHERE id = ?",
+                         (attempt, status, task_id))
+        conn.commit()
+    finally:
+        conn.close()
+    try:
+        TASK_EXECUTION.labels(outcome).observe(max(0.0, (now - datetime.datetime.fromisoformat(started_at)).total_seconds()))
+    except (TypeError, ValueError):
+        pass
+
+    if outcome == 'retry':
+        scheduler_state.task_requeued()
+        notify_tasks_changed()
+        task_details = get_task_by_id(task_id)
+        if io and task_details:
+            io.emit("task_status_changed", task_details)
+        logger.warning(f"[Worker] Task {task_id} attempt {attempt} failed with {status} ({serial_status}); "
+                       f"retrying after {retry_at}")
+    elif outcome == 'failed':
+        set_task_status(task_id, status)
+    return outcome
+
+def get_task_attempts(task_id: int) -> list:
+    """Attempt history of one task, oldest first."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM task_attempts WHERE task_id = ? ORDER BY attempt", (task_id,))
+        columns = [desc[0] for desc in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+    finally:
+        conn.close()
+
 # --- Worker Thread ---
 class WorkerThread(threading.Thread):
     def __init__(self, app_context):
@@ -206,15 +587,30 @@ class WorkerThread(threading.Thread):
             main_done_token = b"fin"
             rack_done_token = b"done"
 
+            idle_polls_with_outstanding = 0
             while True:
+                claim_started = time.monotonic()
                 task = claim_next_task()
                 if not task:
+                    # Nothing claimable although the state says work is outstanding:
+                    # recount once it persists past a commit/report race
+                    if scheduler_state.busy(min_idle_seconds=0):
+                        idle_polls_with_outstanding += 1
+                        if idle_polls_with_outstanding >= 3:
+                            scheduler_state.resync()
+                            idle_polls_with_outstanding = 0
+                    else:
+                        idle_polls_with_outstanding = 0
                     time.sleep(1)
                     continue
+                idle_polls_with_outstanding = 0
 
                 task_id = task['id']
+                phases = PhaseTimer(claim_started)
+                attempt_started = datetime.datetime.now().isoformat(timespec="seconds")
+                legs_done = int(task.get('legs_done') or 0)
                 try:
-                    logger.info(f"[Worker] Picked up task {task_id}. Already marked as 'in_progress'.")
+                    logger.info("[Worker] Picked up task %s. Already marked as 'in_progress'.", task_id)
                     
                     target_rack_id = task['rack'].upper()
                     current_slot = int(task['slot'])
@@ -222,7 +618,9 @@ class WorkerThread(threading.Thread):
 
                     final_task_status = None
                     physical_op_successful = False
-                    operation_start_time = datetime.datetime.now(datetime.timezone.utc)
+                    operation_start_time = None
+                    operation_end_time = None
+                    failed_device = failed_serial_status = None
                     
                     # --- M Command Generation ---
                     cmd_for_m = "0"
@@ -237,7 +635,7 @@ class WorkerThread(threading.Thread):
                     # Rack commands
                     cmd_for_rack = str(current_slot) if movement == 'IN' else str(-current_slot)
                     
-                    logger.info(f"[Worker] Task {task_id}: M Cmd: '{cmd_for_m}', Rack Cmd: '{cmd_for_rack}'")
+                    logger.info("[Worker] Task %s: M Cmd: '%s', Rack Cmd: '%s'", task_id, cmd_for_m, cmd_for_rack)
 
                     if final_task_status: # Error from M command generation
                         pass # Skip to end
@@ -247,85 +645,57 @@ class WorkerThread(threading.Thread):
                         operation_start_time = datetime.datetime.now().isoformat(timespec="seconds")
                         operation_end_time = operation_start_time
                     
-                    elif movement == 'IN':
-                        # 1. Main equipment (M) delivers to rack approach area
-                        m_result = serial_mgr.send(main_equipment_id, cmd_for_m, wait_done=True, done_token=main_done_token)
-                        if m_result["status"] != "done":
-                            final_task_status = 'failed_m_comm'
+                    elif movement in ('IN', 'OUT'):
+                        # IN:  1. M delivers to the rack approach area  2. the rack receives it
+                        # OUT: 1. the rack delivers to the approach area  2. M receives it
+                        # Each leg: (device, command, done token, failure status)
+                        m_leg = (main_equipment_id, cmd_for_m, main_done_token)
+                        rack_leg = (target_rack_id, cmd_for_rack, rack_done_token)
+                        if movement == 'IN':
+                            legs = [m_leg + ('failed_m_comm',), rack_leg + ('failed_rack_comm',)]
                         else:
-                            # Record start time from when the first command was sent
-                            operation_start_time = m_result["command_sent_time"]
-                            
-                            # 2. Rack receives from approach area
-                            rack_result = serial_mgr.send(target_rack_id, cmd_for_rack, wait_done=True, done_token=rack_done_token)
-                            if rack_result["status"] != "done":
-                                final_task_status = 'failed_rack_comm'
-                            else:
-                                physical_op_successful = True
-                                # Record end time from when the last "done" signal was received
-                                operation_end_time = rack_result["done_received_time"]
-                    
-                    elif movement == 'OUT':
-                        # 1. Rack delivers to approach area
-                        rack_result = serial_mgr.send(target_rack_id, cmd_for_rack, wait_done=True, done_token=rack_done_token)
-                        if rack_result["status"] != "done":
-                            final_task_status = 'failed_rack_echo'
+                            legs = [rack_leg + ('failed_rack_echo',), m_leg + ('failed_m_echo',)]
+                        if legs_done:
+                            logger.info("[Worker] Task %s: resuming after %s completed leg(s)", task_id, legs_done)
+
+                        for device, command, done_token, failure_status in legs[legs_done:]:
+                            record_leg_started(task_id, legs_done)
+                            result = serial_mgr.send(device, command, wait_done=True, done_token=done_token)
+                            phases.leg("m" if device == main_equipment_id else "rack", result)
+                            if result["status"] != "done":
+                                # The command was accepted but its completion was never seen
+                                final_task_status = (UNCONFIRMED_STATUS if result["status"] in UNCONFIRMED_SERIAL_STATUSES
+                                                     else failure_status)
+                                failed_device, failed_serial_status = device, result["status"]
+                                break
+                            # Start time from the first command sent in this run, end time
+                            # from the last "done" signal received
+                            operation_start_time = operation_start_time or result["command_sent_time"]
+                            operation_end_time = result["done_received_time"]
+                            legs_done += 1
+                            record_leg_done(task_id, legs_done)
                         else:
-                            # Record start time from when the first command was sent
-                            operation_start_time = rack_result["command_sent_time"]
-                            
-                            # 2. Main equipment (M) receives from approach area
-                            m_result = serial_mgr.send(main_equipment_id, cmd_for_m, wait_done=True, done_token=main_done_token)
-                            if m_result["status"] != "done":
-                                final_task_status = 'failed_m_echo'
-                            else:
-                                physical_op_successful = True
-                                # Record end time from when the last "done" signal was received
-                                operation_end_time = m_result["done_received_time"]
+                            physical_op_successful = True
                     
                     else:
                         final_task_status = 'failed_unknown_movement'
 
                     # Complete the task after physical operation
                     if physical_op_successful:
-                        # Update inventory first
-                        update_inventory_on_done(task)
-                        # Then mark task as done
-                        set_task_status(task_id, 'done')
-                        
-                        # Get task details for history
-                        task_details = get_task_with_meta(task_id)
-                        if task_details:
-                            # Record in camera batch history
-                            history_data = {
-                                'batch_id': task_details.get('batch_id'),
-                                'rack': task_details['rack'],
-                                'slot': task_details['slot'],
-                                'movement': task_details['movement'],
-                                'start_time': operation_start_time.isoformat() if isinstance(operation_start_time, datetime.datetime) else operation_start_time,
-                                'end_time': operation_end_time.isoformat() if isinstance(operation_end_time, datetime.datetime) else operation_end_time,
-                                'product_code': task_details['product_code'],
-                                'product_name': task_details['product_name'],
-                                'quantity': task_details['quantity'],
-                                'cargo_owner': task_details['cargo_owner'],
-                                'created_by': task_details['created_by'],
-                                'created_by_username': task_details.get('created_by_username') or 'Unknown',
-                                'status': 'done',
-                                'created_at': task_details['created_at'],
-                                'updated_at': task_details['updated_at']
-                            }
-                            store_camera_batch(history_data)
-                            logger.info(f"[Worker] Task {task_id} recorded in camera batch history.")
-                        
-                        logger.info(f"[Worker] Task {task_id} completed successfully.")
+                        complete_task(task, operation_start_time, operation_end_time, phases=phases)
+                        finish_attempt(task, 'done', attempt_started, legs_done=legs_done, phases=phases)
+                        logger.info("[Worker] Task %s completed successfully.", task_id)
                     else:
-                        # Mark task as failed with specific error
-                        set_task_status(task_id, final_task_status if final_task_status else 'failed_unknown')
-                        logger.error(f"[Worker] Task {task_id} failed with status: {final_task_status}")
+                        # Retry transient serial failures with backoff, otherwise mark the task failed
+                        final_task_status = final_task_status if final_task_status else 'failed_unknown'
+                        outcome = finish_attempt(task, final_task_status, attempt_started,
+                                                 failed_serial_status, failed_device, legs_done, phases)
+                        if outcome == 'failed':
+                            logger.error(f"[Worker] Task {task_id} failed with status: {final_task_status}")
                             
                 except Exception as e:
                     logger.error(f"[Worker] UNHANDLED EXCEPTION processing task {task_id}: {e}", exc_info=True)
-                    set_task_status(task_id, 'failed_exception')
+                    finish_attempt(task, 'failed_exception', attempt_started, legs_done=legs_done, phases=phases)
                 
                 finally:
                     # Brief pause before next task
@@ -338,7 +708,15 @@ def start_worker(app):
         current_app.logger.info("Task processing worker started.")
 
 # --- API Helper ---
-def get_work_tasks_by_status(status=None, user_info=None):
+def system_busy(min_idle_seconds: int = 1) -> bool:
+    """
+    Return True if there are pending/in_progress tasks, or if last completion < cooldown.
+    Used to gate new batches and by maintenance.py to find idle windows.
+    Reads the in-memory scheduler state only (no database access).
+    """
+    return scheduler_state.busy(min_idle_seconds)
+
+def get_work_tasks_by_status(status=None, user_info=None, batch_id=None):
     """
     Get work tasks filtered by status and user permissions.
     Admin users can see all tasks, regular users only see their own tasks.
@@ -346,6 +724,7 @@ def get_work_tasks_by_status(status=None, user_info=None):
     Args:
         status (str, optional): Filter tasks by status
         user_info (dict): User information including id and role
+        batch_id (str, optional): Only tasks linked to this batch
     """
     if not user_info:
         return []
@@ -353,6 +732,54 @@ def get_work_tasks_by_status(status=None, user_info=None):
     conn = sqlite3.connect(DB_NAME)
     cur = conn.cursor()
     
+    base_query, params = _work_tasks_query(status, user_info, batch_id)
+    base_query += " ORDER BY wt.created_at ASC, wt.id ASC"
+    
+    cur.execute(base_query, params)
+    rows = cur.fetchall()
+    columns = [desc[0] for desc in cur.description]
+    conn.close()
+    return [dict(zip(columns, row)) for row in rows]
+
+def get_work_tasks_page(status=None, user_info=None, limit=DEFAULT_PAGE_SIZE, cursor=None, order="asc", batch_id=None):
+    """
+    Keyset-paginated variant of get_work_tasks_by_status.
+    Rows are ordered by (created_at, id); `cursor` is the opaque next_cursor of the previous page.
+
+    Returns:
+        (list of task dicts, next_cursor or None)
+    """
+    if not user_info:
+        return [], None
+    order = "desc" if str(order).lower() == "desc" else "asc"
+
+    base_query, params = _work_tasks_query(status, user_info, batch_id)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, order, 2)
+        base_query += (" AND " if " WHERE " in base_query else " WHERE ") + \
+            f"(wt.created_at, wt.id) {'>' if order == 'asc' else '<'} (?, ?)"
+        params.extend([last_created_at, last_id])
+    direction = order.upper()
+    base_query += f" ORDER BY wt.created_at {direction}, wt.id {direction} LIMIT ?"
+    params.append(limit + 1)
+
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        cur = conn.cursor()
+        cur.execute(base_query, params)
+        rows = cur.fetchall()
+        columns = [desc[0] for desc in cur.description]
+    finally:
+        conn.close()
+
+    tasks = [dict(zip(columns, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor((tasks[-1]['created_at'], tasks[-1]['id']), order)
+    return tasks, next_cursor
+
+def _work_tasks_query(status, user_info, batch_id=None):
+    """Shared SELECT/WHERE for the work task listings."""
     base_query = """
         SELECT wt.*, btl.batch_id, u.username as created_by_username 
         FROM work_tasks wt 
@@ -372,18 +799,15 @@ def get_work_tasks_by_status(status=None, user_info=None):
     if user_info.get('role') != 'admin':
         where_clauses.append("wt.created_by = ?")
         params.append(user_info['id'])
+
+    if batch_id:
+        where_clauses.append("btl.batch_id = ?")
+        params.append(batch_id)
     
     # Combine where clauses if any exist
     if where_clauses:
         base_query += " WHERE " + " AND ".join(where_clauses)
-    
-    base_query += " ORDER BY wt.created_at ASC"
-    
-    cur.execute(base_query, params)
-    rows = cur.fetchall()
-    columns = [desc[0] for desc in cur.description]
-    conn.close()
-    return [dict(zip(columns, row)) for row in rows]
+    return base_query, params
 
 def get_pending_task_counts(user_info=None):
     """
@@ -395,33 +819,9 @@ def get_pending_task_counts(user_info=None):
     """
     if not user_info:
         return {"pending_in_count": 0, "pending_out_count": 0}
-        
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    
-    base_query = "SELECT COUNT(*) FROM work_tasks WHERE status='pending' AND movement=?"
-    params = []
-    
-    # Add user filter for non-admin users
-    if user_info.get('role') != 'admin':
-        base_query += " AND created_by = ?"
-        params = ['IN', user_info['id']]
-    else:
-        params = ['IN']
-    
-    # Count pending IN tasks
-    cur.execute(base_query, params)
-    pending_in_count = cur.fetchone()[0]
-    
-    # Update params for OUT query
-    params[0] = 'OUT'
-    
-    # Count pending OUT tasks
-    cur.execute(base_query, params)
-    pending_out_count = cur.fetchone()[0]
-    
-    conn.close()
-    return {"pending_in_count": pending_in_count, "pending_out_count": pending_out_count}
+
+    pending = get_dashboard_summary(user_info)["counts"]["pending"]
+    return {"pending_in_count": pending["IN"], "pending_out_count": pending["OUT"]}
 
 def clear_all_queues():
     """
@@ -440,6 +840,8 @@ def clear_all_queues():
         cur.execute("DELETE FROM batch_task_links WHERE task_id NOT IN (SELECT id FROM work_tasks)")
         
         conn.commit()
+        scheduler_state.tasks_removed(deleted_count)
+        notify_tasks_changed()
         
         logger = current_app.logger if current_app else logging.getLogger(__name__)
         logger.info(f"[clear_all_queues] Cleared {deleted_count} pending tasks from queue")
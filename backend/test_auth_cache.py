@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Checks that token_required answers the same whether the user record comes
+from the database (first request of a session) or from auth.user_cache
+(every later one), against a temp database:
+
+  - malformed JSON to /api/record is a 400 on both paths, not a 500
+  - a normal authenticated request succeeds on both paths
+
+    python -m backend.test_auth_cache          # exit status 1 on any failure
+"""
+
+import sys
+from .benchmarks.common import boot_app, login, prepare_environment
+
+failures = []
+
+
+def check(name, ok, detail=None):
+    print(f"{'✅' if ok else '❌'} {name}" + (f"  ({detail})" if detail is not None and not ok else ""))
+    if not ok:
+        failures.append(name)
+
+
+def main():
+    prepare_environment()
+    app = boot_app()
+    from .auth import user_cache
+    client = app.test_client()
+    headers = login(client)
+    headers["Content-Type"] = "application/json"
+
+    statuses = []
+    for _ in range(2):
+        response = client.post("/api/record", data="{not json", headers=headers)
+        statuses.append(response.status_code)
+    check("user cached after the first request", len(user_cache._entries) == 1, len(user_cache._entries))
+    check("malformed JSON is a 400 from the database and the cached path", statuses == [400, 400], statuses)
+
+    user_cache.clear()
+    statuses = [client.get("/api/inventory", headers=headers).status_code for _ in range(2)]
+    check("authenticated GET succeeds from both paths", statuses == [200, 200], statuses)
+
+    print(f"\n{'❌ ' + str(len(failures)) + ' check(s) failed' if failures else '✅ all checks passed'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Behavioural checks for the task retry policy and archived camera history
+paging, against a temp database and the PTY hardware simulator:
+
+  1. is_retryable() / retry_delay() decisions
+  2. a rack that never echoes: the run is requeued by finish_attempt() with
+     legs_done = 1 and the retry resumes at the rack leg (M is not re-sent)
+  3. M echoes but its fin is lost: the task fails as failed_unconfirmed
+     without a retry
+  4. retries running out: the last run still resumes after the finished leg
+     and the task fails for good
+  5. camera_batch_history rows archived by a forced retention run (several
+     segments, archived ids interleaved with live ones): cursor paging with
+     get_camera_history_page() and archive.rows_before() return every row
+     once, newest first, across the live/archive boundary
+
+    python -m backend.test_retry_archive          # exit status 1 on any failure
+"""
+
+import datetime, logging, sqlite3, sys, time
+from .benchmarks.common import boot_app, login, prepare_environment
+from .hw_simulator import HardwareSimulator
+
+failures = []
+
+
+def check(name, ok, detail=None):
+    print(f"{'✅' if ok else '❌'} {name}" + (f"  ({detail})" if detail is not None and not ok else ""))
+    if not ok:
+        failures.append(name)
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def set_faults(simulator, device_id, **faults):
+    """Faults of one simulated device (the others keep the shared defaults)."""
+    simulator.devices[device_id].faults = dict(simulator.faults, **faults)
+
+
+def device_stats(simulator, device_id, key):
+    return simulator.stats()[device_id][key]
+
+
+def run_task(client, headers, rack, slot, movement="IN"):
+    """Upload one task and wait until the worker is done with it. Returns its id."""
+    from . import db, task_queue
+    from .admission import admission_queue
+    record = {"rack": rack, "slot": slot, "movement": movement, "quantity": 1,
+              "product_code": f"RETRY-{rack}{slot:02d}", "product_name": f"Retry check {rack}{slot:02d}",
+              "cargo_owner": "check"}
+    response = client.post("/api/upload-tasks", json=[record], headers=headers)
+    if response.status_code not in (200, 202):
+        raise RuntimeError(f"upload rejected: {response.status_code} {response.get_json()}")
+    batch_id = response.get_json()["batch_id"]
+    if not wait_for(lambda: not admission_queue.queued_count() and not task_queue.system_busy(min_idle_seconds=0)):
+        raise RuntimeError(f"task of batch {batch_id} did not finish")
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        return conn.execute("SELECT task_id FROM batch_task_links WHERE batch_id = ?", (batch_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def check_policy():
+    from . import task_queue
+    print("\n--- retry policy ---")
+    check("lost echo is retryable", task_queue.is_retryable("failed_rack_comm", "echo_error_max_retries"))
+    check("link failure without serial status is retryable", task_queue.is_retryable("failed_m_comm"))
+    check("echo without done/fin is not retryable",
+          not task_queue.is_retryable("failed_rack_comm", "timeout_after_echo"))
+    check("failed_unconfirmed is not retryable", not task_queue.is_retryable("failed_unconfirmed", "timeout_after_echo"))
+    check("invalid rack is not retryable", not task_queue.is_retryable("failed_invalid_rack"))
+    delays = [task_queue.retry_delay(attempt) for attempt in (1, 2, 3, 10)]
+    check("backoff doubles and is capped", delays == [1.0, 2.0, 4.0, 4.0], delays)
+
+
+def check_retry_resume(client, headers, simulator):
+    from . import task_queue
+    print("\n--- rack never echoes once, then recovers ---")
+    m_before, a_before = device_stats(simulator, "M", "commands"), device_stats(simulator, "A", "commands")
+    set_faults(simulator, "A", lost_echo=1.0)
+    recovered = []
+    original_send = task_queue.serial_mgr.send
+
+    def send(device, command, **kwargs):
+        result = original_send(device, command, **kwargs)
+        if device == "A" and result["status"] != "done" and not recovered:
+            set_faults(simulator, "A")       # the requeued run gets its echo
+            recovered.append(True)
+        return result
+
+    task_queue.serial_mgr.send = send
+    try:
+        task_id = run_task(client, headers, "A", 1)
+    finally:
+        task_queue.serial_mgr.send = original_send
+        set_faults(simulator, "A")
+    attempts = task_queue.get_task_attempts(task_id)
+    task = task_queue.get_task_by_id(task_id)
+    summary = [(a["outcome"], a["status"], a["serial_status"], a["legs_done"]) for a in attempts]
+    check("first run requeued with legs_done=1",
+          len(attempts) == 2 and summary[0] == ("retry", "failed_rack_comm", "echo_error_max_retries", 1)
+          and attempts[0]["retry_at"] is not None, summary)
+    check("retry completed the task", task["status"] == "done" and summary[-1][0] == "done", task["status"])
+    check("retry resumed at the rack leg (M sent once)", device_stats(simulator, "M", "commands") - m_before == 1,
+          device_stats(simulator, "M", "commands") - m_before)
+    lost = device_stats(simulator, "A", "lost_echo")
+    check("rack got the lost commands plus one", device_stats(simulator, "A", "commands") - a_before == lost + 1,
+          (device_stats(simulator, "A", "commands") - a_before, lost))
+
+
+def check_unconfirmed(client, headers, simulator):
+    from . import task_queue
+    print("\n--- M echoes but fin is lost ---")
+    m_before, a_before = device_stats(simulator, "M", "commands"), device_stats(simulator, "A", "commands")
+    set_faults(simulator, "M", lost_done=1.0)
+    try:
+        task_id = run_task(client, headers, "A", 2)
+    finally:
+        set_faults(simulator, "M")
+    attempts = task_queue.get_task_attempts(task_id)
+    task = task_queue.get_task_by_id(task_id)
+    summary = [(a["outcome"], a["status"], a["serial_status"]) for a in attempts]
+    check("task failed as failed_unconfirmed", task["status"] == "failed_unconfirmed", task["status"])
+    check("no retry was scheduled", summary == [("failed", "failed_unconfirmed", "timeout_after_echo")], summary)
+    check("M command was not re-sent", device_stats(simulator, "M", "commands") - m_before == 1,
+          device_stats(simulator, "M", "commands") - m_before)
+    check("rack leg never ran", device_stats(simulator, "A", "commands") - a_before == 0,
+          device_stats(simulator, "A", "commands") - a_before)
+
+
+def check_retries_exhausted(client, headers, simulator):
+    from . import task_queue
+    print("\n--- rack never echoes, retries run out ---")
+    m_before = device_stats(simulator, "M", "commands")
+    max_attempts = task_queue.TASK_MAX_ATTEMPTS
+    task_queue.TASK_MAX_ATTEMPTS = 2
+    set_faults(simulator, "B", lost_echo=1.0)
+    try:
+        task_id = run_task(client, headers, "B", 1)
+    finally:
+        task_queue.TASK_MAX_ATTEMPTS = max_attempts
+        set_faults(simulator, "B")
+    attempts = task_queue.get_task_attempts(task_id)
+    task = task_queue.get_task_by_id(task_id)
+    summary = [(a["outcome"], a["legs_done"]) for a in attempts]
+    check("retry, then final failure", summary == [("retry", 1), ("failed", 1)], summary)
+    check("task kept the leg failure status", task["status"] == "failed_rack_comm", task["status"])
+    check("M sent once across both runs", device_stats(simulator, "M", "commands") - m_before == 1,
+          device_stats(simulator, "M", "commands") - m_before)
+
+
+def check_archive_paging():
+    from . import db, archive
+    from .camera_history import get_camera_history_page
+    from .retention import retention_job
+    print("\n--- camera history across the archive boundary ---")
+    old = (datetime.datetime.now() - datetime.timedelta(days=200)).isoformat(timespec="seconds")
+    recent = datetime.datetime.now().isoformat(timespec="seconds")
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        for i in range(40):
+            # ids 0-24 expire; so do every 5th of the rest, interleaving archived and live ids
+            created_at = old if i < 25 or i % 5 == 0 else recent
+            conn.execute("""
+                INSERT INTO camera_batch_history (batch_id, rack, slot, movement_type, start_time, end_time,
+                    product_code, product_name, quantity, cargo_owner, created_by, created_by_username,
+                    status, created_at, updated_at)
+                VALUES (?, 'C', ?, 'IN', ?, ?, 'ARCH', 'Archive check', 1, 'check', 1, 'check', 'done', ?, ?)
+            """, (f"ARCHIVE-{i}", i % 80 + 1, created_at, created_at, created_at, created_at))
+        conn.commit()
+        all_ids = [row[0] for row in conn.execute("SELECT id FROM camera_batch_history ORDER BY id DESC")]
+        expired = {row[0] for row in conn.execute("SELECT id FROM camera_batch_history WHERE created_at < ?",
+                                                  (retention_job.cutoff('CAMERA_HISTORY_ARCHIVE_DAYS'),))}
+    finally:
+        conn.close()
+
+    retention_job.configure({'RETENTION_CHUNK_SIZE': 7, 'RETENTION_MAX_RUN_SECONDS': 30})
+    status = retention_job.run_once()
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        live = {row[0] for row in conn.execute("SELECT id FROM camera_batch_history")}
+        segments = conn.execute("SELECT COUNT(*) FROM archive_segments WHERE table_name = 'camera_batch_history'").fetchone()[0]
+    finally:
+        conn.close()
+    archived = status["tables"]["camera_batch_history"]["archived"]
+    check("retention archived every expired row", archived == len(expired) and not (live & expired),
+          (archived, len(expired)))
+    check("archive spans several segments", segments >= 2, segments)
+
+    paged, pages, mixed, cursor = [], 0, 0, None
+    while True:
+        rows, cursor = get_camera_history_page(limit=6, cursor=cursor)
+        ids = [row["id"] for row in rows]
+        paged.extend(ids)
+        pages += 1
+        if {i in expired for i in ids} == {True, False}:
+            mixed += 1
+        if not cursor or pages > len(all_ids):
+            break
+    check("paging returns every row once, newest first", paged == all_ids,
+          f"{len(paged)} rows, {len(set(paged))} distinct, expected {len(all_ids)}")
+    check("some pages merge live and archived rows", mixed > 0, mixed)
+
+    boundary = sorted(expired)[len(expired) // 2]
+    expected = sorted((i for i in expired if i < boundary), reverse=True)[:5]
+    got = [row["id"] for row in archive.rows_before("camera_batch_history", boundary, 5)]
+    check("rows_before returns the newest archived ids below the cursor", got == expected, (got, expected))
+    floor = expected[-1]
+    got = [row["id"] for row in archive.rows_before("camera_batch_history", None, 100, floor)]
+    check("rows_before stops at above_id", got == sorted((i for i in expired if i > floor), reverse=True), got)
+
+
+def main():
+    simulator = HardwareSimulator(time_scale=0.01, seed=1)
+    simulator.start()
+    try:
+        prepare_environment(serial_ports=simulator.ports_env())
+        app = boot_app()
+        from . import serial_io, task_queue
+        serial_io.ECHO_TIMEOUT = 0.2      # read by send() at call time
+        serial_io.TIMEOUT = 1.0
+        task_queue.configure({'TASK_RETRY_BASE_S': 1.0, 'TASK_RETRY_MAX_S': 4.0})
+        client = app.test_client()
+        headers = login(client)
+        logging.disable(logging.CRITICAL)     # the worker logs every injected failure
+        check_policy()
+        check_retry_resume(client, headers, simulator)
+        check_unconfirmed(client, headers, simulator)
+        check_retries_exhausted(client, headers, simulator)
+        check_archive_paging()
+        check("simulator saw no impossible tray moves",
+              sum(stats["anomalies"] for stats in simulator.stats().values()) == 0, simulator.stats())
+    finally:
+        simulator.stop()
+    print(f"\n{'❌ ' + str(len(failures)) + ' check(s) failed' if failures else '✅ all checks passed'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
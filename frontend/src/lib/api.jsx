@@ -41,9 +41,10 @@ export const pingBackend = () => req('/ping');
 // Function to get task queues - use req function for consistency
 export const getTaskQueues = () => req('/task-queues');
 
-export const uploadTasksBatch = async (tasks) => {
+// priority: 'low' | 'normal' | 'high' | 'urgent' (optional, default normal; urgent skips the admission queue)
+export const uploadTasksBatch = async (tasks, priority) => {
   const token = localStorage.getItem('inu_token');
-  const url = '/api/upload-tasks';
+  const url = '/api/upload-tasks' + (priority ? `?priority=${priority}` : '');
   console.log('Attempting to POST to URL:', url, 'with token:', token ? "Token Present" : "Token MISSING/NULL");
   const response = await fetch(url, {
     method: 'POST',
@@ -153,12 +154,27 @@ export const checkUser = (username) =>
   });
 
 // Updated to use req function for consistency instead of axios
-export async function getWorkTasksByStatus(status) {
-  return req(`/work-tasks?status=${status}`);
+export async function getWorkTasksByStatus(status, { batchId } = {}) {
+  const queryParams = new URLSearchParams({ status });
+  if (batchId) queryParams.set('batch_id', batchId);
+  return req(`/work-tasks?${queryParams}`);
 }
 
+// Keyset-paginated task list: resolves to { items, next_cursor }.
+// Pass the previous page's next_cursor to fetch the following page.
+export const getWorkTasksPage = (status, { limit = 50, cursor, order = 'asc', batchId } = {}) => {
+  const queryParams = new URLSearchParams({ limit, order });
+  if (status) queryParams.set('status', status);
+  if (cursor) queryParams.set('cursor', cursor);
+  if (batchId) queryParams.set('batch_id', batchId);
+  return req(`/work-tasks?${queryParams}`);
+};
+
 export const getPendingTaskCounts = () => req('/pending-task-counts');
 
+// { scope, counts: { pending|in_progress|done|failed: { IN, OUT } }, totals }
+export const getDashboardSummary = () => req('/dashboard-summary');
+
 // Logout function
 export const logout = () => 
   req('/logout', {
@@ -169,19 +185,28 @@ export const logout = () =>
 // Session status function
 export const getSessionStatus = () => req('/session-status');
 
+// Session ended (another login, logout elsewhere): clear the token and go back to login.
+// Used by handleApiError for REST calls and by useDashboardState for Socket.IO.
+// showAlert=false after a plain logout, where no other login is involved.
+export const handleSessionInvalidated = (navigate, showAlert = true) => {
+  console.log('🔥🔥🔥 Session invalidated, clearing token! 🔥🔥🔥');
+  localStorage.removeItem('inu_token');
+  if (showAlert) {
+    alert('다른 사용자가 로그인했습니다. 다시 로그인해주세요.');
+  }
+  if (navigate) {
+    navigate('/');
+  }
+};
+
 // Enhanced error handler for session invalidation
 export const handleApiError = (error, navigate) => {
   try {
     const errorData = JSON.parse(error.message);
     if (errorData.code === 'session_invalidated') {
       // Clear local storage and redirect to login
-      console.log('🔥🔥🔥 handleApiError is clearing token! 🔥🔥🔥');
       console.trace('Token cleared by handleApiError');
-      localStorage.removeItem('inu_token');
-      alert('다른 사용자가 로그인했습니다. 다시 로그인해주세요.');
-      if (navigate) {
-        navigate('/');
-      }
+      handleSessionInvalidated(navigate);
       return true; // Indicates session was invalidated
     }
   } catch (e) {
@@ -194,3 +219,10 @@ export const getCameraHistory = ({ limit = 50 } = {}) => {
   const queryParams = new URLSearchParams({ limit });
   return req(`/camera-history?${queryParams}`);
 };
+
+// Paginated camera history (newest first): resolves to { items, next_cursor }.
+export const getCameraHistoryPage = ({ limit = 50, cursor } = {}) => {
+  const queryParams = new URLSearchParams({ limit, paginate: 1 });
+  if (cursor) queryParams.set('cursor', cursor);
+  return req(`/camera-history?${queryParams}`);
+};
@@ -0,0 +1,72 @@
+import { useEffect, useState } from 'react';
+import { socket } from '../socket';
+import { handleSessionInvalidated } from './api';
+
+/**
+ * Live dashboard state pushed by the backend (backend/dashboard_state.py).
+ *
+ * Subscribes once over Socket.IO, receives a full snapshot, then applies
+ * versioned diffs. If a diff does not follow the local version (missed
+ * event, reconnect) it re-subscribes to get a fresh snapshot.
+ *
+ * When the login session ends (another login, logout) the backend stops the
+ * subscription and sends 'session_invalidated'; like handleApiError for REST
+ * calls, the hook then clears the token and navigates back to login.
+ *
+ * @param {Function} [navigate] react-router navigate, used to return to login
+ * @returns {Object|null} { counts, camera_history, activity_logs, cameras, rack_stock } or null until the first snapshot
+ */
+export const useDashboardState = (navigate) => {
+  const [state, setState] = useState(null);
+
+  useEffect(() => {
+    let version = 0;
+
+    const subscribe = () => {
+      socket.emit('dashboard_subscribe', { token: localStorage.getItem('inu_token') });
+    };
+
+    const handleSnapshot = (snapshot) => {
+      version = snapshot.version;
+      setState(snapshot.state);
+    };
+
+    const handleDiff = (diff) => {
+      if (diff.version <= version) return; // already contained in our snapshot
+      if (diff.base_version !== version) {
+        subscribe();
+        return;
+      }
+      version = diff.version;
+      setState(prev => ({ ...prev, ...diff.changes }));
+    };
+
+    const handleInvalidated = (data) => {
+      setState(null);
+      handleSessionInvalidated(navigate, data?.reason !== 'logout');
+    };
+
+    const handleError = (data) => {
+      console.error('[Dashboard] subscription rejected:', data);
+      if (data?.code === 'session_invalidated') handleInvalidated(data);
+    };
+
+    socket.on('dashboard_snapshot', handleSnapshot);
+    socket.on('dashboard_diff', handleDiff);
+    socket.on('dashboard_error', handleError);
+    socket.on('session_invalidated', handleInvalidated);
+    socket.on('connect', subscribe);
+    if (socket.connected) subscribe();
+
+    return () => {
+      socket.off('dashboard_snapshot', handleSnapshot);
+      socket.off('dashboard_diff', handleDiff);
+      socket.off('dashboard_error', handleError);
+      socket.off('session_invalidated', handleInvalidated);
+      socket.off('connect', subscribe);
+      socket.emit('dashboard_unsubscribe');
+    };
+  }, [navigate]);
+
+  return state;
+};
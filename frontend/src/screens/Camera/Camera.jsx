@@ -10,7 +10,8 @@ import { Property1LogOut } from "../../icons/Property1LogOut";
 import { Property1Variant5 } from "../../icons/Property1Variant5";
 import "./style.css";
 import { useNavigate } from "react-router-dom";
-import { getActivityLogs, getCameraHistory, logout, handleApiError } from "../../lib/api";
+import { logout } from "../../lib/api";
+import { useDashboardState } from "../../lib/useDashboardState";
 import { jwtDecode } from "jwt-decode";
 import { getBackendUrl, getApiBaseUrl } from "../../config";
 
@@ -51,6 +52,7 @@ export const Camera = () => {
   const [userDisplayName, setUserDisplayName] = useState('');
   const [latestBatchId, setLatestBatchId] = useState(null);
   const [cameraBatches, setCameraBatches] = useState([]); // grouped by batch_id
+  const dashboardState = useDashboardState(navigate);
 
   const handleDashboard = () => navigate('/dashboard');
   const handleWorkStatus = () => navigate('/work-status');
@@ -223,73 +225,63 @@ export const Camera = () => {
     }
   };
 
-  // Periodic refresh for activity logs and camera history
+  // Activity logs and camera history are pushed by the backend (no polling)
   useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const rawLogs = await getActivityLogs({ limit: 50, order: 'desc' });
-        const historyData = await getCameraHistory({ limit: 50 });
-
-        // Minimal grouping preserved for logs section (unchanged UI below)
-        const logsByDate = rawLogs.reduce((acc, log) => {
-          const dateKey = new Date(log.timestamp).toLocaleDateString('ko-KR', { year: 'numeric', month: '2-digit', day: '2-digit' });
-          if (!acc[dateKey]) acc[dateKey] = [];
-          acc[dateKey].push(log);
-          return acc;
-        }, {});
-
-        // Determine latest batch_id from most recent logs that include batch_id
-        const latestWithBatch = Array.isArray(rawLogs) ? rawLogs.find(l => l && l.batch_id) : null;
-        setLatestBatchId(latestWithBatch ? latestWithBatch.batch_id : null);
-
-        setGroupedActivityLogs(logsByDate);
-        setCameraHistory(historyData);
-
-        // Group camera history by batch_id so one card per batch
-        const batchesMap = new Map();
-        for (const it of Array.isArray(historyData) ? historyData : []) {
-          const key = it.batch_id ? `batch-${it.batch_id}` : `single-${it.id}`;
-          const existing = batchesMap.get(key) || {
-            batch_id: it.batch_id || null,
-            tasks: [],
-            start_time: it.start_time,
-            end_time: it.end_time,
-            created_at: it.created_at,
-            updated_at: it.updated_at
-          };
-          // push this task
-          existing.tasks.push({
-            rack: it.rack,
-            slot: it.slot,
-            movement_type: it.movement_type,
-            start_time: it.start_time,
-            end_time: it.end_time
-          });
-          // aggregate start/end
-          const s1 = existing.start_time && new Date(existing.start_time).getTime();
-          const s2 = it.start_time && new Date(it.start_time).getTime();
-          if (!s1 || (s2 && s2 < s1)) existing.start_time = it.start_time;
-          const e1 = existing.end_time && new Date(existing.end_time).getTime();
-          const e2 = it.end_time && new Date(it.end_time).getTime();
-          if (!e1 || (e2 && e2 > e1)) existing.end_time = it.end_time;
-          batchesMap.set(key, existing);
-        }
-        // finalize arrays and sort
-        const batches = Array.from(batchesMap.values()).map(b => ({
-          ...b,
-          tasks: b.tasks.sort((a,b) => new Date(a.start_time || 0) - new Date(b.start_time || 0))
-        })).sort((a,b) => new Date(b.end_time || b.updated_at || 0) - new Date(a.end_time || a.updated_at || 0));
-        setCameraBatches(batches);
-      } catch (error) {
-        console.error('Error fetching data:', error);
-        if (handleApiError(error, navigate)) return;
-      }
-    };
-
-    fetchData();
-    const intervalId = setInterval(fetchData, 2000);
-    return () => clearInterval(intervalId);
-  }, [navigate]);
+    if (!dashboardState) return;
+    const rawLogs = dashboardState.activity_logs || [];
+    const historyData = dashboardState.camera_history || [];
+
+    // Minimal grouping preserved for logs section (unchanged UI below)
+    const logsByDate = rawLogs.reduce((acc, log) => {
+      const dateKey = new Date(log.timestamp).toLocaleDateString('ko-KR', { year: 'numeric', month: '2-digit', day: '2-digit' });
+      if (!acc[dateKey]) acc[dateKey] = [];
+      acc[dateKey].push(log);
+      return acc;
+    }, {});
+
+    // Determine latest batch_id from most recent logs that include batch_id
+    const latestWithBatch = Array.isArray(rawLogs) ? rawLogs.find(l => l && l.batch_id) : null;
+    setLatestBatchId(latestWithBatch ? latestWithBatch.batch_id : null);
+
+    setGroupedActivityLogs(logsByDate);
+    setCameraHistory(historyData);
+
+    // Group camera history by batch_id so one card per batch
+    const batchesMap = new Map();
+    for (const it of Array.isArray(historyData) ? historyData : []) {
+      const key = it.batch_id ? `batch-${it.batch_id}` : `single-${it.id}`;
+      const existing = batchesMap.get(key) || {
+        batch_id: it.batch_id || null,
+        tasks: [],
+        start_time: it.start_time,
+        end_time: it.end_time,
+        created_at: it.created_at,
+        updated_at: it.updated_at
+      };
+      // push this task
+      existing.tasks.push({
+        rack: it.rack,
+        slot: it.slot,
+        movement_type: it.movement_type,
+        start_time: it.start_time,
+        end_time: it.end_time
+      });
+      // aggregate start/end
+      const s1 = existing.start_time && new Date(existing.start_time).getTime();
+      const s2 = it.start_time && new Date(it.start_time).getTime();
+      if (!s1 || (s2 && s2 < s1)) existing.start_time = it.start_time;
+      const e1 = existing.end_time && new Date(existing.end_time).getTime();
+      const e2 = it.end_time && new Date(it.end_time).getTime();
+      if (!e1 || (e2 && e2 > e1)) existing.end_time = it.end_time;
+      batchesMap.set(key, existing);
+    }
+    // finalize arrays and sort
+    const batches = Array.from(batchesMap.values()).map(b => ({
+      ...b,
+      tasks: b.tasks.sort((a,b) => new Date(a.start_time || 0) - new Date(b.start_time || 0))
+    })).sort((a,b) => new Date(b.end_time || b.updated_at || 0) - new Date(a.end_time || a.updated_at || 0));
+    setCameraBatches(batches);
+  }, [dashboardState?.activity_logs, dashboardState?.camera_history]);
 
   useEffect(() => {
     const token = localStorage.getItem('inu_token');
@@ -303,28 +295,12 @@ export const Camera = () => {
     }
   }, []);
 
+  // Camera availability is part of the pushed dashboard state
   useEffect(() => {
-    const fetchAvailableCameras = async () => {
-      try {
-        const apiUrl = getApiBaseUrl();
-        const camerasUrl = apiUrl ? `${apiUrl}/api/cameras/available` : '/api/cameras/available';
-        const response = await fetch(camerasUrl, { headers: { 'Authorization': `Bearer ${localStorage.getItem('inu_token')}` } });
-        if (response.ok) {
-          const data = await response.json();
-          if (data.success) {
-            if (data.cameras && data.cameras.length > 0) {
-              setAvailableCameras(data.cameras);
-            } else {
-              setAvailableCameras([]);
-            }
-          }
-        }
-      } catch (_) {}
-    };
-    fetchAvailableCameras();
-    const camPoll = setInterval(fetchAvailableCameras, 5000);
-    return () => clearInterval(camPoll);
-  }, []);
+    if (dashboardState?.cameras) {
+      setAvailableCameras(dashboardState.cameras);
+    }
+  }, [dashboardState?.cameras]);
 
   // latestBatchId is tracked from activity logs in state above
 
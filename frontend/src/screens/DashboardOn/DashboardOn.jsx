@@ -14,8 +14,8 @@ import { RackAProgress } from '../../components/RackProgress/RackAProgress';
 import { RackBProgress } from '../../components/RackProgress/RackBProgress';
 import { RackCProgress } from '../../components/RackProgress/RackCProgress';
 import { TotalRackProgress } from '../../components/TotalRackProgress/TotalRackProgress';
-import { getInventory, pingBackend, getWorkTasksByStatus, getPendingTaskCounts, logout, handleApiError, getSessionStatus } from "../../lib/api";
-import { socket } from '../../socket';
+import { pingBackend, logout, handleApiError, getSessionStatus } from "../../lib/api";
+import { useDashboardState } from "../../lib/useDashboardState";
 import { jwtDecode } from "jwt-decode";
 import { getApiBaseUrl } from "../../config";
 
@@ -49,105 +49,58 @@ export const DashboardOn = () => {
     loginTime: ''
   });
 
-  // Define fetchData at component level, wrapped in useCallback
-  const fetchData = useCallback(async () => {
-    try {
-      const allInventory = await getInventory(); 
-      console.log("Dashboard - Raw Inventory Data:", allInventory);
-      
-      let stockA = 0;
-      let stockB = 0;
-      let stockC = 0;
-      allInventory.forEach(item => {
-        if (item.rack === 'A') stockA++;
-        else if (item.rack === 'B') stockB++;
-        else if (item.rack === 'C') stockC++;
-      });
-      console.log(`Dashboard - Calculated Stocks - A: ${stockA}, B: ${stockB}, C: ${stockC}`);
-      const totalStock = stockA + stockB + stockC;
-      setRackData({
-        rackA: { stock: stockA, capacity: RACK_CAPACITY, percentage: Math.round((stockA / RACK_CAPACITY) * 100) },
-        rackB: { stock: stockB, capacity: RACK_CAPACITY, percentage: Math.round((stockB / RACK_CAPACITY) * 100) },
-        rackC: { stock: stockC, capacity: RACK_CAPACITY, percentage: Math.round((stockC / RACK_CAPACITY) * 100) },
-        total: { stock: totalStock, capacity: TOTAL_CAPACITY, percentage: Math.round((totalStock / TOTAL_CAPACITY) * 100) }
-      });
+  const dashboardState = useDashboardState(navigate);
 
-      try {
-        await pingBackend();
-        setDeviceStatus({ isConnected: true });
-      } catch (pingError) {
-        console.error("Backend ping failed:", pingError);
-        setDeviceStatus({ isConnected: false });
-      }
-
-      // Fetch session status
-      try {
-        const sessionData = await getSessionStatus();
-        setSessionInfo({
-          active: sessionData.active,
-          username: sessionData.username || '',
-          loginTime: sessionData.login_time || ''
-        });
-      } catch (sessionError) {
-        console.error("Session status fetch failed:", sessionError);
-        setSessionInfo({ active: false, username: '', loginTime: '' });
-      }
+  // Rack stock and task counts are pushed by the backend (backend/dashboard_state.py)
+  useEffect(() => {
+    if (!dashboardState) return;
+    const stock = dashboardState.rack_stock || {};
+    const stockA = stock.A || 0;
+    const stockB = stock.B || 0;
+    const stockC = stock.C || 0;
+    const totalStock = stockA + stockB + stockC;
+    setRackData({
+      rackA: { stock: stockA, capacity: RACK_CAPACITY, percentage: Math.round((stockA / RACK_CAPACITY) * 100) },
+      rackB: { stock: stockB, capacity: RACK_CAPACITY, percentage: Math.round((stockB / RACK_CAPACITY) * 100) },
+      rackC: { stock: stockC, capacity: RACK_CAPACITY, percentage: Math.round((stockC / RACK_CAPACITY) * 100) },
+      total: { stock: totalStock, capacity: TOTAL_CAPACITY, percentage: Math.round((totalStock / TOTAL_CAPACITY) * 100) }
+    });
+  }, [dashboardState?.rack_stock]);
 
-      // Fetch pending task counts directly
-      let pendingIncoming = 0;
-      let pendingOutgoing = 0;
-      try {
-        const counts = await getPendingTaskCounts();
-        console.log("Dashboard - fetchData - Fetched Pending Task Counts:", counts);
-        pendingIncoming = counts.pending_in_count || 0;
-        pendingOutgoing = counts.pending_out_count || 0;
-      } catch (countsError) {
-        console.error("Dashboard - Failed to fetch pending task counts:", countsError);
-      }
-      console.log(`Dashboard - fetchData - Pending counts - Incoming: ${pendingIncoming}, Outgoing: ${pendingOutgoing}`);
-      
-      let completedIncomingCount = 0;
-      let completedOutgoingCount = 0;
-      try {
-        const allCompletedTasks = await getWorkTasksByStatus("done");
-        allCompletedTasks.forEach(task => {
-          if (task.movement === 'IN') {
-            completedIncomingCount++;
-          } else if (task.movement === 'OUT') {
-            completedOutgoingCount++;
-          }
-            });
-      } catch (completedError) {
-        console.error("Dashboard - Failed to fetch completed tasks:", completedError);
-      }
+  useEffect(() => {
+    if (!dashboardState) return;
+    const counts = dashboardState.counts;
+    setWorkStatus({
+      waiting: { incoming: counts.pending.IN, outgoing: counts.pending.OUT },
+      inProgress: { incoming: counts.in_progress.IN, outgoing: counts.in_progress.OUT },
+      completed: { incoming: counts.done.IN, outgoing: counts.done.OUT }
+    });
+  }, [dashboardState?.counts]);
 
-      // Calculate In-Progress task counts
-      let inProgressIncomingCount = 0;
-      let inProgressOutgoingCount = 0;
-      try {
-        const allInProgressTasks = await getWorkTasksByStatus("in_progress");
-        allInProgressTasks.forEach(task => {
-          if (task.movement === 'IN') {
-            inProgressIncomingCount++;
-          } else if (task.movement === 'OUT') {
-            inProgressOutgoingCount++;
-          }
-        });
-      } catch (inProgressError) {
-        console.error("Dashboard - Failed to fetch in-progress tasks:", inProgressError);
-      }
+  // Device / session status is still polled (not part of the pushed state)
+  const fetchData = useCallback(async () => {
+    try {
+      await pingBackend();
+      setDeviceStatus({ isConnected: true });
+    } catch (pingError) {
+      console.error("Backend ping failed:", pingError);
+      setDeviceStatus({ isConnected: false });
+    }
 
-      setWorkStatus(prevStatus => ({
-        ...prevStatus, 
-        waiting: { incoming: pendingIncoming, outgoing: pendingOutgoing },
-        inProgress: { incoming: inProgressIncomingCount, outgoing: inProgressOutgoingCount },
-        completed: { incoming: completedIncomingCount, outgoing: completedOutgoingCount }
-      }));
-    } catch (error) {
-      console.error("Dashboard - Failed to fetch dashboard data:", error);
+    // Fetch session status
+    try {
+      const sessionData = await getSessionStatus();
+      setSessionInfo({
+        active: sessionData.active,
+        username: sessionData.username || '',
+        loginTime: sessionData.login_time || ''
+      });
+    } catch (sessionError) {
+      console.error("Session status fetch failed:", sessionError);
+      setSessionInfo({ active: false, username: '', loginTime: '' });
     }
   }, []); // Empty dependency array for useCallback
-            // (it uses state setters which are stable)
+          // (it uses state setters which are stable)
 
   useEffect(() => {
     // Initial data fetch and interval setup
@@ -163,40 +116,6 @@ export const DashboardOn = () => {
     return () => clearInterval(interval);
   }, [fetchData]); // fetchData is now a stable dependency from useCallback
 
-  useEffect(() => {
-    // SocketIO listeners
-    const handleTaskDone = (data) => {
-      console.log('Dashboard: Received task_done (OLD LISTENER - TO BE REMOVED/REPLACED):', data);
-      if (data.status === "done") {
-      fetchData(); 
-      }
-    };
-
-    const handleQueueSize = (data) => {
-      console.log('Dashboard: Received queue_size (OLD LISTENER - TO BE REMOVED/REPLACED):', data);
-      if (data.status === "done") {
-        fetchData(); 
-      }
-    };
-
-    const handleTaskStatusChanged = (data) => {
-      console.log('Dashboard: Received task_status_changed:', data);
-      // Any task status change could affect pending counts or other dashboard items
-      fetchData(); 
-    };
-
-    // Keep old listeners for now if they serve other purposes, or remove if fully replaced
-    socket.on('task_done', handleTaskDone); // Consider removing if task_status_changed covers it
-    socket.on('queue_size', handleQueueSize); // Consider removing if task_status_changed covers it
-    socket.on('task_status_changed', handleTaskStatusChanged); // New primary listener
-
-    return () => {
-      socket.off('task_done', handleTaskDone);
-      socket.off('queue_size', handleQueueSize);
-      socket.off('task_status_changed', handleTaskStatusChanged);
-    };
-  }, [fetchData]); // fetchData is now a stable dependency
-
   useEffect(() => {
     const token = localStorage.getItem('inu_token');
     if (token) {
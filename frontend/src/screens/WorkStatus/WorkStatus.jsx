@@ -197,22 +197,24 @@ export const WorkStatus = () => {
             }
 
             // Initialize new batch progress tracking
+            // (202 status 'queued': the batch starts by itself once the running work drains)
             if (result && result.batch_id && typeof result.processed_count === 'number') {
+              const totalTasks = result.status === 'queued' ? result.queued_count : result.processed_count;
               console.log("[handleFileChange] Initializing new batch:", {
                 id: result.batch_id,
-                totalTasks: result.processed_count
+                totalTasks
               });
               
               const newBatch = {
                 id: result.batch_id,
-                totalTasks: result.processed_count,
+                totalTasks,
                 completedTasks: 0
               };
               setActiveBatch(newBatch);
 
               // Initial progress check
-              if (result.processed_count > 0) {
-                await fetchAndSetBatchProgress(result.batch_id, result.processed_count);
+              if (totalTasks > 0) {
+                await fetchAndSetBatchProgress(result.batch_id, totalTasks);
               }
             } else {
               // Reset progress tracking if batch creation failed
@@ -451,9 +453,8 @@ export const WorkStatus = () => {
     }
 
     try {
-      // Get all done tasks for this batch
-      const doneTasks = await getWorkTasksByStatus('done');
-      const completedTasksForBatch = doneTasks.filter(task => task.batch_id === batchId);
+      // Get done tasks for this batch only (filtered server-side)
+      const completedTasksForBatch = await getWorkTasksByStatus('done', { batchId });
       const newCompletedCount = completedTasksForBatch.length;
 
       console.log("[fetchAndSetBatchProgress] Progress update:", {